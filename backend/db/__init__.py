@@ -1,7 +1,12 @@
 """
 Database module - DB connection and model definitions
 """
-from .database import engine, SessionLocal, Base, get_db
-from .models import StationDeparture, StationOrder, StationInterval, DelayLog
+from .database import engine, SessionLocal, Base, get_db, async_engine, AsyncSessionLocal, get_async_db
+from .models import StationDeparture, StationOrder, StationInterval, DelayLog, Stop, Route, Trip, StopTime
 
-__all__ = ["engine", "SessionLocal", "Base", "get_db", "StationDeparture", "StationOrder", "StationInterval"]
+__all__ = [
+    "engine", "SessionLocal", "Base", "get_db",
+    "async_engine", "AsyncSessionLocal", "get_async_db",
+    "StationDeparture", "StationOrder", "StationInterval",
+    "Stop", "Route", "Trip", "StopTime",
+]
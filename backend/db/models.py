@@ -1,20 +1,96 @@
-from sqlalchemy import Column, String, Integer, Float
+from sqlalchemy import Column, String, Integer, Float, ForeignKey, Index
+from sqlalchemy.ext.declarative import declarative_base
 from .database import Base
 
-class StationDeparture(Base):
-    __tablename__ = "station_departures"
+# Read-only views live on their own metadata so create_all never turns them into tables
+ViewBase = declarative_base()
 
-    id = Column(Integer, primary_key=True, index=True)
-    station_id = Column(String, index=True)
-    station_name = Column(String, index=True)
-    railway_id = Column(String, index=True)
+
+class Stop(Base):
+    __tablename__ = "stops"
+
+    id = Column(Integer, primary_key=True)
+    station_id = Column(String, unique=True)
+    station_name = Column(String, index=True)  # English (matches station_orders)
+    station_name_ja = Column(String)
+
+class Route(Base):
+    __tablename__ = "routes"
+
+    id = Column(Integer, primary_key=True)
+    railway_id = Column(String)
     railway_name = Column(String, index=True)
+
+class Trip(Base):
+    __tablename__ = "trips"
+
+    id = Column(Integer, primary_key=True)
+    route_id = Column(Integer, ForeignKey("routes.id"), nullable=False)
+    train_number = Column(String, index=True)
+    train_type = Column(String)
+    destination_station = Column(String)
+    direction = Column(String)
+    weekday_type = Column(String)
+
+    __table_args__ = (
+        # One contiguous slice per day type and line
+        Index("ix_trips_day_route", "weekday_type", "route_id"),
+    )
+
+class StopTime(Base):
+    __tablename__ = "stop_times"
+
+    id = Column(Integer, primary_key=True)
+    trip_id = Column(Integer, ForeignKey("trips.id"), nullable=False)
+    stop_id = Column(Integer, ForeignKey("stops.id"), nullable=False)
+    stop_sequence = Column(Integer)
+    departure_minutes = Column(Integer)  # Minutes after midnight (0-1439, terminal = arrival)
+
+    __table_args__ = (
+        Index("ix_stop_times_stop_time", "stop_id", "departure_minutes"),
+        Index("ix_stop_times_trip_seq", "trip_id", "stop_sequence"),
+    )
+
+
+# Denormalized compatibility view with the original station_departures columns.
+# Filter and sort on departure_minutes: departure_time is computed, so it cannot use an index.
+STATION_DEPARTURES_VIEW = """
+CREATE VIEW IF NOT EXISTS station_departures AS
+SELECT
+    st.id AS id,
+    s.station_id AS station_id,
+    s.station_name AS station_name,
+    r.railway_id AS railway_id,
+    r.railway_name AS railway_name,
+    t.direction AS direction,
+    st.departure_minutes AS departure_minutes,
+    printf('%02d:%02d', st.departure_minutes / 60, st.departure_minutes % 60) AS departure_time,
+    t.train_type AS train_type,
+    t.destination_station AS destination_station,
+    t.train_number AS train_number,
+    t.weekday_type AS weekday_type
+FROM stop_times st
+JOIN trips t ON t.id = st.trip_id
+JOIN routes r ON r.id = t.route_id
+JOIN stops s ON s.id = st.stop_id
+"""
+
+class StationDeparture(ViewBase):
+    """Read-only mapping of the station_departures view (write via db.timetable_store)."""
+    __tablename__ = "station_departures"
+
+    id = Column(Integer, primary_key=True)
+    station_id = Column(String)
+    station_name = Column(String)
+    railway_id = Column(String)
+    railway_name = Column(String)
     direction = Column(String)
-    departure_time = Column(String, index=True)
+    departure_minutes = Column(Integer)
+    departure_time = Column(String)
     train_type = Column(String)
     destination_station = Column(String)
     train_number = Column(String)
-    weekday_type = Column(String, index=True)
+    weekday_type = Column(String)
 
 class StationOrder(Base):
     __tablename__ = "station_orders"
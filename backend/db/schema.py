@@ -0,0 +1,27 @@
+"""
+Schema setup - tables, late-added indexes and compatibility views.
+"""
+from sqlalchemy import inspect, text
+from .database import Base
+from .models import STATION_DEPARTURES_VIEW
+
+
+def ensure_schema(engine):
+    """Create missing tables, indexes and the station_departures view."""
+    Base.metadata.create_all(bind=engine)
+
+    # create_all skips indexes added to tables that already exist
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=engine, checkfirst=True)
+
+    if "station_departures" in inspect(engine).get_table_names():
+        # Pre-normalization database: it has no departure_minutes, so timetable queries fail until migrated
+        print("Warning: legacy station_departures table found. "
+              "Run scripts/migrate_timetable_schema.py to normalize it before timetable queries.")
+        return
+
+    # Recreate the view so databases created before a column was added pick it up
+    with engine.begin() as conn:
+        conn.execute(text("DROP VIEW IF EXISTS station_departures"))
+        conn.execute(text(STATION_DEPARTURES_VIEW))
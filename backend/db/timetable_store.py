@@ -0,0 +1,151 @@
+"""
+Timetable writer for the normalized stops / routes / trips / stop_times tables.
+
+Batch scripts hand over one train at a time; stations and railways are
+interned to integer keys so each stop_time row only stores small integers.
+"""
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+from sqlalchemy import delete, func, insert, select
+from sqlalchemy.orm import Session
+from .models import Route, Stop, StopTime, Trip
+
+BATCH_SIZE = 5000
+
+
+def _to_minutes(value) -> int:
+    """Accept minutes or an HH:MM string."""
+    if isinstance(value, int):
+        return value
+    h, m = value[:5].split(":")
+    return int(h) * 60 + int(m)
+
+
+class TimetableWriter:
+    """Buffered writer that normalizes departures into integer-keyed rows."""
+
+    def __init__(self, db: Session, batch_size: int = BATCH_SIZE):
+        self.db = db
+        self.batch_size = batch_size
+
+        self._stops: Dict[str, int] = {
+            station_id: pk for pk, station_id in db.execute(select(Stop.id, Stop.station_id))
+        }
+        self._routes: Dict[Tuple[str, str], int] = {
+            (railway_id, railway_name): pk
+            for pk, railway_id, railway_name in db.execute(select(Route.id, Route.railway_id, Route.railway_name))
+        }
+        self._next_trip_id = (db.execute(select(func.max(Trip.id))).scalar() or 0) + 1
+
+        self._pending_trips: List[dict] = []
+        self._pending_stop_times: List[dict] = []
+        self.trip_count = 0
+        self.stop_time_count = 0
+
+    def _stop_key(self, station_id: str, station_name: str, station_name_ja: Optional[str]) -> int:
+        pk = self._stops.get(station_id)
+        if pk is None:
+            pk = self.db.execute(insert(Stop).values(
+                station_id=station_id, station_name=station_name, station_name_ja=station_name_ja
+            )).inserted_primary_key[0]
+            self._stops[station_id] = pk
+        return pk
+
+    def _route_key(self, railway_id: str, railway_name: str) -> int:
+        key = (railway_id, railway_name)
+        pk = self._routes.get(key)
+        if pk is None:
+            pk = self.db.execute(insert(Route).values(
+                railway_id=railway_id, railway_name=railway_name
+            )).inserted_primary_key[0]
+            self._routes[key] = pk
+        return pk
+
+    def add_trip(
+        self,
+        railway_id: str,
+        railway_name: str,
+        train_number: str,
+        train_type: str,
+        destination_station: str,
+        direction: str,
+        weekday_type: str,
+        stops: Iterable[Sequence],
+    ) -> int:
+        """
+        Add one train run.
+
+        Args:
+            stops: (station_id, station_name, departure_time[, station_name_ja]) in
+                   stop order; departure_time is minutes or HH:MM.
+
+        Returns:
+            The new trip's primary key.
+        """
+        trip_id = self._next_trip_id
+        self._next_trip_id += 1
+
+        self._pending_trips.append({
+            "id": trip_id,
+            "route_id": self._route_key(railway_id, railway_name),
+            "train_number": train_number,
+            "train_type": train_type,
+            "destination_station": destination_station,
+            "direction": direction,
+            "weekday_type": weekday_type,
+        })
+
+        for seq, stop in enumerate(stops):
+            station_name_ja = stop[3] if len(stop) > 3 else None
+            self._pending_stop_times.append({
+                "trip_id": trip_id,
+                "stop_id": self._stop_key(stop[0], stop[1], station_name_ja),
+                "stop_sequence": seq,
+                "departure_minutes": _to_minutes(stop[2]),
+            })
+
+        if len(self._pending_stop_times) >= self.batch_size:
+            self.flush()
+        return trip_id
+
+    def add_train(self, records: List[dict]) -> Optional[int]:
+        """Add one train given per-stop records in the legacy station_departures format."""
+        if not records:
+            return None
+        first = records[0]
+        return self.add_trip(
+            railway_id=first["railway_id"],
+            railway_name=first["railway_name"],
+            train_number=first["train_number"],
+            train_type=first["train_type"],
+            destination_station=first["destination_station"],
+            direction=first["direction"],
+            weekday_type=first["weekday_type"],
+            stops=[(r["station_id"], r["station_name"], r["departure_time"]) for r in records],
+        )
+
+    def flush(self):
+        """Write buffered trips and stop_times and commit."""
+        if self._pending_trips:
+            self.db.execute(insert(Trip), self._pending_trips)
+            self.trip_count += len(self._pending_trips)
+            self._pending_trips = []
+        if self._pending_stop_times:
+            self.db.execute(insert(StopTime), self._pending_stop_times)
+            self.stop_time_count += len(self._pending_stop_times)
+            self._pending_stop_times = []
+        self.db.commit()
+
+    def delete_railways(self, railway_names: Iterable[str]) -> int:
+        """Remove all trips (and their stop_times) of the given railways. Returns trips deleted."""
+        route_ids = select(Route.id).where(Route.railway_name.in_(list(railway_names)))
+        trip_ids = select(Trip.id).where(Trip.route_id.in_(route_ids))
+        self.db.execute(delete(StopTime).where(StopTime.trip_id.in_(trip_ids)))
+        deleted = self.db.execute(delete(Trip).where(Trip.route_id.in_(route_ids))).rowcount
+        self.db.commit()
+        return deleted
+
+    def clear(self):
+        """Remove every trip and stop_time (stops and routes are kept as dictionaries)."""
+        self.db.execute(delete(StopTime))
+        self.db.execute(delete(Trip))
+        self.db.commit()
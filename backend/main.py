@@ -1,21 +1,45 @@
 
+import asyncio
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
 from routers import search, timetable, stations
 from services.route_graph import initialize_graph
-from db.database import engine
-from db.models import Base
+from services.timetable.service_calendar import get_service_calendar
+from services.timetable.artifact import get_timetable
+from services.timetable.popular_routes import get_popular_routes
+from services.line_scores import get_line_scores
+from services.search_pool import get_search_pool
+from services.delay_overlay import poll_delays
+from db.database import async_engine, engine
+from services import executors
+from db.schema import ensure_schema
 
-# Create tables if not exist
-Base.metadata.create_all(bind=engine)
+# Create tables, indexes and views if not exist
+ensure_schema(engine)
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Initialize route graph on startup
     initialize_graph()
+    # Build the date -> day type index once
+    get_service_calendar()
+    # Map the shared timetable artifact (zero-copy, shared across workers)
+    get_timetable()
+    # Precomputed journeys between the busiest stations
+    get_popular_routes()
+    # Per-line risk/fare scores for multi-criteria search
+    get_line_scores()
+    # Search worker processes map the same snapshot/artifact files
+    get_search_pool().start()
+    # GTFS-RT poller publishing the live delay overlay read by delay-aware searches
+    delay_poller = asyncio.create_task(poll_delays())
     yield
+    delay_poller.cancel()
+    get_search_pool().shutdown()
+    executors.shutdown()
+    await async_engine.dispose()
 
 
 app = FastAPI(lifespan=lifespan)
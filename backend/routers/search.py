@@ -2,26 +2,138 @@
 """
 Search API router.
 """
-from fastapi import APIRouter, Depends, Query
-from sqlalchemy.orm import Session
-from db.database import get_db
+import asyncio
+import json
+import math
+import sys
+from array import array
+from fastapi import APIRouter, Query, HTTPException
+from fastapi.responses import Response, StreamingResponse
+from pydantic import BaseModel, Field
+from typing import Dict, List, Literal, Optional
+from services import disruption, search_pool
+from services.executors import run_cpu, run_io
+from services.search_pool import SearchOverloaded, SearchTimeout, get_search_pool
+from services.singleflight import SingleFlight
 from services.route_graph import get_graph
-from services.timetable.core import search_route_with_times
-from services.delay_service import check_route_delay, get_delay_summary
-from services.risk_service import get_route_risk
-from datetime import datetime
+from services.timetable.artifact import MINUTES_PER_DAY, SERVICE_DAY_START, get_timetable, service_minutes
+from services.timetable.core import search_routes_with_times
+from services.timetable.popular_routes import search_popular
+from services.delay_overlay import get_delay_overlay
+from services.delay_service import check_route_delay, get_delay_summary, get_route_delays
+from services.result_cache import ResultCache
+from services.risk_service import get_routes_risk, route_codes
+from services.timetable.service_calendar import ServiceDay, get_service_calendar, parse_service_date
 
-import json
-import os
+from services.station_stats import get_station_stats
 
 router = APIRouter()
 
+MAX_ROUTE_OPTIONS = 10
+CANDIDATE_FACTOR = 2  # Graph candidates considered per requested option
+
+MAX_BATCH_PAIRS = 100_000
+BATCH_CHUNK_SIZE = 2000  # Destinations per worker job (large origin groups are split)
+BATCH_DEADLINE_SECONDS = 60
+MAX_MATRIX_STATIONS = 2000  # Per side
+MAX_ISOCHRONE_MINUTES = 240
+MAX_MEETING_ORIGINS = 10
+MAX_SLOWDOWN_FACTOR = 10.0
+MAX_DISRUPTION_STATIONS = 500  # Origins/destinations per simulation (pairs grow quadratically)
+MAX_DISRUPTION_RESULTS = 200
+MAX_TRANSFER_BUFFER = 60
+
 # Load station stats
-STATS_FILE = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "station_stats.json")
-STATION_STATS = {}
-if os.path.exists(STATS_FILE):
-    with open(STATS_FILE, "r", encoding="utf-8") as f:
-        STATION_STATS = json.load(f)
+STATION_STATS = get_station_stats()
+
+# Identical concurrent searches share one computation; finished ones are cached
+search_flight = SingleFlight()
+result_cache = ResultCache()
+
+def resolve_service_day(date: Optional[str]) -> ServiceDay:
+    """Resolve the requested travel date (default: today JST) to its timetable day type."""
+    try:
+        travel_date = parse_service_date(date)
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Invalid date: {date} (expected YYYY-MM-DD)")
+    return get_service_calendar().resolve(travel_date)
+
+
+def dataset_version() -> tuple:
+    """Graph snapshot and timetable artifact versions results are computed on."""
+    timetable = get_timetable()
+    return (get_graph().snapshot_version, timetable.version if timetable else None)
+
+
+async def cached_search(key: tuple, compute, delay_aware: bool = True):
+    """
+    Serve a search from the result cache, else compute it once for all
+    concurrent identical requests and cache it.
+
+    Args:
+        compute: coroutine function producing the result
+        delay_aware: result contains delay warnings; it is dropped when the
+            delay of a railway it uses changes
+    """
+    if delay_aware:
+        result_cache.sync_delays(await run_io(get_route_delays))
+    version = dataset_version()
+    result = result_cache.get(key, version)
+    if result is not None:
+        return result
+
+    async def compute_and_store():
+        result = await compute()
+        # A reload while computing: the result may mix datasets, and storing it
+        # under the old version would wipe the entries cached for the new one
+        if dataset_version() != version:
+            return result
+        codes = ()
+        if delay_aware:
+            codes = {code for route in result.get("routes", [result]) for _, code in route_codes(route)}
+        result_cache.put(key, version, result, codes)
+        return result
+
+    # Requests arriving after a reload do not join a flight still running on the old data
+    return await search_flight.do((key, version), compute_and_store)
+
+
+def overlay_version(avoid_delays: bool):
+    """Delay overlay version a delay-aware result depends on (part of its cache key)."""
+    if not avoid_delays:
+        return None
+    overlay = get_delay_overlay()
+    return overlay.version if overlay else None
+
+
+def normalize_time(time: str) -> str:
+    """
+    Accept HHMM as well as HH:MM (service-day hours up to 26:59 allowed).
+
+    Raises:
+        HTTPException: 400 for a malformed time
+    """
+    time = time.strip()
+    if len(time) == 4 and time.isdigit():
+        time = f"{time[:2]}:{time[2:]}"
+    hours, _, minutes = time.partition(":")
+    if not (hours.isdigit() and minutes.isdigit() and len(hours) <= 2 and len(minutes) == 2):
+        raise HTTPException(status_code=400, detail=f"Invalid time: {time} (expected HH:MM)")
+    h, m = int(hours), int(minutes)
+    if m >= 60 or h * 60 + m >= MINUTES_PER_DAY + SERVICE_DAY_START:
+        raise HTTPException(status_code=400, detail=f"Invalid time: {time} (expected HH:MM)")
+    return f"{h:02d}:{m:02d}"
+
+
+async def run_search(fn, *args, **kwargs):
+    """Run a search in the search process pool (503 when overloaded, 504 past the deadline)."""
+    try:
+        return await get_search_pool().submit(fn, *args, **kwargs)
+    except SearchOverloaded:
+        raise HTTPException(status_code=503, detail="Too many searches in progress, retry shortly")
+    except SearchTimeout:
+        raise HTTPException(status_code=504, detail="Search did not finish in time")
+
 
 def get_crowd_metrics(route_segments):
     """
@@ -80,65 +192,119 @@ def get_crowd_metrics(route_segments):
 
 
 @router.get("/search")
-def search_route_api(
+async def search_route_api(
     from_station: str = Query(..., description="Departure station"),
     to_station: str = Query(..., description="Arrival station"),
-    transfer_buffer: int = Query(0, description="Additional time for transfers (minutes)")
+    transfer_buffer: int = Query(0, description="Additional time for transfers (minutes)"),
+    avoid_delays: bool = Query(False, description="Account for live delays when choosing the route"),
 ):
     """
     Find best route (shortest time) using graph search (Dijkstra).
     This returns theoretical route without actual train times.
+
+    With avoid_delays, each railway's live delay is charged once per boarding
+    (total_time stays scheduled; expected_delay is added).
     """
-    graph = get_graph()
-    result = graph.find_route(from_station, to_station, transfer_buffer=transfer_buffer)
-    return result
+    from_station, to_station = from_station.strip(), to_station.strip()
+    key = ("search", from_station, to_station, transfer_buffer, overlay_version(avoid_delays))
+    return await cached_search(key, lambda: run_search(
+        search_pool.find_route, from_station, to_station, transfer_buffer=transfer_buffer, avoid_delays=avoid_delays
+    ), delay_aware=False)
 
 
 @router.get("/search_with_times")
-def search_route_with_times_api(
+async def search_route_with_times_api(
     from_station: str = Query(..., description="Departure station"),
     to_station: str = Query(..., description="Arrival station"),
-    time: str = Query(..., description="Departure time (HH:MM)"),
-    type: str = Query("departure", description="Search type (departure/arrival)"),
+    time: str = Query(..., description="Departure time, or arrival time with type=arrival (HH:MM)"),
+    type: Literal["departure", "arrival"] = Query("departure", description="Search type (departure/arrival)"),
     transfer_buffer: int = Query(0, description="Additional time for transfers in graph search (minutes)"),
-    db: Session = Depends(get_db)
+    date: Optional[str] = Query(None, description="Travel date (YYYY-MM-DD), defaults to today"),
+    avoid_delays: bool = Query(False, description="Account for live delays when choosing the journey"),
 ):
     """
-    Find best route and map it to actual train timetable.
+    Find the earliest-arriving journey on the actual train timetable.
+
+    Uses the RAPTOR engine over the timetable artifact; falls back to mapping
+    the graph route onto trains segment by segment when the artifact is
+    missing or does not cover the stations.
+
+    With type=arrival, `time` is the arrival deadline and the latest departure
+    that still arrives by then is returned (backward scan, timetable only).
+
+    With avoid_delays (departure searches), arrivals on delayed railways are
+    shifted by their live delay while searching.
     """
+    service_day = resolve_service_day(date)
+    from_station, to_station, time = from_station.strip(), to_station.strip(), normalize_time(time)
+    key = (
+        "search_with_times", from_station, to_station, time, type, transfer_buffer, service_day.date,
+        overlay_version(avoid_delays),
+    )
+    return await cached_search(key, lambda: timed_search(
+        from_station, to_station, time, type, transfer_buffer, service_day, avoid_delays
+    ))
+
+
+async def timed_search(
+    from_station: str,
+    to_station: str,
+    time: str,
+    type: str,
+    transfer_buffer: int,
+    service_day: ServiceDay,
+    avoid_delays: bool = False,
+) -> dict:
+    """Body of /search_with_times (shared by coalesced and cached requests)."""
     graph = get_graph()
-    
-    # 1. Find best route structure (railways and transfer stations)
-    route_result = graph.find_route(from_station, to_station, transfer_buffer=transfer_buffer)
-    
-    station_map = {}
-    if hasattr(graph, "station_info"):
-        for station_id, info in graph.station_info.items():
-            name_ja = info.get("name_ja", "")
-            name_en = info.get("name_en", "")
-            if name_ja and name_en:
-                station_map[name_ja] = name_en
-            # Also map English to English for consistency
-            if name_en:
-                station_map[name_en] = name_en
-    
-    # 3. Find actual trains for each segment
-    weekday_type = "Weekday"  # Default to weekday for now
-    
-    # Ensure time is in HH:MM format
-    if len(time) == 4 and time.isdigit():
-        time = f"{time[:2]}:{time[2:]}"
+    weekday_type = service_day.day_type
+
+    result = None
+    timetable = get_timetable()
+    if type == "arrival":
+        if timetable is None:
+            raise HTTPException(status_code=503, detail="Timetable artifact is not available")
+        result = await run_search(
+            search_pool.arrive_by, from_station, to_station, time, weekday_type
+        ) or {"error": f"No journey arrives by {time}"}
+    elif timetable is not None:
+        # Busiest pairs: precomputed journeys; popular origins: transfer patterns; else full RAPTOR
+        # (precomputed journeys assume the schedule, so delay-aware searches skip them)
+        result = (None if avoid_delays else await run_cpu(
+            search_popular, timetable, graph, from_station, to_station, time, weekday_type, transfer_buffer=5
+        )) or await run_search(
+            search_pool.timetable_journey, from_station, to_station, time, weekday_type, avoid_delays
+        )
+
+    if result is None:
+        # 1. Find best route structure (railways and transfer stations)
+        route_result = await run_search(
+            search_pool.find_route, from_station, to_station, transfer_buffer=transfer_buffer,
+            avoid_delays=avoid_delays,
+        )
         
-    result = search_route_with_times(
-        db, 
-        route_result, 
-        time, 
-        weekday_type, 
-        transfer_buffer=5,
-        station_name_map=station_map
-    )
+        station_map = {}
+        if hasattr(graph, "station_info"):
+            for station_id, info in graph.station_info.items():
+                name_ja = info.get("name_ja", "")
+                name_en = info.get("name_en", "")
+                if name_ja and name_en:
+                    station_map[name_ja] = name_en
+                # Also map English to English for consistency
+                if name_en:
+                    station_map[name_en] = name_en
+        
+        # 2. Find actual trains for each segment (on the I/O pool, own session)
+        result = (await search_routes_with_times(
+            [route_result],
+            time,
+            weekday_type,
+            transfer_buffer=5,
+            station_name_map=station_map
+        ))[0]
     
-    # 4. Check for delays on routes used
+    # 4. Check for delays on routes used (GTFS-RT is refreshed off the event loop)
+    await run_io(get_route_delays)
     delay_warnings = []
     segments = result.get("segments", [])
     checked_railways = set()
@@ -157,32 +323,107 @@ def search_route_with_times_api(
                 })
     
     result["delay_warnings"] = delay_warnings
+    result["service_date"] = service_day.date.isoformat()
+    result["day_type"] = weekday_type
     
     return result
 
 
+@router.get("/search_profile")
+async def search_profile_api(
+    from_station: str = Query(..., description="Departure station"),
+    to_station: str = Query(..., description="Arrival station"),
+    time: str = Query(..., description="Start of the departure window (HH:MM)"),
+    end_time: Optional[str] = Query(None, description="End of the departure window (HH:MM), defaults to the end of service"),
+    date: Optional[str] = Query(None, description="Travel date (YYYY-MM-DD), defaults to today"),
+):
+    """
+    Every optimal journey leaving within a time window, plus the last train.
+
+    One rRAPTOR pass replaces repeated /search_with_times calls with shifted times.
+    """
+    timetable = get_timetable()
+    if timetable is None:
+        raise HTTPException(status_code=503, detail="Timetable artifact is not available")
+
+    from_station, to_station, time = from_station.strip(), to_station.strip(), normalize_time(time)
+    end_time = normalize_time(end_time) if end_time else None
+
+    service_day = resolve_service_day(date)
+    result = await run_search(
+        search_pool.profile, from_station, to_station, time, end_time, service_day.day_type
+    )
+    if result is None:
+        raise HTTPException(status_code=404, detail="Station not found in timetable")
+
+    result["service_date"] = service_day.date.isoformat()
+    result["day_type"] = service_day.day_type
+    return result
+
+
+@router.get("/metrics")
+async def get_metrics_api():
+    """Search pool load (queue depth, timeouts, rejections, latencies), request coalescing and the result cache."""
+    return {
+        "search_pool": get_search_pool().metrics(),
+        "coalescing": search_flight.metrics(),
+        "result_cache": result_cache.metrics(),
+    }
+
+
 @router.get("/delays")
-def get_delays_api():
+async def get_delays_api():
     """Get current delay summary for all routes."""
-    return get_delay_summary()
+    return await run_io(get_delay_summary)
 
 
 @router.get("/search_multi")
-def search_multi_route_api(
+async def search_multi_route_api(
     from_station: str = Query(..., description="Departure station"),
     to_station: str = Query(..., description="Arrival station"),
     time: str = Query(..., description="Departure time (HH:MM)"),
-    db: Session = Depends(get_db)
+    date: Optional[str] = Query(None, description="Travel date (YYYY-MM-DD), defaults to today"),
+    limit: int = Query(3, ge=1, le=MAX_ROUTE_OPTIONS, description="Number of route options"),
 ):
     """
-    Find multiple route options with different transfer trade-offs.
-    Returns up to 3 unique routes sorted by actual arrival time.
+    Find multiple route options with different trade-offs.
+    Returns up to `limit` unique routes sorted by actual arrival time.
+
+    With the timetable artifact, one McRAPTOR search returns the Pareto set over
+    arrival, transfers, delay risk and fare, and the fastest, fewest-transfer,
+    lowest-risk and cheapest options are picked from it. Otherwise the graph's
+    alternative routes are mapped onto trains, best lower bound first, and
+    candidates that cannot make the top `limit` are abandoned early.
     """
+    service_day = resolve_service_day(date)
+    from_station, to_station, search_time = from_station.strip(), to_station.strip(), normalize_time(time)
+    key = ("search_multi", from_station, to_station, search_time, limit, service_day.date)
+    return await cached_search(key, lambda: multi_search(
+        from_station, to_station, search_time, limit, service_day
+    ))
+
+
+async def multi_search(from_station: str, to_station: str, search_time: str, limit: int, service_day: ServiceDay) -> dict:
+    """Body of /search_multi (shared by coalesced and cached requests)."""
     graph = get_graph()
+    weekday_type = service_day.day_type
     
+    candidates = []
+    timetable = get_timetable()
+    pareto = None
+    if timetable is not None:
+        pareto = await run_search(
+            search_pool.multi, from_station, to_station, search_time, weekday_type, limit=limit
+        )
+    if pareto:
+        for timed_result in pareto:
+            timed_result["_arrival"] = timed_result["segments"][-1]["arrival_time"]
+            timed_result["transfer_buffer_used"] = 5
+            candidates.append(timed_result)
+
     # Build station name map
     station_map = {}
-    if hasattr(graph, "station_info"):
+    if not pareto and hasattr(graph, "station_info"):
         for station_id, info in graph.station_info.items():
             name_ja = info.get("name_ja", "")
             name_en = info.get("name_en", "")
@@ -191,24 +432,18 @@ def search_multi_route_api(
             if name_en:
                 station_map[name_en] = name_en
     
-    # Ensure time format
-    search_time = time
-    if len(time) == 4 and time.isdigit():
-        search_time = f"{time[:2]}:{time[2:]}"
-    
-    # Use iterative penalty method to find up to 3 distinct routes
-    candidates = []
+    # Fallback: iterative penalty method; extra candidates are cheap thanks to pruning
+    theoretical_routes = [] if pareto else await run_search(
+        search_pool.find_routes, from_station, to_station, limit=limit * CANDIDATE_FACTOR, transfer_buffer=5
+    )
     
-    # Find theoretical routes first
-    theoretical_routes = graph.find_routes(from_station, to_station, limit=3, transfer_buffer=5)
+    # Map all candidates onto trains concurrently, pruning against the limit-th best arrival
+    timed_results = await search_routes_with_times(
+        theoretical_routes, search_time, weekday_type,
+        transfer_buffer=5, station_name_map=station_map, limit=limit
+    )
     
-    for route_result in theoretical_routes:
-        # Apply timetable
-        timed_result = search_route_with_times(
-            db, route_result, search_time, "Weekday",
-            transfer_buffer=5, station_name_map=station_map
-        )
-        
+    for timed_result in timed_results:
         if "error" in timed_result:
             continue
         
@@ -222,26 +457,32 @@ def search_multi_route_api(
                 timed_result["transfer_buffer_used"] = 5
                 candidates.append(timed_result)
     
-    # Sort by arrival time
-    candidates.sort(key=lambda x: x.get("_arrival", "99:99"))
-    top_routes = candidates[:3]
+    # Sort by arrival time (service-day clock, so 00:10 comes after 23:50)
+    candidates.sort(key=lambda x: service_minutes(x.get("_arrival", "02:59")))
+    top_routes = candidates[:limit]
     
     # Clean up internal fields and add delay warnings
-    current_date = datetime.now().date().isoformat()
-    departure_time_str = f"{current_date}T{search_time}"
+    departure_time_str = f"{service_day.date.isoformat()}T{search_time}"
+
+    # Risk: each railway's delay history is read once for all routes
+    risks = await get_routes_risk(top_routes, departure_time_str)
+    await run_io(get_route_delays)
+    railway_delays = {}
 
-    for route in top_routes:
+    for route, risk in zip(top_routes, risks):
         route.pop("_arrival", None)
         
         # Add risk score
-        route["risk"] = get_route_risk(route, departure_time_str)
+        route["risk"] = risk
         
         # Add delay warnings
         delay_warnings = []
         for segment in route.get("segments", []):
             railway = segment.get("railway", "")
             if railway:
-                delay_sec = check_route_delay(railway)
+                if railway not in railway_delays:
+                    railway_delays[railway] = check_route_delay(railway)
+                delay_sec = railway_delays[railway]
                 if delay_sec:
                     delay_warnings.append({
                         "railway": railway,
@@ -254,4 +495,291 @@ def search_multi_route_api(
         route["crowd"] = get_crowd_metrics(route.get("segments", []))
 
     
-    return {"routes": top_routes, "total_found": len(candidates)}
+    return {
+        "routes": top_routes,
+        "total_found": len(candidates),
+        "service_date": service_day.date.isoformat(),
+        "day_type": weekday_type
+    }
+
+
+class BatchPair(BaseModel):
+    from_station: str
+    to_station: str
+    time: Optional[str] = None  # Departure time (HH:MM); graph route if omitted
+
+
+class BatchSearchRequest(BaseModel):
+    pairs: List[BatchPair]
+    transfer_buffer: int = 0
+    date: Optional[str] = None
+
+
+async def stream_batch(groups: Dict[str, list], transfer_buffer: int, weekday_type: str):
+    """Run origin groups on the search pool and yield NDJSON lines as each group finishes."""
+    pool = get_search_pool()
+    slots = asyncio.Semaphore(max(pool.processes, 1))  # Leave queue room for interactive searches
+
+    async def run_group(origin: str, items: list):
+        async with slots:
+            try:
+                results = await pool.submit(
+                    search_pool.batch_routes, origin, items, transfer_buffer, weekday_type,
+                    deadline=BATCH_DEADLINE_SECONDS,
+                )
+            except SearchOverloaded:
+                results = [(index, {"error": "Search capacity exceeded"}) for index, _, _ in items]
+            except SearchTimeout:
+                results = [(index, {"error": "Search did not finish in time"}) for index, _, _ in items]
+        return origin, items, results
+
+    tasks = [
+        asyncio.ensure_future(run_group(origin, items[i:i + BATCH_CHUNK_SIZE]))
+        for origin, items in groups.items()
+        for i in range(0, len(items), BATCH_CHUNK_SIZE)
+    ]
+    try:
+        for done in asyncio.as_completed(tasks):
+            origin, items, results = await done
+            pairs = {index: (to_station, time) for index, to_station, time in items}
+            yield "".join(
+                json.dumps({
+                    "index": index,
+                    "from_station": origin,
+                    "to_station": pairs[index][0],
+                    "time": pairs[index][1],
+                    "result": result,
+                }, ensure_ascii=False) + "\n"
+                for index, result in results
+            )
+    finally:
+        # Client went away: drop the groups that have not started
+        for task in tasks:
+            task.cancel()
+
+
+@router.post("/search/batch")
+async def search_batch_api(request: BatchSearchRequest):
+    """
+    Route many (from, to[, time]) pairs in one request.
+
+    Pairs are grouped by origin and each group runs as one one-to-many search
+    on the search pool (a shared Dijkstra tree for graph routes, one RAPTOR
+    pass per departure time for timed ones). Results stream back as NDJSON,
+    one line per pair with its `index` in the request, in completion order.
+    """
+    if len(request.pairs) > MAX_BATCH_PAIRS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_PAIRS} pairs per batch")
+    service_day = resolve_service_day(request.date)
+
+    groups: Dict[str, list] = {}
+    for index, pair in enumerate(request.pairs):
+        time = normalize_time(pair.time) if pair.time else None
+        groups.setdefault(pair.from_station.strip(), []).append((index, pair.to_station.strip(), time))
+
+    return StreamingResponse(
+        stream_batch(groups, request.transfer_buffer, service_day.day_type),
+        media_type="application/x-ndjson",
+    )
+
+
+class MatrixRequest(BaseModel):
+    from_stations: List[str]
+    to_stations: List[str]
+    transfer_buffer: int = 0
+    transfers: bool = False  # Also return transfer counts
+    format: str = "json"  # json / binary
+
+
+def from_bytes(raw: bytes, typecode: str) -> array:
+    values = array(typecode)
+    values.frombytes(raw)
+    return values
+
+
+def little_endian(values: array) -> bytes:
+    if sys.byteorder == "big":
+        values = array(values.typecode, values)
+        values.byteswap()
+    return values.tobytes()
+
+
+@router.post("/matrix")
+async def matrix_api(request: MatrixRequest):
+    """
+    Travel-time matrix (graph minutes) from every origin to every destination.
+
+    One full search per origin, origins split across the search pool. With
+    format=binary the body is the row-major float32 little-endian times
+    (NaN = unknown or unreachable), followed by int16 transfer counts (-1
+    there) if requested; the shape is in the X-Matrix-Shape header.
+    """
+    origins = [s.strip() for s in request.from_stations]
+    destinations = [s.strip() for s in request.to_stations]
+    if len(origins) > MAX_MATRIX_STATIONS or len(destinations) > MAX_MATRIX_STATIONS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_MATRIX_STATIONS} stations per side")
+    if request.format not in ("json", "binary"):
+        raise HTTPException(status_code=400, detail="format must be json or binary")
+
+    chunk = max(1, math.ceil(len(origins) / max(get_search_pool().processes, 1)))
+    parts = await asyncio.gather(*(
+        run_search(
+            search_pool.matrix_rows, origins[i:i + chunk], destinations, request.transfer_buffer, request.transfers,
+            deadline=BATCH_DEADLINE_SECONDS,
+        )
+        for i in range(0, len(origins), chunk)
+    ))
+    times = from_bytes(b"".join(p[0] for p in parts), "f")
+    transfers = from_bytes(b"".join(p[1] for p in parts), "h") if request.transfers else None
+
+    if request.format == "binary":
+        headers = {"X-Matrix-Shape": f"{len(origins)},{len(destinations)}", "X-Matrix-Times": "float32-le"}
+        body = little_endian(times)
+        if transfers is not None:
+            headers["X-Matrix-Transfers"] = "int16-le"
+            body += little_endian(transfers)
+        return Response(content=body, media_type="application/octet-stream", headers=headers)
+
+    m = len(destinations)
+    result = {
+        "from_stations": origins,
+        "to_stations": destinations,
+        "times": [
+            [None if math.isnan(t) else round(t, 1) for t in times[i * m:(i + 1) * m]]
+            for i in range(len(origins))
+        ],
+    }
+    if transfers is not None:
+        result["transfers"] = [
+            [None if c < 0 else c for c in transfers[i * m:(i + 1) * m]] for i in range(len(origins))
+        ]
+    return result
+
+
+@router.get("/isochrone")
+async def isochrone_api(
+    from_station: str = Query(..., description="Departure station"),
+    minutes: str = Query("30", description="Time limit in minutes; comma-separated for rings (e.g. 15,30,45)"),
+    time: Optional[str] = Query(None, description="Departure time (HH:MM); timetable-aware if given"),
+    transfer_buffer: int = Query(0, description="Additional time for transfers (minutes, graph mode)"),
+    date: Optional[str] = Query(None, description="Travel date (YYYY-MM-DD, default: today JST)")
+):
+    """
+    Every station reachable within the time limit, with time and transfers.
+
+    One bounded search up to the largest limit; each station is assigned to
+    the smallest ring that contains it.
+    """
+    try:
+        rings = sorted({int(m) for m in minutes.split(",") if m.strip()})
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Invalid minutes: {minutes}")
+    if not rings or rings[0] <= 0 or rings[-1] > MAX_ISOCHRONE_MINUTES:
+        raise HTTPException(status_code=400, detail=f"minutes must be between 1 and {MAX_ISOCHRONE_MINUTES}")
+
+    from_station = from_station.strip()
+    weekday_type, service_date = "Weekday", None
+    if time:
+        time = normalize_time(time)
+        service_day = resolve_service_day(date)
+        weekday_type, service_date = service_day.day_type, service_day.date
+    key = ("isochrone", from_station, rings[-1], transfer_buffer, time, service_date)
+    result = await cached_search(key, lambda: run_search(
+        search_pool.isochrone, from_station, rings[-1], transfer_buffer, time, weekday_type
+    ), delay_aware=False)
+    if result is None:
+        raise HTTPException(status_code=404, detail=f"Station not found: {from_station}")
+
+    stations = []
+    counts = dict.fromkeys(rings, 0)
+    for station in result["stations"]:
+        ring = next(r for r in rings if station["time"] <= r)
+        counts[ring] += 1
+        stations.append({**station, "ring": ring})
+    response = {
+        "from": from_station,
+        "mode": result["mode"],
+        "max_minutes": rings[-1],
+        "rings": [{"minutes": r, "count": counts[r]} for r in rings],
+        "stations": stations,
+    }
+    if result["mode"] == "timetable":
+        response.update({"time": time, "service_date": service_date.isoformat(), "day_type": weekday_type})
+    return response
+
+
+@router.get("/meeting_point")
+async def meeting_point_api(
+    stations: str = Query(..., description="Origin stations, comma-separated (e.g. 大宮,横浜,船橋)"),
+    objective: str = Query("max", description="Minimize the longest (max) or total (sum) travel time"),
+    limit: int = Query(5, description="Number of candidate stations"),
+    transfer_buffer: int = Query(0, description="Additional time for transfers (minutes)")
+):
+    """
+    Best stations for a group to meet, with each person's travel time (graph minutes).
+
+    One one-to-all search per origin; candidates are ranked by the longest
+    or the total of the per-person times.
+    """
+    origins = [s.strip() for s in stations.split(",") if s.strip()]
+    if not 2 <= len(origins) <= MAX_MEETING_ORIGINS:
+        raise HTTPException(status_code=400, detail=f"Give 2 to {MAX_MEETING_ORIGINS} origin stations")
+    if objective not in ("max", "sum"):
+        raise HTTPException(status_code=400, detail="objective must be max or sum")
+    limit = max(1, min(limit, 50))
+
+    key = ("meeting_point", tuple(origins), objective, limit, transfer_buffer)
+    result = await cached_search(key, lambda: run_search(
+        search_pool.meeting_point, origins, objective, limit, transfer_buffer
+    ), delay_aware=False)
+    if "error" in result:
+        return result
+    return {"origins": origins, **result}
+
+
+class DisruptionRequest(BaseModel):
+    close: List[str] = []  # Suspended railways (id or name)
+    slow: Dict[str, float] = {}  # Railway (id or name) -> travel time factor (>= 1)
+    close_sections: List[List[str]] = []  # [station, station] sections closed in both directions
+    top: int = Field(200, ge=1, le=MAX_DISRUPTION_STATIONS)  # Busiest stations used as origins/destinations
+    transfer_buffer: int = Field(0, ge=0, le=MAX_TRANSFER_BUFFER)
+    limit: int = Field(20, ge=1, le=MAX_DISRUPTION_RESULTS)
+
+
+@router.post("/simulate/disruption")
+async def simulate_disruption_api(request: DisruptionRequest):
+    """
+    What-if simulation of a suspension or slowdown over all OD pairs of the chosen stations.
+
+    Returns the pairs that get slower or unreachable, demand-weighted by
+    station_stats.json, and the most affected pairs and stations.
+    """
+    graph = get_graph()
+    try:
+        scenario = {
+            "close": disruption.resolve_railways(graph, request.close),
+            "slow": dict(zip(disruption.resolve_railways(graph, request.slow), request.slow.values())),
+            "close_sections": [],
+        }
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    for section in request.close_sections:
+        if len(section) != 2:
+            raise HTTPException(status_code=400, detail="close_sections entries must be [station, station]")
+        scenario["close_sections"].append([s.strip() for s in section])
+    if any(not 1 <= f <= MAX_SLOWDOWN_FACTOR for f in scenario["slow"].values()):
+        raise HTTPException(status_code=400, detail=f"slow factors must be between 1 and {MAX_SLOWDOWN_FACTOR}")
+    if not (scenario["close"] or scenario["slow"] or scenario["close_sections"]):
+        raise HTTPException(status_code=400, detail="Scenario is empty")
+
+    stations = disruption.od_stations(graph, request.top)
+    chunk = max(1, math.ceil(len(stations) / max(get_search_pool().processes, 1)))
+    parts = await asyncio.gather(*(
+        run_search(
+            search_pool.disruption, stations[i:i + chunk], stations, scenario, request.transfer_buffer,
+            deadline=BATCH_DEADLINE_SECONDS,
+        )
+        for i in range(0, len(stations), chunk)
+    ))
+    changed = [pair for part in parts for pair in part]
+    return {"scenario": scenario, **disruption.summarize(stations, changed, request.limit)}
@@ -3,15 +3,19 @@
 Stations and Railways API router.
 """
 from fastapi import APIRouter
+from services.executors import run_cpu
 from services.route_graph import get_graph
 
 router = APIRouter()
 
 
 @router.get("/stations")
-def get_stations():
+async def get_stations():
     """Get all available stations in the graph."""
-    graph = get_graph()
+    return await run_cpu(station_names, get_graph())
+
+
+def station_names(graph):
     stations = set()
     
     # Extract unique station names
@@ -24,9 +28,12 @@ def get_stations():
 
 
 @router.get("/railways")
-def get_railways():
+async def get_railways():
     """Get all available railways."""
-    graph = get_graph()
+    return await run_cpu(railway_ids, get_graph())
+
+
+def railway_ids(graph):
     railways = set()
     
     # Extract unique railway names from edges
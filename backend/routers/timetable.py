@@ -3,36 +3,39 @@
 Timetable API router.
 """
 from fastapi import APIRouter, Depends, Query, HTTPException
-from sqlalchemy.orm import Session
-from db.database import get_db
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from db.database import get_async_db
 from db.models import StationDeparture
+from services.timetable.utils import time_to_minutes
 from typing import Optional
 
 router = APIRouter()
 
 
 @router.get("/departures")
-def get_departures(
+async def get_departures(
     station: Optional[str] = Query(None, description="Station name (e.g., Tokyo)"),
     railway: Optional[str] = Query(None, description="Railway name (e.g., ChuoRapid)"),
     time: Optional[str] = Query(None, description="Time after (HH:MM)"),
     limit: int = 20,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Get station departures from database.
     This is useful for debugging timetable data.
     """
-    query = db.query(StationDeparture)
+    query = select(StationDeparture)
     
     if station:
-        query = query.filter(StationDeparture.station_name.ilike(f"%{station}%"))
+        query = query.where(StationDeparture.station_name.ilike(f"%{station}%"))
     if railway:
-        query = query.filter(StationDeparture.railway_name.ilike(f"%{railway}%"))
+        query = query.where(StationDeparture.railway_name.ilike(f"%{railway}%"))
     if time:
-        query = query.filter(StationDeparture.departure_time >= time)
+        query = query.where(StationDeparture.departure_minutes >= time_to_minutes(time))
         
-    departures = query.order_by(StationDeparture.departure_time).limit(limit).all()
+    result = await db.execute(query.order_by(StationDeparture.departure_minutes).limit(limit))
+    departures = result.scalars().all()
     
     return [
         {
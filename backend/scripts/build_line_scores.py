@@ -0,0 +1,23 @@
+import sys
+from pathlib import Path
+
+# Add backend to path
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from db.database import SessionLocal
+from services.line_scores import LINE_SCORES_PATH, build_line_scores, write_line_scores
+
+
+def main():
+    """Precompute per-line delay risk from delay_logs for multi-criteria search."""
+    db = SessionLocal()
+    try:
+        scores = build_line_scores(db)
+        write_line_scores(scores)
+        print(f"Line scores for {len(scores['risk'])} railways -> {LINE_SCORES_PATH}")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
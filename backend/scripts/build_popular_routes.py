@@ -0,0 +1,50 @@
+"""
+Precompute journeys between the busiest stations at fixed departure times.
+
+Run after the timetable artifact has been (re)built. Stations are the top
+entries of data/station_stats.json; each origin is searched in its own process.
+"""
+import argparse
+import sys
+from pathlib import Path
+
+# Add backend to path
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from services.route_graph import initialize_graph, get_graph
+from services.station_stats import top_stations
+from services.timetable.artifact import get_timetable
+from services.timetable.popular_routes import BUCKET_MINUTES, build_popular_routes
+from services.timetable.raptor import resolve_stops
+
+DEFAULT_STATIONS = 30
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--stations", type=int, default=DEFAULT_STATIONS, help="Number of busiest stations to cover")
+    parser.add_argument("--bucket", type=int, default=BUCKET_MINUTES, help="Departure bucket size (minutes)")
+    parser.add_argument("--processes", type=int, default=None, help="Worker processes (default: all cores)")
+    args = parser.parse_args()
+
+    tt = get_timetable()
+    if tt is None:
+        print("Timetable artifact not found; run scripts/build_timetable_artifact.py first.")
+        return
+    initialize_graph()
+    graph = get_graph()
+
+    stations = {}
+    for name in top_stations(args.stations):
+        stops = resolve_stops(tt, graph, name)
+        if stops:
+            stations[name] = stops
+        else:
+            print(f"  {name}: not in the timetable, skipped")
+
+    print(f"Precomputing journeys between {len(stations)} stations every {args.bucket} minutes...")
+    build_popular_routes(stations, bucket_minutes=args.bucket, processes=args.processes)
+
+
+if __name__ == "__main__":
+    main()
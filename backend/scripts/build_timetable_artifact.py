@@ -0,0 +1,22 @@
+import sys
+from pathlib import Path
+
+# Add backend to path
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from db.database import SessionLocal
+from services.timetable.artifact import ARTIFACT_PATH, build_artifact
+
+
+def main():
+    """Rebuild the memory-mapped timetable artifact from the database."""
+    db = SessionLocal()
+    try:
+        path = sys.argv[1] if len(sys.argv) > 1 else ARTIFACT_PATH
+        build_artifact(db, path)
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
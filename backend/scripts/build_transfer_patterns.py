@@ -0,0 +1,49 @@
+"""
+Precompute transfer patterns for the busiest origin stations.
+
+Run after the timetable artifact has been (re)built. Hubs are the top
+stations of data/station_stats.json; each hub is searched in its own process.
+"""
+import argparse
+import sys
+from pathlib import Path
+
+# Add backend to path
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from services.route_graph import initialize_graph, get_graph
+from services.station_stats import top_stations
+from services.timetable.artifact import get_timetable
+from services.timetable.raptor import resolve_stops
+from services.timetable.transfer_patterns import build_transfer_patterns, stop_key
+
+DEFAULT_HUBS = 30
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--hubs", type=int, default=DEFAULT_HUBS, help="Number of busiest stations to cover")
+    parser.add_argument("--processes", type=int, default=None, help="Worker processes (default: all cores)")
+    args = parser.parse_args()
+
+    tt = get_timetable()
+    if tt is None:
+        print("Timetable artifact not found; run scripts/build_timetable_artifact.py first.")
+        return
+    initialize_graph()
+    graph = get_graph()
+
+    hubs = {}
+    for name in top_stations(args.hubs):
+        stops = resolve_stops(tt, graph, name)
+        if stops:
+            hubs.setdefault(stop_key(tt, stops[0]), stops)
+        else:
+            print(f"  {name}: not in the timetable, skipped")
+
+    print(f"Building transfer patterns for {len(hubs)} hubs...")
+    build_transfer_patterns(hubs, processes=args.processes)
+
+
+if __name__ == "__main__":
+    main()
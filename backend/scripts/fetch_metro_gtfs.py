@@ -1,49 +1,63 @@
 import requests
 import os
-import zipfile
-import io
+import sys
 from pathlib import Path
 from dotenv import load_dotenv
 
+# Add backend to path
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from services.constants import GTFS_FEEDS
+from services.gtfs_loader import GTFS_DIR, feed_zip_path
+
 # Load .env explicitly
 env_path = Path(__file__).resolve().parent.parent.parent / ".env"
 load_dotenv(env_path)
 
 API_KEY = os.getenv("ODPT_ACCESS_TOKEN")
-BASE_URL = "https://api.odpt.org/api/v4"
-DATA_DIR = Path(__file__).resolve().parent.parent / "data" / "metro_gtfs"
+CHUNK_SIZE = 1 << 16
+
+
+def fetch_gtfs(operator: str):
+    """Stream an operator's GTFS zip to data/gtfs/<operator>.zip (kept compressed)."""
+    config = GTFS_FEEDS[operator]
+    file_url = config["url"]
+    params = {"acl:consumerKey": API_KEY} if API_KEY else {}
+
+    print(f"Downloading {operator} GTFS from {file_url}...")
+
+    dest = Path(feed_zip_path(operator))
+    tmp = dest.with_suffix(".zip.part")
 
-def fetch_metro_gtfs():
-    if not API_KEY:
-        print("Error: ODPT_ACCESS_TOKEN not set")
-        return
-
-    file_url = f"{BASE_URL}/files/TokyoMetro/data/TokyoMetro-Train-GTFS.zip"
-    params = {"acl:consumerKey": API_KEY}
-    
-    print(f"Downloading Tokyo Metro GTFS from {file_url}...")
-    
     try:
-        resp = requests.get(file_url, params=params, stream=True)
-        resp.raise_for_status()
-        
-        # Create directory
-        DATA_DIR.mkdir(parents=True, exist_ok=True)
-        
-        # Extract
-        print("Extracting to", DATA_DIR)
-        with zipfile.ZipFile(io.BytesIO(resp.content)) as z:
-            z.extractall(DATA_DIR)
-            
-        print("Done!")
-        
-        # List files
-        print("Extracted files:")
-        for f in DATA_DIR.glob("*"):
-            print(f" - {f.name}")
-            
+        Path(GTFS_DIR).mkdir(parents=True, exist_ok=True)
+
+        with requests.get(file_url, params=params, stream=True, timeout=60) as resp:
+            resp.raise_for_status()
+            size = 0
+            with open(tmp, "wb") as f:
+                for chunk in resp.iter_content(chunk_size=CHUNK_SIZE):
+                    f.write(chunk)
+                    size += len(chunk)
+
+        # Atomic swap so readers never see a half-written archive
+        os.replace(tmp, dest)
+        print(f"  Saved {dest} ({size // 1024} KB)")
+
     except Exception as e:
         print(f"Failed: {e}")
+        if tmp.exists():
+            tmp.unlink()
+
+
+def fetch_metro_gtfs():
+    fetch_gtfs("TokyoMetro")
+
 
 if __name__ == "__main__":
-    fetch_metro_gtfs()
+    if not API_KEY:
+        print("Warning: ODPT_ACCESS_TOKEN not set")
+
+    operators = sys.argv[1:] or list(GTFS_FEEDS)
+    for operator in operators:
+        fetch_gtfs(operator)
@@ -0,0 +1,82 @@
+"""
+Migrate a pre-normalization data.db: station_departures table -> stops / routes / trips / stop_times.
+
+Consecutive rows of the same train (railway, train number, day type, direction)
+become one trip. The legacy table is dropped, replaced by the compatibility
+view, and the file is vacuumed to release the freed pages.
+"""
+import os
+import sys
+from pathlib import Path
+from sqlalchemy import inspect, text
+
+# Add backend to path
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from db.database import DB_PATH, SessionLocal, engine
+from db.schema import ensure_schema
+from db.timetable_store import TimetableWriter
+
+LEGACY_TABLE = "station_departures_legacy"
+CHUNK_SIZE = 20000
+TRIP_FIELDS = ("railway_id", "railway_name", "train_number", "weekday_type", "direction")
+
+
+def migrate():
+    tables = inspect(engine).get_table_names()
+    if "station_departures" not in tables and LEGACY_TABLE not in tables:
+        print("Nothing to migrate (station_departures is already a view).")
+        return
+
+    size_before = os.path.getsize(DB_PATH)
+
+    with engine.begin() as conn:
+        if "station_departures" in tables:
+            conn.execute(text(f"ALTER TABLE station_departures RENAME TO {LEGACY_TABLE}"))
+    ensure_schema(engine)
+
+    db = SessionLocal()
+    try:
+        writer = TimetableWriter(db)
+        writer.clear()
+
+        # Read in insertion order (fetch scripts wrote each train's stops together),
+        # in id-keyed chunks so writer commits never invalidate an open cursor
+        train = []
+        last_id = 0
+        while True:
+            rows = db.execute(text(
+                f"SELECT id, station_id, station_name, railway_id, railway_name, direction, departure_time, "
+                f"train_type, destination_station, train_number, weekday_type FROM {LEGACY_TABLE} "
+                f"WHERE id > :last_id ORDER BY id LIMIT :chunk"
+            ), {"last_id": last_id, "chunk": CHUNK_SIZE}).mappings().all()
+            if not rows:
+                break
+            last_id = rows[-1]["id"]
+
+            for row in rows:
+                if not row["departure_time"]:
+                    continue
+                if train and any(train[0][k] != row[k] for k in TRIP_FIELDS):
+                    writer.add_train(train)
+                    train = []
+                train.append(row)
+        if train:
+            writer.add_train(train)
+        writer.flush()
+
+        print(f"Migrated {writer.stop_time_count} departures into {writer.trip_count} trips")
+    finally:
+        db.close()
+
+    with engine.begin() as conn:
+        conn.execute(text(f"DROP TABLE {LEGACY_TABLE}"))
+    with engine.connect() as conn:
+        conn.execution_options(isolation_level="AUTOCOMMIT").execute(text("VACUUM"))
+
+    size_after = os.path.getsize(DB_PATH)
+    print(f"data.db: {size_before // 1024} KB -> {size_after // 1024} KB")
+
+
+if __name__ == "__main__":
+    migrate()
@@ -0,0 +1,17 @@
+import sys
+from pathlib import Path
+
+# Add backend to path
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from services.route_graph import reload_graph
+
+
+def main():
+    """Rebuild the route graph and publish it; running workers switch over on their next request."""
+    version = reload_graph()
+    print(f"Current route graph version: {version}")
+
+
+if __name__ == "__main__":
+    main()
@@ -6,7 +6,7 @@ from pathlib import Path
 sys.path.append(str(Path(__file__).resolve().parent.parent))
 
 from services.fetch_timetables import get_db_session, fetch_train_timetables, parse_train_timetable
-from db.models import StationDeparture
+from db.timetable_store import TimetableWriter
 
 def refetch_chuosobu():
     print("Force re-fetching Chuo-Sobu Local timetable...")
@@ -16,13 +16,13 @@ def refetch_chuosobu():
     railway_name = "ChuoSobuLocal"
     
     session, _ = get_db_session()
+    writer = TimetableWriter(session)
     
     try:
         # 1. Clear existing data for ChuoSobuLocal ONLY
         print(f"Clearing existing data for {railway_name}...")
-        deleted = session.query(StationDeparture).filter(StationDeparture.railway_name == railway_name).delete()
-        print(f"Deleted {deleted} records.")
-        session.commit()
+        deleted = writer.delete_railways([railway_name])
+        print(f"Deleted {deleted} trains.")
         
         # 2. Fetch new data (Split by Calendar to avoid 1000 limit)
         calendars = [
@@ -66,12 +66,10 @@ def refetch_chuosobu():
         railway_records = 0
         for train in all_trains:
             records = parse_train_timetable(train)
-            for rec in records:
-                db_record = StationDeparture(**rec)
-                session.add(db_record)
-                railway_records += 1
+            writer.add_train(records)
+            railway_records += len(records)
         
-        session.commit()
+        writer.flush()
         print(f"Inserted {railway_records} records.")
         
     except Exception as e:
@@ -137,3 +137,45 @@ ROUTE_CODE_TO_DISPLAY_NAME = {
 
 ODPT_BASE_URL = "https://api-challenge.odpt.org/api/v4"
 GTFS_RT_URL = "https://api-challenge.odpt.org/api/v4/gtfs/realtime/jreast_odpt_train_trip_update"
+
+
+# ==============================================================================
+# GTFS Static Feeds
+# ==============================================================================
+
+# One entry per operator publishing a static GTFS feed.
+# - url: download location (ODPT files API, consumer key appended at fetch time)
+# - line_codes: stop_code prefix -> railway suffix, used to place each stop on
+#   its line. Feeds without station numbering can omit it; the railway is then
+#   inferred from the first trip serving the stop.
+# - legacy_dir: previously extracted feed directory under data/ (optional)
+GTFS_FEEDS = {
+    "TokyoMetro": {
+        "url": "https://api.odpt.org/api/v4/files/TokyoMetro/data/TokyoMetro-Train-GTFS.zip",
+        "line_codes": {
+            "G": "Ginza", "M": "Marunouchi", "m": "Marunouchi", "H": "Hibiya",
+            "T": "Tozai", "C": "Chiyoda", "Y": "Yurakucho", "Z": "Hanzomon",
+            "N": "Namboku", "F": "Fukutoshin",
+        },
+        "legacy_dir": "metro_gtfs",
+    },
+    "Toei": {
+        "url": "https://api-public.odpt.org/api/v4/files/Toei/data/Toei-Train-GTFS.zip",
+        "line_codes": {"A": "Asakusa", "I": "Mita", "S": "Shinjuku", "E": "Oedo"},
+    },
+}
+
+
+# ==============================================================================
+# Fares
+# ==============================================================================
+
+# Minimum IC fare (yen) charged when entering each operator's network.
+# Multi-criteria search uses it as a per-boarding fare score; distance-based
+# fares are not modelled.
+OPERATOR_BASE_FARE = {
+    "JR-East": 146,
+    "TokyoMetro": 178,
+    "Toei": 178,
+}
+DEFAULT_BASE_FARE = 178
@@ -0,0 +1,121 @@
+"""
+Live per-railway delay overlay for delay-aware routing.
+
+The GTFS-RT poller (poll_delays, run by the API process) publishes the
+current average delay of each railway to data/delay_overlay.bin, a tiny
+mapped file (mmap_store) carrying a version. Search workers re-check the
+file at most every DELAY_OVERLAY_CHECK_SECONDS and re-map it when it was
+replaced, so an update reaches every worker well within one poll interval.
+Each API process may run a poller: writes go through unique temp files and
+an atomic rename, and the version only changes when the delays do.
+
+The overlay records when its GTFS-RT data was fetched and is ignored once
+older than DELAY_OVERLAY_MAX_AGE (feed down, or a file left by an earlier
+run), so stale delays are never charged.
+Nothing in the graph or timetable is rebuilt or copied: the overlay is only
+railway id -> minutes, so an update costs O(delayed railways).
+
+The engines charge a delay of D minutes once per boarding of the railway:
+the graph search on transfer edges into (and origin platforms of) the
+railway, RAPTOR on every arrival of its trips.
+"""
+import asyncio
+import os
+import time
+from typing import Dict, Iterable, Optional
+
+from .constants import RAILWAY_TO_ROUTE_CODE
+from .delay_service import CACHE_TTL_SECONDS, get_route_delays, last_fetch_time
+from .executors import run_io
+from .gtfs_loader import DATA_DIR
+from .mmap_store import MappedFile, write_sections
+
+DELAY_OVERLAY_PATH = os.path.join(DATA_DIR, "delay_overlay.bin")
+MAGIC = b"DLYOVL01"
+DELAY_POLL_SECONDS = float(os.getenv("DELAY_POLL_SECONDS", str(CACHE_TTL_SECONDS)))
+DELAY_OVERLAY_CHECK_SECONDS = 1.0
+DELAY_OVERLAY_MAX_AGE = 2 * DELAY_POLL_SECONDS
+
+
+class DelayOverlay(MappedFile):
+    """Mapped overlay: meta holds the version, fetch time and railway id -> delay minutes."""
+
+    MAGIC = MAGIC
+
+    def __init__(self, path: str):
+        super().__init__(path)
+        self.version = self.meta["version"]
+        self.fetched_at: float = self.meta["fetched_at"]
+        self.delays: Dict[str, float] = self.meta["delays"]
+
+    def is_fresh(self) -> bool:
+        return time.time() - self.fetched_at <= DELAY_OVERLAY_MAX_AGE
+
+
+def railway_route_code(railway_id: str) -> Optional[str]:
+    """GTFS-RT route code of a railway id (e.g. odpt.Railway:JR-East.ChuoRapid -> T)."""
+    return RAILWAY_TO_ROUTE_CODE.get(railway_id.split(".")[-1].split(":")[-1])
+
+
+def publish_delays(route_delays: Dict[str, int], railway_ids: Iterable[str], fetched_at: float) -> bool:
+    """
+    Write the overlay for route code -> delay seconds fetched at fetched_at.
+
+    Unchanged delays keep their version and only refresh the fetch time.
+
+    Returns:
+        True if a new version was published.
+    """
+    delays = {}
+    for railway_id in railway_ids:
+        code = railway_route_code(railway_id)
+        if code in route_delays:
+            delays[railway_id] = round(route_delays[code] / 60, 1)
+
+    current = get_delay_overlay()
+    changed = current is None or current.delays != delays
+    if not changed and current.fetched_at >= fetched_at:
+        return False
+    version = time.time() if changed else current.version
+    write_sections(DELAY_OVERLAY_PATH, MAGIC, {}, {"version": version, "fetched_at": fetched_at, "delays": delays})
+    return changed
+
+
+async def poll_delays(interval: float = DELAY_POLL_SECONDS):
+    """Refresh GTFS-RT delays every interval and publish the overlay (runs for the app's lifetime)."""
+    from .route_graph import get_graph
+
+    while True:
+        try:
+            route_delays = await run_io(get_route_delays)
+            fetched_at = last_fetch_time()
+            # Nothing fetched yet (or the feed is down since start-up): publish nothing
+            if fetched_at is not None and publish_delays(route_delays, get_graph().railways, fetched_at):
+                print(f"Delay overlay updated: {len(route_delays)} delayed routes")
+        except Exception as e:
+            print(f"Delay overlay update failed: {e}")
+        await asyncio.sleep(interval)
+
+
+_overlay: Optional[DelayOverlay] = None
+_last_check = 0.0
+
+
+def get_delay_overlay() -> Optional[DelayOverlay]:
+    """
+    Process-wide mapped overlay, re-mapped when replaced.
+
+    None until first published and while the data is older than DELAY_OVERLAY_MAX_AGE.
+    """
+    global _overlay, _last_check
+    now = time.monotonic()
+    if _overlay is None or now - _last_check >= DELAY_OVERLAY_CHECK_SECONDS:
+        _last_check = now
+        if (_overlay is None or not _overlay.is_current()) and os.path.exists(DELAY_OVERLAY_PATH):
+            try:
+                _overlay = DelayOverlay(DELAY_OVERLAY_PATH)
+            except (ValueError, KeyError, OSError):
+                print(f"Delay overlay {DELAY_OVERLAY_PATH} could not be read")
+    if _overlay is None or not _overlay.is_fresh():
+        return None
+    return _overlay
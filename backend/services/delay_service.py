@@ -30,6 +30,7 @@ MIN_DELAY_SECONDS = 60  # Only report delays >= 1 minute
 # Import route code mappings from shared constants
 from services.constants import (
     ROUTE_CODE_TO_RAILWAY,
+    RAILWAY_JA_TO_EN,
     RAILWAY_TO_ROUTE_CODE,
     ROUTE_CODE_TO_DISPLAY_NAME,
     GTFS_RT_URL,
@@ -168,18 +169,25 @@ def get_route_delays() -> Dict[str, int]:
     return aggregated
 
 
+def last_fetch_time() -> Optional[float]:
+    """Time (epoch seconds) the current delay data was fetched, or None if never fetched."""
+    return _cache.timestamp if _cache else None
+
+
 def check_route_delay(railway_name: str) -> Optional[int]:
     """
     Check if a specific railway has delays.
     
     Args:
-        railway_name: English railway name (e.g., "ChuoRapid", "Yamanote")
+        railway_name: English railway name (e.g., "ChuoRapid", "Yamanote"),
+            Japanese name (e.g., "中央線快速") or railway id
     
     Returns:
         Delay in seconds, or None if no significant delay.
     """
     delays = get_route_delays()
-    route_code = RAILWAY_TO_ROUTE_CODE.get(railway_name)
+    railway_short = RAILWAY_JA_TO_EN.get(railway_name, railway_name.split(".")[-1].split(":")[-1])
+    route_code = RAILWAY_TO_ROUTE_CODE.get(railway_short)
     
     if route_code and route_code in delays:
         return delays[route_code]
@@ -0,0 +1,200 @@
+"""
+What-if simulation of line suspensions and slowdowns.
+
+A scenario closes railways (or sections between two stations) and slows
+others down by a factor. It is applied as an edge cost overlay on the
+shortest-path trees (edge index -> cost multiplier), so the shared graph
+arrays are never copied or modified.
+
+For each origin the baseline tree is compared with a tree under the overlay.
+Both are built here, outside the graph's tree cache, so a simulation over
+hundreds of origins does not evict the trees of user queries. Costs only go up, so an origin whose baseline
+tree uses none of the affected edges keeps every distance and is skipped
+without a second search. Origins are split across the search pool.
+
+Pairs are weighted by a gravity model of station_stats.json: the weight of
+(o, d) is proportional to passengers(o) * passengers(d), normalized to sum
+to 1 over the pairs evaluated.
+"""
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from .graph_snapshot import TRANSFER
+from .path_tree import INF, ShortestPathTree
+from .station_stats import get_station_stats, top_stations
+
+MIN_DELTA = 0.5  # Minutes; smaller differences are rounding noise
+
+
+def resolve_railways(graph, queries: Iterable[str]) -> List[str]:
+    """
+    Railway ids for railway ids or names (Japanese or English).
+
+    Raises:
+        ValueError: a railway is not in the graph
+    """
+    by_name = {}
+    for railway_id, info in graph.railways.items():
+        for key in ("name_ja", "name_en"):
+            if info.get(key):
+                by_name.setdefault(info[key], railway_id)
+    resolved = []
+    for query in queries:
+        railway_id = query if query in graph.railways else by_name.get(query)
+        if railway_id is None:
+            raise ValueError(f"Railway not found: {query}")
+        resolved.append(railway_id)
+    return resolved
+
+
+def scenario_factors(graph, scenario: Dict) -> Dict[int, float]:
+    """
+    Edge cost overlay of a scenario.
+
+    Args:
+        scenario: {"close": [railway ids], "slow": {railway id: factor >= 1},
+                   "close_sections": [[station, station], ...]}
+    Returns:
+        edge index -> cost multiplier (INF = closed)
+    """
+    factors = {railway_id: float(factor) for railway_id, factor in scenario.get("slow", {}).items()}
+    factors.update(dict.fromkeys(scenario.get("close", ()), INF))
+
+    overlay: Dict[int, float] = {}
+    if factors:
+        railway_factors = {}
+        for e in range(len(graph.edge_to)):
+            r = graph.edge_railway[e]
+            if r < 0 or graph.edge_kind[e] == TRANSFER:
+                continue
+            if r not in railway_factors:
+                railway_factors[r] = factors.get(graph.railway_id(r))
+            if railway_factors[r] is not None:
+                overlay[e] = railway_factors[r]
+
+    index = graph.node_index
+    for a, b in scenario.get("close_sections", ()):
+        a_nodes = [index[s] for s in graph.resolve_station(a)]
+        b_nodes = [index[s] for s in graph.resolve_station(b)]
+        for u in a_nodes:
+            for v in b_nodes:
+                overlay.update(dict.fromkeys(graph.edges_between(u, v), INF))
+                overlay.update(dict.fromkeys(graph.edges_between(v, u), INF))
+    return overlay
+
+
+def _node_pairs(graph, overlay: Dict[int, float]) -> set:
+    """(from node, to node) of every overlaid edge."""
+    offsets = graph.edge_offsets
+    pairs = set()
+    for u in range(len(graph.node_ids)):
+        for e in range(offsets[u], offsets[u + 1]):
+            if e in overlay:
+                pairs.add((u, graph.edge_to[e]))
+    return pairs
+
+
+def compare_origins(
+    graph, origins: List[str], destinations: List[str], scenario: Dict, transfer_buffer: int = 0
+) -> List[Tuple[str, str, float, Optional[float]]]:
+    """
+    Pairs whose travel time changes under the scenario.
+
+    Returns:
+        (origin, destination, baseline minutes, disrupted minutes or None if unreachable)
+    """
+    overlay = scenario_factors(graph, scenario)
+    affected = _node_pairs(graph, overlay)
+    index = graph.node_index
+
+    changed = []
+    for origin in origins:
+        nodes = [index[s] for s in graph.resolve_station(origin)]
+        if not nodes:
+            continue
+        tree = ShortestPathTree(graph, nodes, transfer_buffer)
+        base = graph.reached_stations(tree)
+        parent = tree.parent
+        uses_affected = any((parent[v], v) in affected for v in range(len(parent)) if parent[v] >= 0)
+        if not uses_affected:
+            continue
+
+        disrupted = graph.reached_stations(ShortestPathTree(graph, nodes, transfer_buffer, overlay))
+        for destination in destinations:
+            if destination == origin or destination not in base:
+                continue
+            before = base[destination][0]
+            after = disrupted.get(destination, (None,))[0]
+            if after is None or after - before >= MIN_DELTA:
+                changed.append((origin, destination, before, after))
+    return changed
+
+
+def od_stations(graph, top: int = 200) -> List[str]:
+    """The top busiest stations known to the graph (every graph station if top is 0)."""
+    names = {info["name_ja"] for info in graph.station_info.values() if info.get("name_ja")}
+    if top <= 0 or not get_station_stats():
+        return sorted(names)
+    return [name for name in top_stations(len(get_station_stats())) if name in names][:top]
+
+
+def summarize(
+    stations: List[str], changed: List[Tuple[str, str, float, Optional[float]]], limit: int = 20
+) -> Dict:
+    """Demand-weighted deltas, the most affected pairs and stations."""
+    stats = get_station_stats()
+    volume = {s: stats.get(s, 0) for s in stations}
+    # Sum of volume[o] * volume[d] over ordered pairs o != d
+    pair_total = sum(volume.values()) ** 2 - sum(v * v for v in volume.values())
+    pair_count = max(len(stations) * (len(stations) - 1), 1)
+
+    def weight(origin: str, destination: str) -> float:
+        if pair_total:
+            return volume[origin] * volume[destination] / pair_total
+        return 1 / pair_count  # No passenger counts: every pair counts the same
+
+    pairs = []
+    per_station: Dict[str, Dict] = {}
+    weighted_delay = unreachable_weight = 0.0
+    for origin, destination, before, after in changed:
+        w = weight(origin, destination)
+        delta = None if after is None else after - before
+        if delta is None:
+            unreachable_weight += w
+        else:
+            weighted_delay += w * delta
+        pairs.append({
+            "from": origin,
+            "to": destination,
+            "baseline": round(before, 1),
+            "disrupted": None if after is None else round(after, 1),
+            "delta": None if delta is None else round(delta, 1),
+            "weight": w,
+        })
+        for station in (origin, destination):
+            entry = per_station.setdefault(
+                station, {"station": station, "affected_pairs": 0, "unreachable_pairs": 0, "weighted_delay": 0.0}
+            )
+            entry["affected_pairs"] += 1
+            if delta is None:
+                entry["unreachable_pairs"] += 1
+            else:
+                entry["weighted_delay"] += w * delta
+
+    # Unreachable pairs first, then by demand-weighted delay
+    pairs.sort(key=lambda p: (p["delta"] is not None, -p["weight"] * (1 if p["delta"] is None else p["delta"])))
+    ranked = sorted(per_station.values(), key=lambda s: (-s["unreachable_pairs"], -s["weighted_delay"]))
+    for entry in ranked:
+        entry["weighted_delay"] = round(entry["weighted_delay"], 4)
+    for pair in pairs:
+        pair["weight"] = round(pair["weight"], 6)
+
+    return {
+        "stations": len(stations),
+        "pairs": len(stations) * (len(stations) - 1),
+        "affected_pairs": len(changed),
+        "unreachable_pairs": sum(1 for _, _, _, after in changed if after is None),
+        "weighted_delay_minutes": round(weighted_delay, 3),
+        "unreachable_demand_share": round(unreachable_weight, 4),
+        "most_affected_pairs": pairs[:limit],
+        "most_affected_stations": ranked[:limit],
+    }
@@ -0,0 +1,61 @@
+"""
+Shared executors for blocking and CPU-heavy work.
+
+io_pool: bounded thread pool for blocking database work (candidate mapping,
+delay log scans, the GTFS-RT fetch). Bounded so one request cannot exhaust
+connections or threads for the others.
+
+cpu_pool: dedicated pool for graph and timetable searches. The routers are
+async, so these run here instead of on the event loop or Starlette's
+threadpool; slow clients then cost a coroutine, not a thread.
+"""
+import asyncio
+import os
+from concurrent.futures import Executor, ThreadPoolExecutor
+from functools import partial
+from typing import Callable, Optional, TypeVar
+
+IO_WORKERS = int(os.getenv("SEARCH_IO_WORKERS", "8"))
+CPU_WORKERS = int(os.getenv("SEARCH_CPU_WORKERS", str(os.cpu_count() or 2)))
+
+T = TypeVar("T")
+
+_io_pool: Optional[ThreadPoolExecutor] = None
+_cpu_pool: Optional[ThreadPoolExecutor] = None
+
+
+def io_pool() -> ThreadPoolExecutor:
+    global _io_pool
+    if _io_pool is None:
+        _io_pool = ThreadPoolExecutor(max_workers=IO_WORKERS, thread_name_prefix="search-io")
+    return _io_pool
+
+
+def cpu_pool() -> ThreadPoolExecutor:
+    global _cpu_pool
+    if _cpu_pool is None:
+        _cpu_pool = ThreadPoolExecutor(max_workers=CPU_WORKERS, thread_name_prefix="search-cpu")
+    return _cpu_pool
+
+
+async def _run(pool: Executor, fn: Callable[..., T], *args, **kwargs) -> T:
+    return await asyncio.get_running_loop().run_in_executor(pool, partial(fn, *args, **kwargs))
+
+
+async def run_io(fn: Callable[..., T], *args, **kwargs) -> T:
+    """Await a blocking call on the I/O pool."""
+    return await _run(io_pool(), fn, *args, **kwargs)
+
+
+async def run_cpu(fn: Callable[..., T], *args, **kwargs) -> T:
+    """Await a search on the CPU pool."""
+    return await _run(cpu_pool(), fn, *args, **kwargs)
+
+
+def shutdown():
+    """Stop the pools (application shutdown)."""
+    global _io_pool, _cpu_pool
+    for pool in (_io_pool, _cpu_pool):
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+    _io_pool = _cpu_pool = None
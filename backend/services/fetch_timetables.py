@@ -14,7 +14,9 @@ from sqlalchemy.orm import sessionmaker
 # Add parent directory to path for imports
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from db.models import Base, StationDeparture
+from db.models import StationDeparture
+from db.schema import ensure_schema
+from db.timetable_store import TimetableWriter
 
 load_dotenv(dotenv_path="../.env")
 
@@ -26,7 +28,7 @@ DB_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data.db")
 def get_db_session():
     """Create database session."""
     engine = create_engine(f"sqlite:///{DB_PATH}")
-    Base.metadata.create_all(engine)
+    ensure_schema(engine)
     Session = sessionmaker(bind=engine)
     return Session(), StationDeparture
 
@@ -102,6 +104,8 @@ def parse_train_timetable(train_data: dict) -> list:
     calendar = train_data.get("odpt:calendar", "")
     if "Weekday" in calendar:
         weekday_type = "Weekday"
+    elif "SaturdayHoliday" in calendar:
+        weekday_type = "SaturdayHoliday"  # Shared Saturday/holiday timetable
     elif "Saturday" in calendar:
         weekday_type = "Saturday"
     else:
@@ -170,12 +174,12 @@ def main():
     print("Train Timetable Fetcher (Source: odpt:TrainTimetable)")
     print("=" * 60)
     
-    session, StationDeparture = get_db_session()
+    session, _ = get_db_session()
+    writer = TimetableWriter(session)
     
     # Clear existing data
     print("\nClearing existing timetable data...")
-    session.query(StationDeparture).delete()
-    session.commit()
+    writer.clear()
     
     # Railways to fetch (from shared constants)
     # Railways to fetch (from shared constants)
@@ -198,13 +202,10 @@ def main():
         
         for train in trains:
             records = parse_train_timetable(train)
-            
-            for rec in records:
-                db_record = StationDeparture(**rec)
-                session.add(db_record)
-                railway_records += 1
+            writer.add_train(records)
+            railway_records += len(records)
                 
-        session.commit()
+        writer.flush()
         total_records += railway_records
         print(f"  {railway_name}: {len(trains)} trains, {railway_records} records")
     
@@ -212,6 +213,10 @@ def main():
     print(f"Total: {total_records} records saved to database")
     print(f"{'=' * 60}")
     
+    # Publish the refreshed timetable to API workers
+    from services.timetable.artifact import build_artifact
+    build_artifact(session)
+    
     session.close()
     print("\nDone!")
 
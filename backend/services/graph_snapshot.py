@@ -0,0 +1,179 @@
+"""
+Shared route graph snapshot.
+
+The route graph is built once (by whichever worker gets the build lock
+first) and published as an immutable, versioned array file. Every worker,
+the builder included, maps that file read-only, so N workers hold one copy
+of the edges and only the first one pays for the ODPT fetch and build.
+
+A CURRENT pointer file names the live version. Publishing a new build
+swaps the pointer atomically; workers notice on their next version check
+and move over to the new snapshot as a whole.
+"""
+import os
+import time
+from array import array
+from contextlib import contextmanager
+from typing import Dict, Optional, Tuple
+
+from .mmap_store import MappedFile, StringTable, write_sections
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process build lock
+    fcntl = None
+
+GRAPH_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "graph")
+CURRENT_FILE = os.path.join(GRAPH_DIR, "CURRENT")
+LOCK_FILE = os.path.join(GRAPH_DIR, ".lock")
+MAGIC = b"RGRAPH01"
+KEEP_VERSIONS = 2  # Workers may still map the previous version for a moment
+
+# Edge kinds
+RIDE = 0
+TRANSFER = 1
+
+
+def compile_arrays(graph) -> Tuple[Dict[str, object], StringTable]:
+    """
+    Flatten a dict-based RouteGraph into CSR arrays.
+
+    Nodes are the stations of station_info (in insertion order) followed by
+    any station only referenced by edges. Edges of node i are
+    edge_*[edge_offsets[i]:edge_offsets[i + 1]].
+    """
+    strings = StringTable()
+    node_ids = list(graph.station_info)
+    node_index = {sid: i for i, sid in enumerate(node_ids)}
+    for edge_list in list(graph.edges.values()):
+        for edge in edge_list:
+            if edge["to"] not in node_index:
+                node_index[edge["to"]] = len(node_ids)
+                node_ids.append(edge["to"])
+    for sid in list(graph.edges):
+        if sid not in node_index:
+            node_index[sid] = len(node_ids)
+            node_ids.append(sid)
+
+    node_id, node_name_ja, node_name_en, node_railway = array("i"), array("i"), array("i"), array("i")
+    node_has_info = array("b")
+    edge_offsets = array("i", [0])
+    edge_to, edge_time, edge_kind, edge_railway = array("i"), array("d"), array("b"), array("i")
+
+    for sid in node_ids:
+        info = graph.station_info.get(sid)
+        node_id.append(strings.intern(sid))
+        node_has_info.append(1 if info is not None else 0)
+        info = info or {}
+        node_name_ja.append(strings.intern(info.get("name_ja")))
+        node_name_en.append(strings.intern(info.get("name_en")))
+        node_railway.append(strings.intern(info.get("railway")))
+
+        for edge in graph.edges.get(sid, []):
+            edge_to.append(node_index[edge["to"]])
+            edge_time.append(float(edge["time"]))
+            edge_kind.append(TRANSFER if edge["type"] == "transfer" else RIDE)
+            edge_railway.append(strings.intern(edge["railway"]) if edge.get("railway") else -1)
+        edge_offsets.append(len(edge_to))
+
+    sections = {
+        "node_id": node_id,
+        "node_has_info": node_has_info,
+        "node_name_ja": node_name_ja,
+        "node_name_en": node_name_en,
+        "node_railway": node_railway,
+        "edge_offsets": edge_offsets,
+        "edge_to": edge_to,
+        "edge_time": edge_time,
+        "edge_kind": edge_kind,
+        "edge_railway": edge_railway,
+    }
+    return sections, strings
+
+
+def snapshot_path(version: str) -> str:
+    return os.path.join(GRAPH_DIR, f"graph-{version}.bin")
+
+
+def new_version() -> str:
+    """
+    Version name for a new snapshot, unique even for several builds within a second.
+
+    Names sort by publish time (_prune keeps the newest by name).
+    """
+    while True:
+        now = time.time_ns()
+        version = f"{time.strftime('%Y%m%d%H%M%S', time.localtime(now // 10**9))}-{now % 10**9:09d}"
+        if version != current_version() and not os.path.exists(snapshot_path(version)):
+            return version
+
+
+def publish(graph) -> str:
+    """Write a snapshot of a built graph and make it the current version."""
+    version = new_version()
+    sections, strings = compile_arrays(graph)
+    sections.update(strings.sections())
+    meta = {"version": version, "built_at": time.time(), "railways": graph.railways}
+    write_sections(snapshot_path(version), MAGIC, sections, meta)
+
+    tmp = f"{CURRENT_FILE}.tmp"
+    with open(tmp, "w") as f:
+        f.write(version)
+    os.replace(tmp, CURRENT_FILE)
+    print(f"Published route graph snapshot {version}")
+
+    _prune(version)
+    return version
+
+
+def _prune(current: str):
+    names = sorted(n for n in os.listdir(GRAPH_DIR) if n.startswith("graph-") and n.endswith(".bin"))
+    for name in names[:-KEEP_VERSIONS]:
+        if name != os.path.basename(snapshot_path(current)):
+            # Workers still mapping it keep their pages until they detach
+            os.unlink(os.path.join(GRAPH_DIR, name))
+
+
+def current_version() -> Optional[str]:
+    try:
+        with open(CURRENT_FILE) as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+class GraphSnapshot(MappedFile):
+    """Read-only mapped graph snapshot."""
+
+    MAGIC = MAGIC
+
+    def __init__(self, path: str):
+        super().__init__(path)
+        self.version = self.meta["version"]
+        self.built_at = self.meta["built_at"]
+        self.node_count = len(self.node_id)
+
+
+def attach(version: Optional[str] = None) -> Optional[GraphSnapshot]:
+    """Map a snapshot (default: the current one). None if nothing is published."""
+    version = version or current_version()
+    if not version:
+        return None
+    try:
+        return GraphSnapshot(snapshot_path(version))
+    except FileNotFoundError:
+        return None
+
+
+@contextmanager
+def build_lock():
+    """Cross-process lock so only one worker builds while the others wait and attach."""
+    os.makedirs(GRAPH_DIR, exist_ok=True)
+    with open(LOCK_FILE, "w") as f:
+        if fcntl:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl:
+                fcntl.flock(f, fcntl.LOCK_UN)
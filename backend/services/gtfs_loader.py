@@ -0,0 +1,334 @@
+"""
+Streaming GTFS static loader.
+
+Reads operator feeds (configured in constants.GTFS_FEEDS) straight from
+their zip archives, or from a previously extracted directory, and parses
+every file exactly once. The bulky tables (trips, stop_times) are kept in
+typed arrays so both the route graph build and the DB import can walk them
+without re-reading CSVs or building one dict per row.
+"""
+
+import csv
+import io
+import os
+import zipfile
+from array import array
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from .constants import GTFS_FEEDS, RAILWAY_JA_TO_EN
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data")
+GTFS_DIR = os.path.join(DATA_DIR, "gtfs")
+
+
+def feed_zip_path(operator: str) -> str:
+    """Location of the downloaded zip for an operator."""
+    return os.path.join(GTFS_DIR, f"{operator}.zip")
+
+
+def feed_source_path(operator: str) -> Optional[str]:
+    """Resolve where an operator's feed lives (zip preferred, legacy dir as fallback)."""
+    zip_path = feed_zip_path(operator)
+    if os.path.exists(zip_path):
+        return zip_path
+
+    legacy_dir = GTFS_FEEDS.get(operator, {}).get("legacy_dir")
+    if legacy_dir:
+        path = os.path.join(DATA_DIR, legacy_dir)
+        if os.path.isdir(path):
+            return path
+    return None
+
+
+def parse_gtfs_time(value: str) -> int:
+    """Convert GTFS H:MM:SS (may exceed 24h) to seconds. Returns -1 if empty."""
+    if not value:
+        return -1
+    return int(value[:-6]) * 3600 + int(value[-5:-3]) * 60 + int(value[-2:])
+
+
+class _FeedReader:
+    """Uniform row reader over a zip archive or an extracted directory."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._zip = zipfile.ZipFile(path) if os.path.isfile(path) else None
+        if self._zip:
+            # Some publishers nest files in a folder inside the archive
+            self._members = {os.path.basename(n): n for n in self._zip.namelist()}
+        else:
+            self._members = {n: os.path.join(path, n) for n in os.listdir(path)}
+
+    def has(self, name: str) -> bool:
+        return name in self._members
+
+    def rows(self, name: str, *columns: str) -> Iterator[Tuple[str, ...]]:
+        """Yield the requested columns of each row (missing columns read as "")."""
+        if not self.has(name):
+            return
+        if self._zip:
+            raw = self._zip.open(self._members[name])
+            f = io.TextIOWrapper(raw, encoding="utf-8-sig", newline="")
+        else:
+            f = open(self._members[name], "r", encoding="utf-8-sig", newline="")
+
+        with f:
+            reader = csv.reader(f)
+            header = next(reader, None)
+            if not header:
+                return
+            index = {col.strip(): i for i, col in enumerate(header)}
+            positions = [index.get(col, -1) for col in columns]
+            width = len(header)
+            for row in reader:
+                if not row:
+                    continue
+                if len(row) < width:
+                    row = row + [""] * (width - len(row))
+                yield tuple(row[p] if p >= 0 else "" for p in positions)
+
+    def close(self):
+        if self._zip:
+            self._zip.close()
+
+
+@dataclass
+class GtfsFeed:
+    """
+    One operator's static timetable in compact form.
+
+    Stops, routes, trips and services are addressed by their list index.
+    stop_times are stored trip-major: the stops of trip t are
+    st_stop[trip_offsets[t]:trip_offsets[t + 1]], already ordered by
+    stop_sequence. Times are seconds after midnight of the service day.
+    """
+    operator: str
+    source: str
+
+    stop_ids: List[str] = field(default_factory=list)
+    stop_codes: List[str] = field(default_factory=list)
+    stop_names: List[str] = field(default_factory=list)      # Japanese
+    stop_names_en: List[str] = field(default_factory=list)
+    stop_railways: List[Optional[str]] = field(default_factory=list)  # ODPT railway ID
+
+    route_ids: List[str] = field(default_factory=list)
+    route_names: List[str] = field(default_factory=list)     # Japanese
+    route_names_en: List[str] = field(default_factory=list)  # Short English name (e.g. "Ginza")
+    route_railway_ids: List[str] = field(default_factory=list)
+
+    service_ids: List[str] = field(default_factory=list)
+
+    trip_ids: List[str] = field(default_factory=list)
+    trip_route: array = field(default_factory=lambda: array("i"))
+    trip_service: array = field(default_factory=lambda: array("i"))
+    trip_direction: array = field(default_factory=lambda: array("b"))
+
+    trip_offsets: array = field(default_factory=lambda: array("i", [0]))
+    st_stop: array = field(default_factory=lambda: array("i"))
+    st_arrival: array = field(default_factory=lambda: array("i"))
+    st_departure: array = field(default_factory=lambda: array("i"))
+
+    # service_id, (mon..sun flags), start_date, end_date as raw strings
+    calendar: List[Tuple[str, Tuple[bool, ...], str, str]] = field(default_factory=list)
+    # service_id, date, exception_type (1 = added, 2 = removed)
+    calendar_dates: List[Tuple[str, str, int]] = field(default_factory=list)
+
+    translations: Dict[str, str] = field(default_factory=dict)  # ja -> en
+
+    @property
+    def trip_count(self) -> int:
+        return len(self.trip_ids)
+
+    def trip_range(self, trip_idx: int) -> range:
+        """Index range of a trip's stop_times."""
+        return range(self.trip_offsets[trip_idx], self.trip_offsets[trip_idx + 1])
+
+    def station_id(self, stop_idx: int) -> str:
+        """Graph-compatible station ID for a stop."""
+        railway = self.stop_railways[stop_idx]
+        code = self.stop_codes[stop_idx] or self.stop_ids[stop_idx]
+        if railway:
+            return f"gtfs.Station:{self.operator}.{railway.split('.')[-1]}.{code}"
+        return f"gtfs.Station:{self.operator}.{code}"
+
+
+def load_feed(operator: str, path: Optional[str] = None) -> Optional[GtfsFeed]:
+    """Parse an operator's feed. Returns None if no source is available."""
+    config = GTFS_FEEDS.get(operator, {})
+    path = path or feed_source_path(operator)
+    if not path:
+        return None
+
+    reader = _FeedReader(path)
+    feed = GtfsFeed(operator=operator, source=path)
+    try:
+        _read_translations(reader, feed)
+        _read_stops(reader, feed, config.get("line_codes") or {})
+        _read_routes(reader, feed)
+        trip_index = _read_trips(reader, feed)
+        _read_stop_times(reader, feed, trip_index)
+        _read_calendar(reader, feed)
+        _infer_stop_railways(feed)
+    finally:
+        reader.close()
+    return feed
+
+
+@lru_cache(maxsize=1)
+def load_feeds() -> Tuple[GtfsFeed, ...]:
+    """Load every configured feed that is available locally (parsed once per process)."""
+    feeds = []
+    for operator in GTFS_FEEDS:
+        feed = load_feed(operator)
+        if feed:
+            print(f"  GTFS {operator}: {len(feed.stop_ids)} stops, "
+                  f"{feed.trip_count} trips, {len(feed.st_stop)} stop_times")
+            feeds.append(feed)
+    return tuple(feeds)
+
+
+# ==============================================================================
+# File parsers
+# ==============================================================================
+
+def _read_translations(reader: _FeedReader, feed: GtfsFeed):
+    for field_value, language, translation in reader.rows(
+        "translations.txt", "field_value", "language", "translation"
+    ):
+        if language == "en" and field_value:
+            feed.translations[field_value] = translation
+
+
+def _read_stops(reader: _FeedReader, feed: GtfsFeed, line_codes: Dict[str, str]):
+    for stop_id, stop_code, stop_name, location_type in reader.rows(
+        "stops.txt", "stop_id", "stop_code", "stop_name", "location_type"
+    ):
+        # Skip parent stations / entrances; only boarding points carry times
+        if location_type not in ("", "0"):
+            continue
+        line = line_codes.get(stop_code[:1]) if stop_code else None
+        feed.stop_ids.append(stop_id)
+        feed.stop_codes.append(stop_code)
+        feed.stop_names.append(stop_name)
+        feed.stop_names_en.append(feed.translations.get(stop_name, stop_name))
+        feed.stop_railways.append(f"odpt.Railway:{feed.operator}.{line}" if line else None)
+
+
+def _read_routes(reader: _FeedReader, feed: GtfsFeed):
+    for route_id, long_name, short_name in reader.rows(
+        "routes.txt", "route_id", "route_long_name", "route_short_name"
+    ):
+        name_ja = long_name or short_name
+        name_en = feed.translations.get(name_ja, name_ja)
+        simple = RAILWAY_JA_TO_EN.get(name_ja) or name_en.replace(" Line", "").replace(" ", "")
+        feed.route_ids.append(route_id)
+        feed.route_names.append(name_ja)
+        feed.route_names_en.append(simple)
+        feed.route_railway_ids.append(f"odpt.Railway:{feed.operator}.{simple}")
+
+
+def _read_trips(reader: _FeedReader, feed: GtfsFeed) -> Dict[str, int]:
+    route_index = {rid: i for i, rid in enumerate(feed.route_ids)}
+    service_index: Dict[str, int] = {}
+    trip_index: Dict[str, int] = {}
+
+    for route_id, service_id, trip_id, direction_id in reader.rows(
+        "trips.txt", "route_id", "service_id", "trip_id", "direction_id"
+    ):
+        route_idx = route_index.get(route_id)
+        if route_idx is None:
+            continue
+        service_idx = service_index.get(service_id)
+        if service_idx is None:
+            service_idx = service_index[service_id] = len(feed.service_ids)
+            feed.service_ids.append(service_id)
+
+        trip_index[trip_id] = len(feed.trip_ids)
+        feed.trip_ids.append(trip_id)
+        feed.trip_route.append(route_idx)
+        feed.trip_service.append(service_idx)
+        feed.trip_direction.append(1 if direction_id == "1" else 0)
+
+    return trip_index
+
+
+def _read_stop_times(reader: _FeedReader, feed: GtfsFeed, trip_index: Dict[str, int]):
+    stop_index = {sid: i for i, sid in enumerate(feed.stop_ids)}
+
+    trips = array("i")
+    seqs = array("i")
+    stops = array("i")
+    arrivals = array("i")
+    departures = array("i")
+
+    last_trip_id = None
+    trip_idx = -1
+    for trip_id, seq, stop_id, arr, dep in reader.rows(
+        "stop_times.txt", "trip_id", "stop_sequence", "stop_id", "arrival_time", "departure_time"
+    ):
+        # Rows are normally grouped by trip, so avoid a lookup per row
+        if trip_id != last_trip_id:
+            last_trip_id = trip_id
+            trip_idx = trip_index.get(trip_id, -1)
+        stop_idx = stop_index.get(stop_id)
+        if trip_idx < 0 or stop_idx is None:
+            continue
+
+        arr_sec = parse_gtfs_time(arr)
+        dep_sec = parse_gtfs_time(dep)
+        # Non-timepoint stops (no times) are skipped, as are rows without a sequence
+        if (arr_sec < 0 and dep_sec < 0) or not seq:
+            continue
+        trips.append(trip_idx)
+        seqs.append(int(seq))
+        stops.append(stop_idx)
+        arrivals.append(arr_sec if arr_sec >= 0 else dep_sec)
+        departures.append(dep_sec if dep_sec >= 0 else arr_sec)
+
+    n = len(trips)
+    in_order = all(
+        trips[i] < trips[i + 1] or (trips[i] == trips[i + 1] and seqs[i] < seqs[i + 1])
+        for i in range(n - 1)
+    )
+    if in_order:
+        feed.st_stop, feed.st_arrival, feed.st_departure = stops, arrivals, departures
+        order = None
+    else:
+        order = sorted(range(n), key=lambda i: (trips[i], seqs[i]))
+        feed.st_stop = array("i", (stops[i] for i in order))
+        feed.st_arrival = array("i", (arrivals[i] for i in order))
+        feed.st_departure = array("i", (departures[i] for i in order))
+
+    # Trip offsets (CSR) from per-trip counts
+    counts = array("i", bytes(4 * (feed.trip_count + 1)))
+    for t in trips:
+        counts[t + 1] += 1
+    for t in range(feed.trip_count):
+        counts[t + 1] += counts[t]
+    feed.trip_offsets = counts
+
+
+def _read_calendar(reader: _FeedReader, feed: GtfsFeed):
+    days = ("monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday")
+    for row in reader.rows("calendar.txt", "service_id", *days, "start_date", "end_date"):
+        flags = tuple(v == "1" for v in row[1:8])
+        feed.calendar.append((row[0], flags, row[8], row[9]))
+
+    for service_id, date, exception_type in reader.rows(
+        "calendar_dates.txt", "service_id", "date", "exception_type"
+    ):
+        feed.calendar_dates.append((service_id, date, int(exception_type or 0)))
+
+
+def _infer_stop_railways(feed: GtfsFeed):
+    """Place stops without a line code on the railway of the first trip serving them."""
+    if all(feed.stop_railways):
+        return
+    for t in range(feed.trip_count):
+        railway_id = feed.route_railway_ids[feed.trip_route[t]]
+        for i in feed.trip_range(t):
+            stop_idx = feed.st_stop[i]
+            if feed.stop_railways[stop_idx] is None:
+                feed.stop_railways[stop_idx] = railway_id
@@ -0,0 +1,90 @@
+"""
+Per-line scores for multi-criteria routing.
+
+- risk: share of GTFS-RT samples with a delay, per railway and hour of day
+  (JST), from delay_logs
+- fare: base fare charged when boarding a line of another operator
+
+Risk rates are precomputed into data/line_scores.json (scripts/build_line_scores.py)
+so searches only do list lookups.
+"""
+import json
+import os
+import time
+from datetime import datetime
+from functools import lru_cache
+from typing import Dict, List, Optional
+from zoneinfo import ZoneInfo
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from db.models import DelayLog
+from .constants import DEFAULT_BASE_FARE, OPERATOR_BASE_FARE, ROUTE_CODE_TO_RAILWAY
+
+LINE_SCORES_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "line_scores.json")
+JST = ZoneInfo("Asia/Tokyo")
+UTC = ZoneInfo("UTC")
+
+
+def build_line_scores(db: Session) -> Dict:
+    """
+    Hourly delay rates per railway from delay_logs.
+
+    Timestamps are stored as naive UTC; the railway is the route code at the
+    end of the trip_id (same convention as risk_service).
+    """
+    totals: Dict[str, List[int]] = {}
+    delayed: Dict[str, List[int]] = {}
+    for timestamp, trip_id, max_delay in db.execute(
+        select(DelayLog.timestamp, DelayLog.trip_id, DelayLog.max_delay)
+    ):
+        railway = ROUTE_CODE_TO_RAILWAY.get((trip_id or " ")[-1])
+        if not railway:
+            continue
+        try:
+            dt = datetime.fromisoformat(timestamp)
+        except (TypeError, ValueError):
+            continue
+        if dt.tzinfo is None:
+            dt = dt.replace(tzinfo=UTC)
+        hour = dt.astimezone(JST).hour
+        totals.setdefault(railway, [0] * 24)[hour] += 1
+        if max_delay and max_delay > 0:
+            delayed.setdefault(railway, [0] * 24)[hour] += 1
+
+    risk = {}
+    for railway, counts in totals.items():
+        hits = delayed.get(railway, [0] * 24)
+        risk[railway] = [round(hits[h] / counts[h], 4) if counts[h] else 0.0 for h in range(24)]
+    return {"built_at": time.time(), "risk": risk}
+
+
+def write_line_scores(scores: Dict, path: str = LINE_SCORES_PATH):
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(scores, f)
+    os.replace(tmp, path)
+
+
+class LineScores:
+    """Lookup of per-line risk and fare scores."""
+
+    def __init__(self, risk: Optional[Dict[str, List[float]]] = None):
+        self._risk = risk or {}
+
+    def risk(self, railway_en: str, minutes: int) -> float:
+        """Delay rate of a railway for a departure at service-day minutes."""
+        rates = self._risk.get(railway_en)
+        return rates[(minutes // 60) % 24] if rates else 0.0
+
+    @staticmethod
+    def fare(operator: str) -> int:
+        return OPERATOR_BASE_FARE.get(operator, DEFAULT_BASE_FARE)
+
+
+@lru_cache(maxsize=1)
+def get_line_scores() -> LineScores:
+    """Scores from data/line_scores.json (no risk information if it has not been built)."""
+    if not os.path.exists(LINE_SCORES_PATH):
+        return LineScores()
+    with open(LINE_SCORES_PATH, encoding="utf-8") as f:
+        return LineScores(json.load(f).get("risk"))
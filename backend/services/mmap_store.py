@@ -0,0 +1,147 @@
+"""
+Read-only memory-mapped array files.
+
+Shared file format for artifacts that API workers map instead of loading:
+the timetable (timetable/artifact.py) and the route graph snapshot
+(graph_snapshot.py). Files are written once, renamed into place, and never
+modified, so any number of processes can map them and share page-cache pages.
+
+Layout:
+    8 bytes   magic
+    4 bytes   header length (little endian)
+    header    JSON: {"meta": {...}, "sections": {name: [offset, length, typecode]}}
+    sections  8-byte aligned arrays (array typecodes; "B" for raw bytes)
+"""
+import json
+import mmap
+import os
+import struct
+import tempfile
+from array import array
+from typing import Dict, List, Optional, Tuple
+
+ALIGN = 8
+
+
+class StringTable:
+    """Interns strings to dense ids while building; stored as offsets + UTF-8 blob."""
+
+    def __init__(self):
+        self.ids: Dict[str, int] = {}
+        self.values: List[str] = []
+
+    def intern(self, value: Optional[str]) -> int:
+        value = value or ""
+        sid = self.ids.get(value)
+        if sid is None:
+            sid = self.ids[value] = len(self.values)
+            self.values.append(value)
+        return sid
+
+    def sections(self) -> Dict[str, object]:
+        offsets = array("i", [0])
+        chunks = []
+        pos = 0
+        for value in self.values:
+            data = value.encode("utf-8")
+            chunks.append(data)
+            pos += len(data)
+            offsets.append(pos)
+        return {"str_offsets": offsets, "str_blob": b"".join(chunks)}
+
+
+def write_sections(path: str, magic: bytes, sections: Dict[str, object], meta: dict):
+    """
+    Write arrays (or bytes) to path atomically (temp file + rename).
+
+    The temp file name is unique, so concurrent writers of the same path never
+    share it; the last rename wins.
+    """
+    def payload(data) -> Tuple[bytes, str, int]:
+        if isinstance(data, array):
+            return data.tobytes(), data.typecode, len(data)
+        return bytes(data), "B", len(data)
+
+    encoded = {name: payload(data) for name, data in sections.items()}
+
+    # Header size depends on offsets, which depend on header size: size it with
+    # placeholder offsets wide enough for the real ones, then pad.
+    def header_bytes(offsets: Dict[str, int]) -> bytes:
+        return json.dumps({
+            "meta": meta,
+            "sections": {n: [offsets[n], encoded[n][2], encoded[n][1]] for n in encoded},
+        }).encode("utf-8")
+
+    placeholder = header_bytes({n: 10 ** 12 for n in encoded})
+    start = _align(len(magic) + 4 + len(placeholder))
+    offsets, pos = {}, start
+    for name, (data, _, _) in encoded.items():
+        offsets[name] = pos
+        pos = _align(pos + len(data))
+    header = header_bytes(offsets)
+    header += b" " * (len(placeholder) - len(header))
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), prefix=f"{os.path.basename(path)}.", suffix=".tmp")
+    with os.fdopen(fd, "wb") as f:
+        f.write(magic)
+        f.write(struct.pack("<I", len(header)))
+        f.write(header)
+        for name, (data, _, _) in encoded.items():
+            f.write(b"\0" * (offsets[name] - f.tell()))
+            f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def _align(pos: int) -> int:
+    return (pos + ALIGN - 1) // ALIGN * ALIGN
+
+
+class MappedFile:
+    """
+    Zero-copy view of a file written by write_sections().
+
+    Every section becomes an attribute holding a memoryview cast to its
+    typecode; `meta` holds the JSON metadata.
+    """
+
+    MAGIC = b""
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            self._stat = os.fstat(f.fileno())
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        buf = memoryview(self._mm)
+        magic = self.MAGIC
+        if bytes(buf[:len(magic)]) != magic:
+            raise ValueError(f"Unexpected file format: {path}")
+        (header_len,) = struct.unpack_from("<I", buf, len(magic))
+        header_start = len(magic) + 4
+        header = json.loads(bytes(buf[header_start:header_start + header_len]))
+
+        self.meta: dict = header["meta"]
+        for name, (offset, length, typecode) in header["sections"].items():
+            size = length * struct.calcsize(typecode)
+            view = buf[offset:offset + size]
+            setattr(self, name, view.cast(typecode) if typecode != "B" else view)
+
+    @property
+    def size(self) -> int:
+        return self._stat.st_size
+
+    def is_current(self) -> bool:
+        """False once the file on disk was replaced by a newer build."""
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return True
+        return (st.st_ino, st.st_mtime_ns) == (self._stat.st_ino, self._stat.st_mtime_ns)
+
+    def string(self, sid: int) -> str:
+        if sid < 0:
+            return ""
+        return bytes(self.str_blob[self.str_offsets[sid]:self.str_offsets[sid + 1]]).decode("utf-8")
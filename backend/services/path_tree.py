@@ -0,0 +1,160 @@
+"""
+Resumable one-to-all shortest-path trees over the route graph's CSR arrays.
+
+A tree keeps its Dijkstra state (distances, parents and the heap) in compact
+arrays, so a later query from the same origins either walks the settled part
+of the tree or resumes the search exactly where the previous one stopped.
+Trees are kept in a small LRU per graph instance, keyed by (origin nodes,
+transfer_buffer, delay overlay version); a new graph snapshot starts with an
+empty cache.
+"""
+import heapq
+import os
+import threading
+from array import array
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Set
+
+from .graph_snapshot import TRANSFER
+
+ROUTE_TREE_CACHE_SIZE = int(os.getenv("ROUTE_TREE_CACHE_SIZE", "64"))
+INF = float("inf")
+PENALTY_FACTOR = 5.0
+
+
+class ShortestPathTree:
+    """
+    Dijkstra tree from a set of origin nodes, settled lazily.
+
+    Edge costs can be overlaid without touching the graph arrays: edge_factors
+    maps an edge index to a cost multiplier (INF closes the edge), and
+    boarding maps a node to minutes added when entering it by a transfer
+    edge or starting there (live delays).
+
+    Not thread-safe by itself: hold `lock` while querying a shared tree.
+    """
+
+    def __init__(
+        self,
+        graph,
+        origins: Iterable[int],
+        transfer_buffer: float = 0,
+        edge_factors: Optional[Dict[int, float]] = None,
+        boarding: Optional[Dict[int, float]] = None,
+    ):
+        n = len(graph.node_ids)
+        self.offsets, self.targets = graph.edge_offsets, graph.edge_to
+        self.times, self.kinds = graph.edge_time, graph.edge_kind
+        self.transfer_buffer = transfer_buffer
+        self.edge_factors = edge_factors or {}
+        self.boarding = boarding or {}
+        self.origins = frozenset(origins)
+
+        self.dist = array("d", [INF]) * n
+        self.parent = array("i", [-1]) * n
+        self.transfers = array("i", [0]) * n
+        self.settled = bytearray(n)
+        self.rank = array("i", [-1]) * n  # Settle order; -1 while unsettled
+        self.settled_count = 0
+        self.heap: List[tuple] = []
+        self.lock = threading.Lock()
+        for node in self.origins:
+            start = self.boarding.get(node, 0)
+            self.dist[node] = start
+            self.heap.append((start, node, 0))
+        heapq.heapify(self.heap)
+
+    def _settle_next(self) -> int:
+        """Settle the next closest node and relax its edges (-1 once every reachable node is settled)."""
+        heap, settled, dist, parent = self.heap, self.settled, self.dist, self.parent
+        offsets, targets, times, kinds = self.offsets, self.targets, self.times, self.kinds
+        factors, boarding = self.edge_factors, self.boarding
+        while heap:
+            total_time, current, transfers = heapq.heappop(heap)
+            if settled[current]:
+                continue
+            settled[current] = 1
+            self.rank[current] = self.settled_count
+            self.settled_count += 1
+            self.transfers[current] = transfers
+
+            for e in range(offsets[current], offsets[current + 1]):
+                next_node = targets[e]
+                if settled[next_node]:
+                    continue
+                edge_time = times[e]
+                if factors and e in factors:
+                    if factors[e] == INF:
+                        continue
+                    edge_time *= factors[e]
+                new_transfers = transfers
+                if kinds[e] == TRANSFER:
+                    edge_time += self.transfer_buffer
+                    new_transfers += 1
+                    if boarding:
+                        edge_time += boarding.get(next_node, 0)
+                new_time = total_time + edge_time
+                if new_time < dist[next_node]:
+                    dist[next_node] = new_time
+                    parent[next_node] = current
+                    heapq.heappush(heap, (new_time, next_node, new_transfers))
+            return current
+        return -1
+
+    def reach(self, targets: Set[int]) -> int:
+        """
+        Closest of the target nodes, extending the tree only as far as needed.
+
+        Returns -1 if no target is reachable.
+        """
+        # The first target settled is the closest one, as in a fresh search
+        settled = [t for t in targets if self.settled[t]]
+        if settled:
+            return min(settled, key=self.rank.__getitem__)
+        while True:
+            node = self._settle_next()
+            if node < 0 or node in targets:
+                return node
+
+    def settle_all(self, max_time: float = INF):
+        """Extend the tree to every node within max_time (the whole graph by default)."""
+        while self.heap and self.heap[0][0] <= max_time:
+            self._settle_next()
+
+    def path(self, node: int) -> List[int]:
+        """Node path from the closest origin to node."""
+        path = []
+        while node != -1:
+            path.append(node)
+            node = self.parent[node]
+        path.reverse()
+        return path
+
+
+class TreeCache:
+    """LRU of unpenalized trees per (origin nodes, transfer_buffer, delay overlay version)."""
+
+    def __init__(self, max_trees: int = ROUTE_TREE_CACHE_SIZE):
+        self.max_trees = max_trees
+        self._trees: "OrderedDict[tuple, ShortestPathTree]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(
+        self,
+        graph,
+        origins: Iterable[int],
+        transfer_buffer: float,
+        boarding: Optional[Dict[int, float]] = None,
+        overlay_version=None,
+    ) -> ShortestPathTree:
+        """Cached tree; boarding delays must be those of overlay_version (None = no delays)."""
+        key = (frozenset(origins), transfer_buffer, overlay_version)
+        with self._lock:
+            tree = self._trees.get(key)
+            if tree is not None:
+                self._trees.move_to_end(key)
+                return tree
+            tree = self._trees[key] = ShortestPathTree(graph, key[0], transfer_buffer, boarding=boarding)
+            while len(self._trees) > self.max_trees:
+                self._trees.popitem(last=False)
+            return tree
@@ -0,0 +1,120 @@
+"""
+Versioned LRU/TTL cache for search results.
+
+Entries are keyed by the normalized query and stored with the dataset
+version (graph snapshot + timetable artifact) they were computed on. The
+first lookup after a reload sees a new version and drops every entry of the
+old one.
+
+Results also carry delay warnings, so each entry records the GTFS-RT route
+codes of the railways it uses in a reverse index. When the delay snapshot
+changes for a route code (delay appears, clears or changes), exactly the
+entries using that railway are dropped.
+
+Used from the event loop only (no locking).
+"""
+import json
+import os
+import time
+from collections import OrderedDict
+from typing import Dict, Hashable, Iterable, Optional, Set
+
+SEARCH_CACHE_SIZE = int(os.getenv("SEARCH_CACHE_SIZE", "4096"))
+SEARCH_CACHE_TTL_SECONDS = float(os.getenv("SEARCH_CACHE_TTL_SECONDS", "600"))
+
+
+class ResultCache:
+    def __init__(self, max_entries: int = SEARCH_CACHE_SIZE, ttl: float = SEARCH_CACHE_TTL_SECONDS):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        # key -> (expires_at, value, route codes, approximate bytes)
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._by_code: Dict[str, Set[Hashable]] = {}
+        self._version = None
+        self._delays: Optional[Dict[str, int]] = None
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def _check_version(self, version: tuple):
+        if version != self._version:
+            if self._entries:
+                self.invalidations += len(self._entries)
+                print(f"Result cache: dataset version changed, dropping {len(self._entries)} entries")
+            self._entries.clear()
+            self._by_code.clear()
+            self.bytes = 0
+            self._version = version
+
+    def _remove(self, key: Hashable):
+        _, _, codes, size = self._entries.pop(key)
+        self.bytes -= size
+        for code in codes:
+            keys = self._by_code.get(code)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._by_code[code]
+
+    def get(self, key: Hashable, version: tuple):
+        """Cached result for key on this dataset version, or None."""
+        self._check_version(version)
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        if entry[0] < time.monotonic():
+            self._remove(key)
+            self.expirations += 1
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def put(self, key: Hashable, version: tuple, value, route_codes: Iterable[str] = ()):
+        """Store a result (never modified afterwards) with the route codes it depends on."""
+        self._check_version(version)
+        if key in self._entries:
+            self._remove(key)
+        codes = frozenset(route_codes)
+        size = len(json.dumps(value, ensure_ascii=False, default=str).encode("utf-8"))
+        self._entries[key] = (time.monotonic() + self.ttl, value, codes, size)
+        self.bytes += size
+        for code in codes:
+            self._by_code.setdefault(code, set()).add(key)
+        while len(self._entries) > self.max_entries:
+            self._remove(next(iter(self._entries)))
+            self.evictions += 1
+
+    def sync_delays(self, delays: Dict[str, int]):
+        """Drop the entries of every route code whose delay changed since the last snapshot."""
+        if self._delays is not None and delays != self._delays:
+            changed = {
+                code for code in set(delays) | set(self._delays)
+                if delays.get(code) != self._delays.get(code)
+            }
+            for code in changed:
+                for key in list(self._by_code.get(code, ())):
+                    self._remove(key)
+                    self.invalidations += 1
+        self._delays = dict(delays)
+
+    def metrics(self) -> Dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "invalidations": self.invalidations,
+            "approx_bytes": self.bytes,
+            "indexed_route_codes": len(self._by_code),
+        }
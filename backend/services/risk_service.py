@@ -1,8 +1,11 @@
+import asyncio
+import threading
 from datetime import datetime
-from typing import Dict, List, Optional
+from typing import Dict, Iterable, List, Optional, Tuple
+from zoneinfo import ZoneInfo
 from sqlalchemy import select, and_, exists
 from sqlalchemy.orm import Session
-from db.database import SessionLocal
+from db.database import AsyncSessionLocal, SessionLocal
 from db.models import DelayLog
 from .constants import RAILWAY_JA_TO_EN
 
@@ -56,9 +59,110 @@ def is_delay_in_range(db: Session, route_id: str, target_hour: int) -> bool:
 
 from .constants import RAILWAY_JA_TO_EN, RAILWAY_TO_ROUTE_CODE
 
-def get_route_risk(route: dict, departure_time: str) -> dict:
+JST = ZoneInfo("Asia/Tokyo")
+UTC = ZoneInfo("UTC")
+
+
+class DelayHistory:
+    """
+    Delay logs per GTFS-RT route code, read at most once per instance.
+
+    Share one instance across the routes of a request so a railway used by
+    several candidates is scanned once. Safe to use from several threads;
+    each load uses its own session.
+    """
+
+    def __init__(self):
+        self._lines: Dict[str, List[tuple]] = {}
+        self._locks: Dict[str, threading.Lock] = {}
+        self._guard = threading.Lock()
+
+    def logs(self, suffix: str) -> List[tuple]:
+        """(JST hour, "HH:MM:SS" JST, max_delay) of every log of a route code."""
+        with self._guard:
+            lock = self._locks.setdefault(suffix, threading.Lock())
+        with lock:
+            if suffix not in self._lines:
+                self._lines[suffix] = self._load(suffix)
+            return self._lines[suffix]
+
+    async def prefetch(self, suffixes: Iterable[str]):
+        """Load the logs of several route codes concurrently on the async engine."""
+        missing = [suffix for suffix in set(suffixes) if suffix not in self._lines]
+        loaded = await asyncio.gather(*(self._load_async(suffix) for suffix in missing))
+        with self._guard:
+            for suffix, logs in zip(missing, loaded):
+                self._lines.setdefault(suffix, logs)
+
+    @staticmethod
+    def _query(suffix: str):
+        return select(DelayLog.timestamp, DelayLog.max_delay).where(DelayLog.trip_id.like(f"%{suffix}"))
+
+    @staticmethod
+    def _parse(rows) -> List[tuple]:
+        logs = []
+        for timestamp, max_delay in rows:
+            try:
+                # Treat stored timestamp as UTC (naive) and convert to JST
+                # Stored format: "2026-01-03T08:00:00.123456" (UTC)
+                dt_utc = datetime.fromisoformat(timestamp)
+                # If naive, assume UTC (since GitHub Actions runs in UTC)
+                if dt_utc.tzinfo is None:
+                    dt_utc = dt_utc.replace(tzinfo=UTC)
+                dt_jst = dt_utc.astimezone(JST)
+            except (TypeError, ValueError):
+                continue
+            logs.append((dt_jst.hour, dt_jst.strftime("%H:%M:%S"), max_delay or 0))
+        return logs
+
+    @classmethod
+    def _load(cls, suffix: str) -> List[tuple]:
+        db = SessionLocal()
+        try:
+            return cls._parse(db.execute(cls._query(suffix)))
+        finally:
+            db.close()
+
+    @classmethod
+    async def _load_async(cls, suffix: str) -> List[tuple]:
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(cls._query(suffix))
+            return cls._parse(result.all())
+
+
+def route_codes(route: dict) -> List[Tuple[str, str]]:
+    """(English railway name, GTFS-RT route code) of each distinct railway in a route."""
+    codes = []
+    railways_checked = set()
+    for segment in route.get("segments", []):
+        railway = segment.get("railway")
+        if not railway:
+            continue
+
+        # Normalize to English short code (e.g., "ChuoRapid")
+        railway_short = railway
+        if railway in RAILWAY_JA_TO_EN:
+            railway_short = RAILWAY_JA_TO_EN[railway]
+        elif ":" in railway:
+            railway_short = railway.split(".")[-1].split(":")[-1]
+
+        if railway_short in railways_checked:
+            continue
+        railways_checked.add(railway_short)
+
+        # Get route code suffix (e.g., "T" for ChuoRapid)
+        suffix = RAILWAY_TO_ROUTE_CODE.get(railway_short)
+        if suffix:
+            codes.append((railway_short, suffix))
+    return codes
+
+
+def get_route_risk(route: dict, departure_time: str, history: Optional[DelayHistory] = None) -> dict:
     """
     Calculate risk score based on real DB data, using trip_id suffix matching for specific lines.
+
+    Args:
+        history: Shared per-request log cache (a private one is used if omitted)
     """
     try:
         dt = datetime.fromisoformat(departure_time)
@@ -66,120 +170,71 @@ def get_route_risk(route: dict, departure_time: str) -> dict:
     except:
         target_hour = datetime.now().hour
 
-    db = SessionLocal()
+    history = history or DelayHistory()
     total_risk = 0
     max_level = 0
     reasons = []
 
-    try:
-        hours_to_check = set([
-            (target_hour - 1) % 24,
-            target_hour,
-            (target_hour + 1) % 24
-        ])
-        
-        railways_checked = set()
-        segments = route.get("segments", [])
-        
-        from zoneinfo import ZoneInfo
-        jst = ZoneInfo("Asia/Tokyo")
-
-        for segment in segments:
-            # ... (railway normalization logic skipped for brevity if unchanged, but need to be careful with replace) ...
-            railway = segment.get("railway")
-            if not railway:
-                continue
+    hours_to_check = set([
+        (target_hour - 1) % 24,
+        target_hour,
+        (target_hour + 1) % 24
+    ])
 
-            # Normalize to English short code (e.g., "ChuoRapid")
-            railway_short = railway
-            if railway in RAILWAY_JA_TO_EN:
-                railway_short = RAILWAY_JA_TO_EN[railway]
-            elif ":" in railway:
-                 railway_short = railway.split(".")[-1].split(":")[-1]
-            
-            if railway_short in railways_checked:
-                continue
-            railways_checked.add(railway_short)
+    for railway_short, suffix in route_codes(route):
+        line_total_count = 0
+        line_delay_count = 0
+        line_details = []
 
-            # Get route code suffix (e.g., "T" for ChuoRapid)
-            suffix = RAILWAY_TO_ROUTE_CODE.get(railway_short)
-            
-            if not suffix:
-                continue
+        for hour, time_jst, max_delay in history.logs(suffix):
+            if hour in hours_to_check:
+                line_total_count += 1
 
-            # Fetch ALL records for this line
-            query = select(DelayLog).where(
-                DelayLog.trip_id.like(f"%{suffix}")
-            )
-            logs = db.execute(query).scalars().all()
-            
-            line_total_count = 0
-            line_delay_count = 0
-            line_details = []
-            
-            for log in logs:
-                try:
-                    # Treat stored timestamp as UTC (naive) and convert to JST
-                    # Stored format: "2026-01-03T08:00:00.123456" (UTC)
-                    dt_utc = datetime.fromisoformat(log.timestamp)
-                    # If naive, assume UTC (since GitHub Actions runs in UTC)
-                    if dt_utc.tzinfo is None:
-                        dt_utc = dt_utc.replace(tzinfo=ZoneInfo("UTC"))
-                    
-                    dt_jst = dt_utc.astimezone(jst)
-                    
-                    if dt_jst.hour in hours_to_check:
-                        line_total_count += 1
-                        
-                        if log.max_delay > 0:
-                            line_delay_count += 1
-                            line_details.append({
-                                "timestamp": dt_jst.strftime("%H:%M:%S"),
-                                "delay_min": log.max_delay // 60
-                            })
-                except Exception as e:
-                    # print(f"Error parsing timestamp: {e}")
-                    continue
-            
-            # Add reason if there is any data
-            if line_total_count > 0:
-                if line_delay_count > 0:
-                    total_risk += line_delay_count
-                    max_level = max(max_level, 2)
-                    
-                    # Sort by time
-                    line_details.sort(key=lambda x: x["timestamp"])
-                    
-                    # Format specific details
-                    detail_strs = [f"{d['timestamp']} (約{d['delay_min']}分)" for d in line_details[:3]]
-                    if len(line_details) > 3:
-                         detail_strs.append("...")
-                         
-                    rate_pct = (line_delay_count / line_total_count) * 100
-                    reasons.append(f"{railway_short}: {line_delay_count}/{line_total_count}件の遅延 ({rate_pct:.1f}%) [{', '.join(detail_strs)}]")
-                else:
-                    # No delays found but we have checks
-                    reasons.append(f"{railway_short}: 0/{line_total_count}件の遅延 (0.0%) [平常運行]")
-                
-        level = "LOW"
-        if max_level > 0:
-            level = "HIGH"
-            
-        return {
-            "score": total_risk,
-            "level": level,
-            "reasons": reasons
-        }
-        level = "LOW"
-        if max_level > 0:
-            level = "HIGH"
-            
-        return {
-            "score": total_risk,
-            "level": level,
-            "reasons": reasons
-        }
-        
-    finally:
-        db.close()
+                if max_delay > 0:
+                    line_delay_count += 1
+                    line_details.append({
+                        "timestamp": time_jst,
+                        "delay_min": max_delay // 60
+                    })
+
+        # Add reason if there is any data
+        if line_total_count > 0:
+            if line_delay_count > 0:
+                total_risk += line_delay_count
+                max_level = max(max_level, 2)
+
+                # Sort by time
+                line_details.sort(key=lambda x: x["timestamp"])
+
+                # Format specific details
+                detail_strs = [f"{d['timestamp']} (約{d['delay_min']}分)" for d in line_details[:3]]
+                if len(line_details) > 3:
+                     detail_strs.append("...")
+
+                rate_pct = (line_delay_count / line_total_count) * 100
+                reasons.append(f"{railway_short}: {line_delay_count}/{line_total_count}件の遅延 ({rate_pct:.1f}%) [{', '.join(detail_strs)}]")
+            else:
+                # No delays found but we have checks
+                reasons.append(f"{railway_short}: 0/{line_total_count}件の遅延 (0.0%) [平常運行]")
 
+    level = "LOW"
+    if max_level > 0:
+        level = "HIGH"
+
+    return {
+        "score": total_risk,
+        "level": level,
+        "reasons": reasons
+    }
+
+
+async def get_routes_risk(routes: List[dict], departure_time: str) -> List[dict]:
+    """
+    Risk of several routes with one shared history.
+
+    Each railway's logs are loaded once, concurrently on the async engine,
+    then every route is scored from memory.
+    """
+    history = DelayHistory()
+    await history.prefetch(suffix for route in routes for _, suffix in route_codes(route))
+    return [get_route_risk(route, departure_time, history) for route in routes]
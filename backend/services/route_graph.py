@@ -4,19 +4,29 @@ Builds a graph from ODPT Station and Railway data,
 and implements Dijkstra's algorithm for shortest path.
 """
 
+from array import array
 from collections import defaultdict
-import heapq
+from collections.abc import Mapping
 import requests
 import os
 import json
-import csv
+import time
 from dotenv import load_dotenv
+from .gtfs_loader import load_feeds
+from . import graph_snapshot
+from .delay_overlay import get_delay_overlay
+from .graph_snapshot import TRANSFER, compile_arrays
+from .path_tree import INF, PENALTY_FACTOR, ShortestPathTree, TreeCache
 
 load_dotenv(dotenv_path="../.env")
 
 API_KEY = os.getenv("ODPT_ACCESS_TOKEN")
 BASE_URL = "https://api-challenge.odpt.org/api/v4"
 TRAVEL_TIMES_FILE = os.path.join(os.path.dirname(__file__), "travel_times.json")
+# Rebuild from ODPT on startup when the published snapshot is older than this
+GRAPH_MAX_AGE_SECONDS = int(os.getenv("ROUTE_GRAPH_MAX_AGE", 24 * 3600))
+# How often a worker checks whether a newer snapshot was published
+VERSION_CHECK_INTERVAL = 1.0
 
 
 class RouteGraph:
@@ -27,6 +37,16 @@ class RouteGraph:
         self.railways = {}  # railway_id -> {name, stations, ...}
         self.is_built = False
 
+        # Array (CSR) form used by searches; see graph_snapshot.compile_arrays
+        self.node_ids = []  # node index -> station_id
+        self.node_index = {}  # station_id -> node index
+        self.edge_offsets = self.edge_to = self.edge_time = self.edge_kind = self.edge_railway = None
+        self._string = None  # string id -> str
+        self.snapshot_version = None  # Set when backed by a shared snapshot
+        self._trees = TreeCache()  # One-to-all trees of recent origins
+        self._railway_nodes = None  # railway_id -> nodes, built on first delay-aware search
+        self._boarding, self._boarding_version = {}, None  # Live delays per node (delay overlay)
+
 
     def build_from_odpt(self):
         """Fetch ODPT data and build the graph."""
@@ -55,9 +75,51 @@ class RouteGraph:
         # Load GTFS edges (accurate times)
         self._load_gtfs_edges()
         
+        self._compile()
         self.is_built = True
         print(f"Graph built: {len(self.station_info)} nodes, {sum(len(e) for e in self.edges.values())} edges")
 
+    def _compile(self):
+        """Derive the array form from the dict-based edges."""
+        sections, strings = compile_arrays(self)
+        self._set_arrays(sections, strings.values.__getitem__)
+
+    def _set_arrays(self, sections, string):
+        self._string = string
+        self.node_ids = [string(sid) for sid in sections["node_id"]]
+        self.node_index = {sid: i for i, sid in enumerate(self.node_ids)}
+        self.edge_offsets = sections["edge_offsets"]
+        self.edge_to = sections["edge_to"]
+        self.edge_time = sections["edge_time"]
+        self.edge_kind = sections["edge_kind"]
+        self.edge_railway = sections["edge_railway"]
+
+    @classmethod
+    def from_snapshot(cls, snapshot) -> "RouteGraph":
+        """Create a graph backed by a mapped snapshot (edges stay in shared memory)."""
+        graph = cls()
+        graph._set_arrays(vars(snapshot), snapshot.string)
+        graph.snapshot_version = snapshot.version
+        graph._snapshot = snapshot
+
+        # Station metadata is small, so it is materialized per worker
+        string = snapshot.string
+        for i, station_id in enumerate(graph.node_ids):
+            if not snapshot.node_has_info[i]:
+                continue
+            name_ja = string(snapshot.node_name_ja[i])
+            graph.station_info[station_id] = {
+                "id": station_id,
+                "name_ja": name_ja,
+                "name_en": string(snapshot.node_name_en[i]),
+                "railway": string(snapshot.node_railway[i]) or None
+            }
+            graph.station_by_name[name_ja].append(station_id)
+        graph.railways = snapshot.meta["railways"]
+        graph.edges = _EdgeView(graph)
+        graph.is_built = True
+        return graph
+
     def _fetch_stations(self) -> list:
         """Fetch stations from ODPT API for all supported railways."""
         # Use railway list from constants or fetch dynamically?
@@ -260,15 +322,22 @@ class RouteGraph:
                 matches.extend(ids)
         return matches
 
-    def find_route(self, from_query: str, to_query: str, transfer_buffer: int = 0, penalty_edges: set = None) -> dict:
+    def find_route(
+        self, from_query: str, to_query: str, transfer_buffer: int = 0, penalty_edges: set = None, avoid_delays: bool = False
+    ) -> dict:
         """
         Find shortest route using Dijkstra's algorithm.
+
+        Without penalties the search tree of the origin is cached and extended
+        lazily, so later queries from the same origin walk the settled tree.
         
         Args:
             from_query: Station name or ID
             to_query: Station name or ID
             transfer_buffer: Additional time for transfers (minutes)
-            penalty_edges: Set of (u, v) tuples to penalize (2.0x cost)
+            penalty_edges: Set of (u, v) station ID tuples to penalize (5.0x cost)
+            avoid_delays: Charge the live delay of each railway once per boarding;
+                total_time stays scheduled and expected_delay is added
         
         Returns:
             Route information including path, total time, and details
@@ -277,75 +346,198 @@ class RouteGraph:
             return {"error": "Graph not built. Call build_from_odpt() first."}
 
         # Resolve station names to IDs
-        from_stations = self._resolve_station(from_query)
-        to_stations = self._resolve_station(to_query)
+        from_stations = self.resolve_station(from_query)
+        to_stations = self.resolve_station(to_query)
 
         if not from_stations:
             return {"error": f"Station not found: {from_query}"}
         if not to_stations:
             return {"error": f"Station not found: {to_query}"}
 
-        to_set = set(to_stations)
-        penalty_edges = penalty_edges or set()
+        index = self.node_index
+        to_set = {index[s] for s in to_stations}
+        origins = [index[s] for s in from_stations]
+        boarding, overlay_version = self._boarding_delays() if avoid_delays else ({}, None)
+
+        if penalty_edges:
+            # Penalize both directions of each listed edge; such trees are not reused
+            factors = {}
+            for u, v in penalty_edges:
+                if u in index and v in index:
+                    factors.update(dict.fromkeys(self.edges_between(index[u], index[v]), PENALTY_FACTOR))
+                    factors.update(dict.fromkeys(self.edges_between(index[v], index[u]), PENALTY_FACTOR))
+            tree = ShortestPathTree(self, origins, transfer_buffer, factors, boarding)
+        else:
+            # Walk (or extend) the cached Dijkstra tree of these origins
+            tree = self._trees.get(self, origins, transfer_buffer, boarding, overlay_version)
+
+        with tree.lock:
+            target = tree.reach(to_set)
+            if target >= 0:
+                nodes = tree.path(target)
+                delay = self._path_delay(nodes, boarding) if boarding else 0
+                path = [self.node_ids[node] for node in nodes]
+                result = self._build_result(path, tree.dist[target] - delay, tree.transfers[target], transfer_buffer)
+                if avoid_delays:
+                    result["expected_delay"] = round(delay, 1)
+                return result
 
-        # Dijkstra's algorithm with parent tracking (optimized)
-        # Priority queue: (total_time, current_station, transfers)
-        pq = []
-        parent = {}  # station -> (prev_station, total_time, transfers)
-        
-        for start in from_stations:
-            heapq.heappush(pq, (0, start, 0))
-            parent[start] = (None, 0, 0)
+        return {"error": "No route found"}
 
-        visited = set()
-        
-        while pq:
-            total_time, current, transfers = heapq.heappop(pq)
-
-            if current in to_set:
-                # Reconstruct path from parent chain
-                path = []
-                node = current
-                while node is not None:
-                    path.append(node)
-                    node = parent[node][0]
-                path.reverse()
-                return self._build_result(path, total_time, transfers, transfer_buffer)
-
-            if current in visited:
+    def _boarding_delays(self) -> tuple:
+        """
+        (node -> live delay minutes, overlay version) for delay-aware searches.
+
+        Recomputed only for a new overlay version, from the delayed railways'
+        nodes; ({}, None) while nothing is delayed.
+        """
+        overlay = get_delay_overlay()
+        if overlay is None or not overlay.delays:
+            return {}, None
+        if self._boarding_version != overlay.version:
+            if self._railway_nodes is None:
+                self._railway_nodes = defaultdict(list)
+                for node, station_id in enumerate(self.node_ids):
+                    railway = self.station_info.get(station_id, {}).get("railway")
+                    if railway:
+                        self._railway_nodes[railway].append(node)
+            self._boarding = {
+                node: minutes
+                for railway, minutes in overlay.delays.items()
+                for node in self._railway_nodes.get(railway, ())
+            }
+            self._boarding_version = overlay.version
+        return self._boarding, self._boarding_version
+
+    def _path_delay(self, nodes: list, boarding: dict) -> float:
+        """Live delay charged along a node path: at the origin platform and on each transfer into a delayed one."""
+        delay = boarding.get(nodes[0], 0)
+        for u, v in zip(nodes, nodes[1:]):
+            if v in boarding and any(self.edge_kind[e] == TRANSFER for e in self.edges_between(u, v)):
+                delay += boarding[v]
+        return delay
+
+    def edges_between(self, u: int, v: int) -> list:
+        """Edge indices from node u to node v."""
+        return [e for e in range(self.edge_offsets[u], self.edge_offsets[u + 1]) if self.edge_to[e] == v]
+
+    def railway_id(self, railway: int) -> str:
+        """Railway id of an edge_railway value."""
+        return self._string(railway)
+
+    def travel_time_matrix(
+        self, from_queries: list, to_queries: list, transfer_buffer: int = 0, with_transfers: bool = False
+    ) -> tuple:
+        """
+        Travel times from every origin to every destination, one full search per origin.
+
+        Origin trees come from (and stay in) the tree cache, so repeated
+        matrices over the same origins are array reads.
+
+        Returns:
+            (times, transfers): row-major array("f") of len(from_queries) x len(to_queries)
+            minutes, NaN where a station is unknown or unreachable; array("h") of
+            transfer edges taken (-1 there) if with_transfers, else None.
+        """
+        index = self.node_index
+        destinations = [[index[s] for s in self.resolve_station(q)] for q in to_queries]
+        n, m = len(from_queries), len(to_queries)
+        times = array("f", [float("nan")]) * (n * m)
+        transfers = array("h", [-1]) * (n * m) if with_transfers else None
+
+        for i, query in enumerate(from_queries):
+            origins = [index[s] for s in self.resolve_station(query)]
+            if not origins:
+                continue
+            tree = self._trees.get(self, origins, transfer_buffer)
+            with tree.lock:
+                tree.settle_all()
+                rank, settled = tree.rank, tree.settled
+                for j, nodes in enumerate(destinations):
+                    # Closest platform of the destination: the first one settled
+                    best = min((t for t in nodes if settled[t]), key=rank.__getitem__, default=-1)
+                    if best >= 0:
+                        times[i * m + j] = tree.dist[best]
+                        if transfers is not None:
+                            transfers[i * m + j] = tree.transfers[best]
+        return times, transfers
+
+    def reachable_within(self, from_query: str, max_minutes: float, transfer_buffer: int = 0) -> dict:
+        """
+        Stations reachable within max_minutes, from one bounded search.
+
+        Returns:
+            Japanese station name -> (minutes, transfer edges taken), or None if the station is unknown.
+        """
+        index = self.node_index
+        origins = [index[s] for s in self.resolve_station(from_query)]
+        if not origins:
+            return None
+
+        tree = self._trees.get(self, origins, transfer_buffer)
+        with tree.lock:
+            return self.reached_stations(tree, max_minutes)
+
+    def reached_stations(self, tree: ShortestPathTree, max_minutes: float = INF) -> dict:
+        """Settle tree up to max_minutes; Japanese station name -> (minutes, transfer edges taken)."""
+        tree.settle_all(max_minutes)
+        reached = {}
+        dist, transfers, settled = tree.dist, tree.transfers, tree.settled
+        for node, station_id in enumerate(self.node_ids):
+            if not settled[node] or dist[node] > max_minutes:
                 continue
-            visited.add(current)
+            name = self.station_info.get(station_id, {}).get("name_ja", station_id)
+            label = (dist[node], transfers[node])
+            if name not in reached or label < reached[name]:
+                reached[name] = label
+        return reached
 
-            for edge in self.edges[current]:
-                next_station = edge["to"]
-                if next_station in visited:
-                    continue
+    def meeting_points(self, queries: list, objective: str = "max", limit: int = 5, transfer_buffer: int = 0) -> dict:
+        """
+        Stations minimizing the longest (objective="max") or total ("sum") travel time from several origins.
 
-                edge_time = edge["time"]
-                
-                if not penalty_edges:
-                    pass
-                
-                if (current, next_station) in penalty_edges or (next_station, current) in penalty_edges:
-                    edge_time *= 5.0
-                
-                new_transfers = transfers
+        One full search per origin; every station reached from all origins is a
+        candidate, so the cost does not depend on how many are evaluated.
 
-                # Add transfer buffer for transfers
-                if edge["type"] == "transfer":
-                    edge_time += transfer_buffer
-                    new_transfers += 1
+        Returns:
+            {"objective", "candidates": [{"station", "score", "times", "transfers"}]}
+            with times/transfers in the order of queries.
+        """
+        if not self.is_built:
+            return {"error": "Graph not built. Call build_from_odpt() first."}
 
-                new_time = total_time + edge_time
-                
-                # Only add if we haven't found a better path to this station
-                if next_station not in parent or new_time < parent[next_station][1]:
-                    parent[next_station] = (current, new_time, new_transfers)
-                    heapq.heappush(pq, (new_time, next_station, new_transfers))
+        reached = []
+        for query in queries:
+            by_station = self.reachable_within(query, INF, transfer_buffer)
+            if by_station is None:
+                return {"error": f"Station not found: {query}"}
+            reached.append(by_station)
+
+        combine = max if objective == "max" else sum
+        other = sum if objective == "max" else max
+        scored = []
+        for name in set(reached[0]).intersection(*reached[1:]):
+            times = [r[name][0] for r in reached]
+            # Ties go to the better value of the other objective
+            scored.append((combine(times), other(times), name))
+        scored.sort()
 
-        return {"error": "No route found"}
+        return {
+            "objective": objective,
+            "candidates": [
+                {
+                    "station": name,
+                    "score": round(score, 1),
+                    "times": [round(r[name][0], 1) for r in reached],
+                    "transfers": [r[name][1] for r in reached],
+                }
+                for score, _, name in scored[:limit]
+            ],
+        }
 
-    def find_routes(self, from_query: str, to_query: str, limit: int = 3, transfer_buffer: int = 5) -> list:
+    def find_routes(
+        self, from_query: str, to_query: str, limit: int = 3, transfer_buffer: int = 5, avoid_delays: bool = False
+    ) -> list:
         """Find multiple distinct routes using iterative penalty method."""
         routes = []
         penalty_edges = set()
@@ -355,7 +547,7 @@ class RouteGraph:
             if len(routes) >= limit:
                 break
                 
-            result = self.find_route(from_query, to_query, transfer_buffer, penalty_edges)
+            result = self.find_route(from_query, to_query, transfer_buffer, penalty_edges, avoid_delays)
             if "error" in result:
                 break
                 
@@ -383,7 +575,7 @@ class RouteGraph:
         
         return routes
 
-    def _resolve_station(self, query: str) -> list:
+    def resolve_station(self, query: str) -> list:
         """Resolve station name or ID to list of station IDs."""
         # If it looks like an ID, use directly
         if query.startswith("odpt.Station:"):
@@ -500,172 +692,71 @@ class RouteGraph:
 
 
     def _load_gtfs_railway_info(self):
-        """Populate railway info for Metro lines to support name mapping."""
-        # Hardcoded map based on constants.py
-        # This ensures we get "銀座線" -> "Ginza" mapping in finder.
-        
-        # Metro
-        self.railways["odpt.Railway:TokyoMetro.Ginza"] = {"name_ja": "銀座線", "name_en": "Ginza Line"}
-        self.railways["odpt.Railway:TokyoMetro.Marunouchi"] = {"name_ja": "丸ノ内線", "name_en": "Marunouchi Line"}
-        self.railways["odpt.Railway:TokyoMetro.Hibiya"] = {"name_ja": "日比谷線", "name_en": "Hibiya Line"}
-        self.railways["odpt.Railway:TokyoMetro.Tozai"] = {"name_ja": "東西線", "name_en": "Tozai Line"}
-        self.railways["odpt.Railway:TokyoMetro.Chiyoda"] = {"name_ja": "千代田線", "name_en": "Chiyoda Line"}
-        self.railways["odpt.Railway:TokyoMetro.Yurakucho"] = {"name_ja": "有楽町線", "name_en": "Yurakucho Line"}
-        self.railways["odpt.Railway:TokyoMetro.Hanzomon"] = {"name_ja": "半蔵門線", "name_en": "Hanzomon Line"}
-        self.railways["odpt.Railway:TokyoMetro.Namboku"] = {"name_ja": "南北線", "name_en": "Namboku Line"}
-        self.railways["odpt.Railway:TokyoMetro.Fukutoshin"] = {"name_ja": "副都心線", "name_en": "Fukutoshin Line"}
-        
-        # Toei
-        self.railways["odpt.Railway:Toei.Asakusa"] = {"name_ja": "浅草線", "name_en": "Asakusa Line"}
-        self.railways["odpt.Railway:Toei.Mita"] = {"name_ja": "三田線", "name_en": "Mita Line"}
-        self.railways["odpt.Railway:Toei.Shinjuku"] = {"name_ja": "新宿線", "name_en": "Shinjuku Line"}
-        self.railways["odpt.Railway:Toei.Oedo"] = {"name_ja": "大江戸線", "name_en": "Oedo Line"}
+        """Populate railway info for GTFS lines to support name mapping."""
+        # Gives finder the "銀座線" -> "Ginza" mapping for every configured feed
+        for feed in load_feeds():
+            for i, railway_id in enumerate(feed.route_railway_ids):
+                self.railways[railway_id] = {
+                    "name_ja": feed.route_names[i],
+                    "name_en": feed.translations.get(feed.route_names[i], feed.route_names_en[i])
+                }
 
     def _load_gtfs_stations_data(self) -> list:
-
-        """Load Tokyo Metro stations from GTFS and return as list of ODPT-like objects."""
-        gtfs_dir = os.path.join(os.path.dirname(__file__), "../../backend/data/metro_gtfs")
-        if not os.path.exists(gtfs_dir):
-            return []
-            
-        print("Loading GTFS stations...")
-        
-        # Metro Line Code Map
-        metro_codes = {
-            "G": "Ginza", "M": "Marunouchi", "m": "Marunouchi", "H": "Hibiya",
-            "T": "Tozai", "C": "Chiyoda", "Y": "Yurakucho", "Z": "Hanzomon",
-            "N": "Namboku", "F": "Fukutoshin", "A": "Asakusa", "I": "Mita", 
-            "S": "Shinjuku", "E": "Oedo"
-        }
-        
+        """Load GTFS stations and return as list of ODPT-like objects."""
         generated_stations = []
-        
-        try:
-            with open(os.path.join(gtfs_dir, "stops.txt"), "r", encoding="utf-8") as f:
-                reader = csv.DictReader(f)
-                for row in reader:
-                    stop_code = row.get("stop_code")
-                    stop_name = row["stop_name"]
-                    
-                    if not stop_code: continue
-                    
-                    # Infer railway
-                    prefix = stop_code[0]
-                    line_name = metro_codes.get(prefix)
-                    
-                    if line_name:
-                        suffix = line_name
-                        railway_id = f"odpt.Railway:TokyoMetro.{suffix}"
-                        if prefix in ["A", "I", "S", "E"]:
-                             railway_id = f"odpt.Railway:Toei.{suffix}"
-
-                        # Create synthetic object
-                        operator = "TokyoMetro" if prefix not in ["A", "I", "S", "E"] else "Toei"
-                        station_id = f"gtfs.Station:{operator}.{suffix}.{stop_code}"
-                        
-                        generated_stations.append({
-                            "owl:sameAs": station_id,
-                            "dc:title": stop_name,
-                            "odpt:railway": railway_id,
-                            "odpt:stationTitle": {"ja": stop_name}
-                        })
-                        
-        except Exception as e:
-            print(f"Error parse GTFS stops: {e}")
-            
+
+        for feed in load_feeds():
+            for i, stop_name in enumerate(feed.stop_names):
+                railway_id = feed.stop_railways[i]
+                if not feed.stop_codes[i] or not railway_id:
+                    continue
+
+                generated_stations.append({
+                    "owl:sameAs": feed.station_id(i),
+                    "dc:title": stop_name,
+                    "odpt:railway": railway_id,
+                    "odpt:stationTitle": {"ja": stop_name}
+                })
+
         return generated_stations
 
     def _load_gtfs_edges(self):
-        """Load Tokyo Metro GTFS data to enhance graph edges."""
-        gtfs_dir = os.path.join(os.path.dirname(__file__), "../../backend/data/metro_gtfs")
-        if not os.path.exists(gtfs_dir):
+        """Use GTFS stop_times to set accurate ride times on graph edges."""
+        feeds = load_feeds()
+        if not feeds:
             return
 
         print("Loading GTFS edges...")
-        from .constants import RAILWAY_JA_TO_EN
-        
-        # 1. Routes
-        gtfs_route_to_odpt = {}
-        try:
-            with open(os.path.join(gtfs_dir, "routes.txt"), "r", encoding="utf-8") as f:
-                reader = csv.DictReader(f)
-                for row in reader:
-                    route_name = row["route_long_name"]
-                    suffix = RAILWAY_JA_TO_EN.get(route_name)
-                    if suffix:
-                        if "都営" in row.get("agency_id", "") or suffix in ["Asakusa", "Mita", "Shinjuku", "Oedo"]:
-                             gtfs_route_to_odpt[row["route_id"]] = f"odpt.Railway:Toei.{suffix}"
-                        else:
-                             gtfs_route_to_odpt[row["route_id"]] = f"odpt.Railway:TokyoMetro.{suffix}"
-        except Exception: pass
-
-        # 2. Stops (ID -> Name)
-        gtfs_stops = {}
-        try:
-            with open(os.path.join(gtfs_dir, "stops.txt"), "r", encoding="utf-8") as f:
-                reader = csv.DictReader(f)
-                for row in reader:
-                    gtfs_stops[row["stop_id"]] = row["stop_name"]
-        except Exception: pass
-
-        # 3. Trips
-        trip_route_map = {}
-        try:
-            with open(os.path.join(gtfs_dir, "trips.txt"), "r", encoding="utf-8") as f:
-                reader = csv.DictReader(f)
-                for row in reader:
-                    trip_route_map[row["trip_id"]] = row["route_id"]
-        except Exception: pass
-
-        # 4. Times
-        try:
-            with open(os.path.join(gtfs_dir, "stop_times.txt"), "r", encoding="utf-8") as f:
-                reader = csv.DictReader(f)
-                segment_times = defaultdict(list)
-                
-                # Group by trip
-                trips_data = defaultdict(list)
-                for row in reader:
-                    trips_data[row["trip_id"]].append(row)
-                
-                for trip_id, stops in trips_data.items():
-                    stops.sort(key=lambda x: int(x["stop_sequence"]))
-                    route_id = trip_route_map.get(trip_id)
-                    railway_id = gtfs_route_to_odpt.get(route_id)
-                    if not railway_id: continue
-                    
-                    for i in range(len(stops) - 1):
-                        s1, s2 = stops[i], stops[i+1]
-                        name1 = gtfs_stops.get(s1["stop_id"])
-                        name2 = gtfs_stops.get(s2["stop_id"])
-                        if not name1 or not name2: continue
-                        
-                        try:
-                            def ptime(t):
-                                h,m,s = map(int, t.split(':'))
-                                return h*60 + m + s/60
-                            diff = ptime(s2["arrival_time"]) - ptime(s1["departure_time"])
-                            if diff < 0: diff += 24*60
-                            segment_times[(name1, name2, railway_id)].append(diff)
-                        except: pass
-                
-                count = 0
-                for (n1, n2, rid), times in segment_times.items():
-                     ids1 = self.station_by_name.get(n1, [])
-                     ids2 = self.station_by_name.get(n2, [])
-                     
-                     oid1 = next((i for i in ids1 if self.station_info[i]["railway"] == rid), None)
-                     oid2 = next((i for i in ids2 if self.station_info[i]["railway"] == rid), None)
-                     
-                     if oid1 and oid2:
-                         avg = sum(times)/len(times)
-                         self._upsert_edge(oid1, oid2, avg, "ride", rid)
-                         count += 1
-                
-                print(f"Updated {count} segments from GTFS.");
-                
-        except Exception as e:
-            print(f"GTFS Edges Error: {e}")
+        count = 0
+        for feed in feeds:
+            # (from_stop, to_stop, route) -> [total_minutes, samples]
+            segment_times = defaultdict(lambda: [0.0, 0])
+            st_stop, st_arr, st_dep = feed.st_stop, feed.st_arrival, feed.st_departure
+
+            for t in range(feed.trip_count):
+                route_idx = feed.trip_route[t]
+                start, end = feed.trip_offsets[t], feed.trip_offsets[t + 1]
+                for i in range(start, end - 1):
+                    diff = (st_arr[i + 1] - st_dep[i]) / 60
+                    if diff < 0:
+                        diff += 24 * 60
+                    acc = segment_times[(st_stop[i], st_stop[i + 1], route_idx)]
+                    acc[0] += diff
+                    acc[1] += 1
+
+            for (s1, s2, route_idx), (total, samples) in segment_times.items():
+                rid = feed.route_railway_ids[route_idx]
+                ids1 = self.station_by_name.get(feed.stop_names[s1], [])
+                ids2 = self.station_by_name.get(feed.stop_names[s2], [])
+
+                oid1 = next((i for i in ids1 if self.station_info[i]["railway"] == rid), None)
+                oid2 = next((i for i in ids2 if self.station_info[i]["railway"] == rid), None)
+
+                if oid1 and oid2:
+                    self._upsert_edge(oid1, oid2, total / samples, "ride", rid)
+                    count += 1
+
+        print(f"Updated {count} segments from GTFS.")
 
     def _upsert_edge(self, u, v, time, type, railway):
         current_edges = self.edges[u]
@@ -684,20 +775,86 @@ class RouteGraph:
             })
 
 
+class _EdgeView(Mapping):
+    """Read-only station_id -> [edge dict, ...] view over the array form."""
+
+    def __init__(self, graph: RouteGraph):
+        self._graph = graph
+
+    def __getitem__(self, station_id: str) -> list:
+        g = self._graph
+        i = g.node_index[station_id]
+        edges = []
+        for e in range(g.edge_offsets[i], g.edge_offsets[i + 1]):
+            edge = {
+                "to": g.node_ids[g.edge_to[e]],
+                "time": g.edge_time[e],
+                "type": "transfer" if g.edge_kind[e] == TRANSFER else "ride"
+            }
+            if g.edge_railway[e] >= 0:
+                edge["railway"] = g.railway_id(g.edge_railway[e])
+            edges.append(edge)
+        return edges
+
+    def __iter__(self):
+        g = self._graph
+        return (sid for i, sid in enumerate(g.node_ids) if g.edge_offsets[i + 1] > g.edge_offsets[i])
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+
 # Global instance
 route_graph = RouteGraph()
+_last_version_check = 0.0
 
 
 def get_graph() -> RouteGraph:
-    """Get the global route graph instance."""
+    """Get the global route graph instance (switching to a newly published snapshot)."""
+    global route_graph, _last_version_check
+    if route_graph.snapshot_version:
+        now = time.monotonic()
+        if now - _last_version_check >= VERSION_CHECK_INTERVAL:
+            _last_version_check = now
+            version = graph_snapshot.current_version()
+            if version and version != route_graph.snapshot_version:
+                snapshot = graph_snapshot.attach(version)
+                if snapshot:
+                    route_graph = RouteGraph.from_snapshot(snapshot)
+                    print(f"Switched to route graph snapshot {version}")
     return route_graph
 
 
+def _snapshot_is_fresh(snapshot) -> bool:
+    return snapshot is not None and time.time() - snapshot.built_at < GRAPH_MAX_AGE_SECONDS
+
+
 def initialize_graph():
-    """Initialize the graph by building it from ODPT data."""
+    """Attach to the shared graph snapshot, building and publishing it if needed."""
     print("Initializing route graph...")
     global route_graph
-    if not route_graph.is_built:
-        route_graph.build_from_odpt()
-
-
+    if route_graph.is_built:
+        return
+
+    snapshot = graph_snapshot.attach()
+    if not _snapshot_is_fresh(snapshot):
+        with graph_snapshot.build_lock():
+            # Another worker may have published while we waited for the lock
+            snapshot = graph_snapshot.attach()
+            if not _snapshot_is_fresh(snapshot):
+                graph = RouteGraph()
+                graph.build_from_odpt()
+                graph_snapshot.publish(graph)
+                snapshot = graph_snapshot.attach()
+
+    route_graph = RouteGraph.from_snapshot(snapshot)
+    print(f"Attached route graph snapshot {route_graph.snapshot_version} "
+          f"({len(route_graph.node_ids)} nodes, {len(route_graph.edge_to)} edges)")
+
+
+def reload_graph() -> str:
+    """Rebuild the graph and publish it; every worker switches over on its next check."""
+    with graph_snapshot.build_lock():
+        graph = RouteGraph()
+        graph.build_from_odpt()
+        return graph_snapshot.publish(graph)
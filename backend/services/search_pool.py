@@ -0,0 +1,331 @@
+"""
+Process pool for CPU-bound route searches.
+
+Graph and timetable searches are pure Python and hold the GIL, so threads do
+not add throughput. Searches are submitted to a pool of worker processes
+instead; each worker maps the shared graph snapshot and timetable artifact
+once at start-up (both are read-only mmap files, so the pages are shared),
+which makes throughput scale with the number of cores.
+
+Each submission carries a deadline. A search still waiting in the queue when
+its deadline passes is dropped by the worker without running, and the caller
+stops waiting at the deadline. When more searches are queued than
+SEARCH_MAX_QUEUE, new ones are rejected immediately instead of queueing
+behind work that will time out anyway.
+
+SEARCH_PROCESSES=0 runs searches on the in-process CPU thread pool instead
+(development, platforms without fork/spawn support).
+"""
+import asyncio
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
+
+from .disruption import compare_origins
+from .executors import run_cpu
+from .line_scores import get_line_scores
+from .route_graph import get_graph, initialize_graph
+from .timetable.artifact import get_timetable
+from .timetable.mcraptor import multi_with_timetable
+from .timetable.raptor import (
+    arrive_by_with_timetable, one_to_many_with_timetable, profile_with_timetable, reachable_with_timetable,
+    search_with_timetable,
+)
+from .timetable.transfer_patterns import search_with_patterns
+
+SEARCH_PROCESSES = int(os.getenv("SEARCH_PROCESSES", str(os.cpu_count() or 2)))
+SEARCH_DEADLINE_SECONDS = float(os.getenv("SEARCH_DEADLINE_SECONDS", "10"))
+SEARCH_MAX_QUEUE = int(os.getenv("SEARCH_MAX_QUEUE", str(8 * max(SEARCH_PROCESSES, 1))))
+
+
+class SearchTimeout(Exception):
+    """The search did not finish before its deadline."""
+
+
+class SearchOverloaded(Exception):
+    """Too many searches are already queued."""
+
+
+# ==============================================================================
+# Worker side
+# ==============================================================================
+
+def _init_worker():
+    """Map the graph snapshot, timetable and line scores once per worker."""
+    initialize_graph()
+    get_timetable()
+    get_line_scores()
+
+
+def _ping() -> int:
+    return os.getpid()
+
+
+def _run(fn: Callable, deadline: float, args: tuple, kwargs: dict):
+    """Run a search unless it expired while queued. Returns (result, start time, run time)."""
+    started = time.time()
+    if started > deadline:
+        raise SearchTimeout()
+    result = fn(*args, **kwargs)
+    return result, started, time.time() - started
+
+
+def find_route(from_station: str, to_station: str, transfer_buffer: int = 0, avoid_delays: bool = False) -> dict:
+    return get_graph().find_route(from_station, to_station, transfer_buffer=transfer_buffer, avoid_delays=avoid_delays)
+
+
+def find_routes(from_station: str, to_station: str, limit: int = 3, transfer_buffer: int = 5) -> list:
+    return get_graph().find_routes(from_station, to_station, limit=limit, transfer_buffer=transfer_buffer)
+
+
+def timetable_journey(
+    from_station: str, to_station: str, time: str, weekday: str, avoid_delays: bool = False
+) -> Optional[Dict]:
+    """
+    Popular origins: evaluate precomputed transfer patterns, else run the full search.
+
+    Delay-aware searches always run the full search (patterns assume the schedule).
+    """
+    timetable, graph = get_timetable(), get_graph()
+    if timetable is None:
+        return None
+    if avoid_delays:
+        return search_with_timetable(
+            timetable, graph, from_station, to_station, time, weekday, transfer_buffer=5, avoid_delays=True
+        )
+    return search_with_patterns(
+        timetable, graph, from_station, to_station, time, weekday, transfer_buffer=5
+    ) or search_with_timetable(
+        timetable, graph, from_station, to_station, time, weekday, transfer_buffer=5
+    )
+
+
+def arrive_by(from_station: str, to_station: str, time: str, weekday: str) -> Optional[Dict]:
+    timetable = get_timetable()
+    if timetable is None:
+        return None
+    return arrive_by_with_timetable(timetable, get_graph(), from_station, to_station, time, weekday, transfer_buffer=5)
+
+
+def profile(from_station: str, to_station: str, time: str, end_time: Optional[str], weekday: str) -> Optional[Dict]:
+    timetable = get_timetable()
+    if timetable is None:
+        return None
+    return profile_with_timetable(
+        timetable, get_graph(), from_station, to_station, time, end_time, weekday, transfer_buffer=5
+    )
+
+
+def multi(from_station: str, to_station: str, time: str, weekday: str, limit: int = 3) -> Optional[List[Dict]]:
+    timetable = get_timetable()
+    if timetable is None:
+        return None
+    return multi_with_timetable(
+        timetable, get_graph(), from_station, to_station, time, weekday, transfer_buffer=5, limit=limit
+    )
+
+
+def batch_routes(
+    from_station: str,
+    items: List[Tuple[int, str, Optional[str]]],
+    transfer_buffer: int = 0,
+    weekday: str = "Weekday",
+) -> List[Tuple[int, Dict]]:
+    """
+    Routes from one origin to many destinations.
+
+    Untimed items are graph routes (one Dijkstra tree, walked per destination);
+    timed items share one one-to-all RAPTOR pass per departure time.
+
+    Args:
+        items: (index, to_station, departure time or None)
+    Returns:
+        (index, result) per item
+    """
+    graph = get_graph()
+    results = []
+    by_time: Dict[str, List[Tuple[int, str]]] = {}
+    for index, to_station, departure_time in items:
+        if departure_time is None:
+            results.append((index, graph.find_route(from_station, to_station, transfer_buffer=transfer_buffer)))
+        else:
+            by_time.setdefault(departure_time, []).append((index, to_station))
+
+    timetable = get_timetable()
+    for departure_time, group in by_time.items():
+        if timetable is None:
+            results.extend((index, {"error": "Timetable artifact is not available"}) for index, _ in group)
+            continue
+        journeys = one_to_many_with_timetable(
+            timetable, graph, from_station, [to for _, to in group], departure_time, weekday, transfer_buffer=5
+        )
+        results.extend((index, journeys[to] or {"error": "No journey found"}) for index, to in group)
+    return results
+
+
+def matrix_rows(
+    from_stations: List[str], to_stations: List[str], transfer_buffer: int = 0, with_transfers: bool = False
+) -> Tuple[bytes, Optional[bytes]]:
+    """Rows of a travel-time matrix as raw array bytes (see RouteGraph.travel_time_matrix)."""
+    times, transfers = get_graph().travel_time_matrix(from_stations, to_stations, transfer_buffer, with_transfers)
+    return times.tobytes(), transfers.tobytes() if transfers is not None else None
+
+
+def isochrone(
+    from_station: str, max_minutes: int, transfer_buffer: int = 0, time: Optional[str] = None, weekday: str = "Weekday"
+) -> Optional[Dict]:
+    """
+    Stations reachable within max_minutes, sorted by time.
+
+    With a departure time the timetable is searched (waiting included);
+    otherwise, or when the station has no timetable stops, graph minutes.
+    """
+    graph, timetable = get_graph(), get_timetable()
+    reached, mode = None, "graph"
+    if time is not None and timetable is not None:
+        reached = reachable_with_timetable(timetable, graph, from_station, time, max_minutes, weekday, transfer_buffer=5)
+        mode = "timetable"
+    if reached is None:
+        reached, mode = graph.reachable_within(from_station, max_minutes, transfer_buffer), "graph"
+    if reached is None:
+        return None
+    return {
+        "mode": mode,
+        "stations": [
+            {"station": name, "time": round(float(minutes), 1), "transfers": transfers}
+            for name, (minutes, transfers) in sorted(reached.items(), key=lambda item: item[1])
+        ],
+    }
+
+
+def meeting_point(stations: List[str], objective: str = "max", limit: int = 5, transfer_buffer: int = 0) -> Dict:
+    return get_graph().meeting_points(stations, objective=objective, limit=limit, transfer_buffer=transfer_buffer)
+
+
+def disruption(
+    origins: List[str], destinations: List[str], scenario: Dict, transfer_buffer: int = 0
+) -> List[Tuple[str, str, float, Optional[float]]]:
+    """Pairs from these origins whose travel time changes under the scenario (see services/disruption.py)."""
+    return compare_origins(get_graph(), origins, destinations, scenario, transfer_buffer)
+
+
+# ==============================================================================
+# API side
+# ==============================================================================
+
+class SearchPool:
+    """Process pool with deadlines, load shedding and queue metrics."""
+
+    def __init__(self, processes: int = SEARCH_PROCESSES, max_queue: int = SEARCH_MAX_QUEUE):
+        self.processes = processes
+        self.max_queue = max_queue
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.timed_out = 0
+        self.rejected = 0
+        self._wait_total = 0.0
+        self._run_total = 0.0
+
+    def start(self):
+        """Spawn and warm every worker so the first requests do not pay for it."""
+        if self.processes <= 0 or self._executor is not None:
+            return
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.processes,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+        )
+        pids = {f.result() for f in [self._executor.submit(_ping) for _ in range(self.processes)]}
+        print(f"Search pool started ({len(pids)} worker processes)")
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    @property
+    def queue_depth(self) -> int:
+        return max(0, self.in_flight - max(self.processes, 1))
+
+    async def submit(self, fn: Callable, *args, deadline: Optional[float] = None, **kwargs):
+        """
+        Run fn(*args, **kwargs) in a worker and await its result.
+
+        Args:
+            fn: module-level function of this module (must be picklable)
+            deadline: seconds the caller is willing to wait (default SEARCH_DEADLINE_SECONDS)
+        Raises:
+            SearchTimeout, SearchOverloaded
+        """
+        timeout = SEARCH_DEADLINE_SECONDS if deadline is None else deadline
+        with self._lock:
+            if self.queue_depth >= self.max_queue:
+                self.rejected += 1
+                raise SearchOverloaded()
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            self.submitted += 1
+
+        submitted_at = time.time()
+        try:
+            if self._executor is None:
+                call = run_cpu(_run, fn, submitted_at + timeout, args, kwargs)
+            else:
+                call = asyncio.wrap_future(
+                    self._executor.submit(_run, fn, submitted_at + timeout, args, kwargs)
+                )
+            result, started, run_time = await asyncio.wait_for(call, timeout)
+        except (SearchTimeout, asyncio.TimeoutError):
+            with self._lock:
+                self.timed_out += 1
+            raise SearchTimeout()
+        except Exception:
+            with self._lock:
+                self.failed += 1
+            raise
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+        with self._lock:
+            self.completed += 1
+            self._wait_total += max(0.0, started - submitted_at)
+            self._run_total += run_time
+        return result
+
+    def metrics(self) -> Dict:
+        with self._lock:
+            done = max(self.completed, 1)
+            return {
+                "processes": self.processes,
+                "in_flight": self.in_flight,
+                "queue_depth": self.queue_depth,
+                "max_in_flight": self.max_in_flight,
+                "max_queue": self.max_queue,
+                "submitted": self.submitted,
+                "completed": self.completed,
+                "failed": self.failed,
+                "timed_out": self.timed_out,
+                "rejected": self.rejected,
+                "avg_queue_wait_ms": round(self._wait_total / done * 1000, 1),
+                "avg_run_ms": round(self._run_total / done * 1000, 1),
+                "deadline_seconds": SEARCH_DEADLINE_SECONDS,
+            }
+
+
+_pool: Optional[SearchPool] = None
+
+
+def get_search_pool() -> SearchPool:
+    global _pool
+    if _pool is None:
+        _pool = SearchPool()
+    return _pool
@@ -0,0 +1,55 @@
+"""
+Request coalescing (singleflight) for identical concurrent searches.
+
+At rush hour many clients ask for the same station pair at the same minute.
+The first request for a key starts the computation; identical requests that
+arrive while it is running await the same task and get the same result, so
+CPU use scales with distinct queries instead of total requests.
+
+Results are shared, not copied: callers must not modify them.
+"""
+import asyncio
+from typing import Awaitable, Callable, Dict, Hashable, TypeVar
+
+T = TypeVar("T")
+
+
+class SingleFlight:
+    """In-flight calls per key (one per event loop, i.e. per API worker)."""
+
+    def __init__(self):
+        self._calls: Dict[Hashable, asyncio.Future] = {}
+        self.started = 0
+        self.coalesced = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> T:
+        """
+        Await fn() once per key among concurrent callers.
+
+        The computation runs as its own task, so a caller that disconnects
+        does not cancel it for the others; exceptions reach every caller.
+        """
+        call = self._calls.get(key)
+        if call is not None:
+            self.coalesced += 1
+        else:
+            self.started += 1
+            call = asyncio.ensure_future(fn())
+            self._calls[key] = call
+            call.add_done_callback(lambda done: self._forget(key, done))
+        return await asyncio.shield(call)
+
+    def _forget(self, key: Hashable, call: asyncio.Future):
+        if self._calls.get(key) is call:
+            del self._calls[key]
+        if not call.cancelled():
+            call.exception()  # Retrieved here so an unawaited failure is not logged
+
+    def metrics(self) -> Dict:
+        total = self.started + self.coalesced
+        return {
+            "in_flight": len(self._calls),
+            "started": self.started,
+            "coalesced": self.coalesced,
+            "coalesced_ratio": round(self.coalesced / total, 3) if total else 0.0,
+        }
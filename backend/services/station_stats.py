@@ -0,0 +1,25 @@
+"""
+Daily passenger counts per station (data/station_stats.json, scripts/fetch_station_stats.py).
+
+Keys are Japanese station names, values average daily passengers.
+"""
+import json
+import os
+from functools import lru_cache
+from typing import Dict, List
+
+STATS_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "station_stats.json")
+
+
+@lru_cache(maxsize=1)
+def get_station_stats() -> Dict[str, int]:
+    if not os.path.exists(STATS_FILE):
+        return {}
+    with open(STATS_FILE, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def top_stations(n: int) -> List[str]:
+    """The n busiest stations, busiest first."""
+    stats = get_station_stats()
+    return sorted(stats, key=stats.get, reverse=True)[:n]
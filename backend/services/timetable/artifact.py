@@ -0,0 +1,296 @@
+"""
+Memory-mapped timetable artifact.
+
+The refresh pipeline flattens the normalized timetable tables into one
+read-only binary file of int32 arrays plus an interned UTF-8 string table.
+Workers mmap the file and read the arrays zero-copy, so every process
+shares the same physical pages and a new worker has the whole timetable
+available as soon as the file is opened.
+
+The file format is shared with the graph snapshot (see services/mmap_store).
+meta holds {"version", "built_at", "days": {weekday_type: string id}}.
+
+Arrays (all int32, indices are dense 0..n-1):
+    trip_offsets     stop_times of trip t are st_*[trip_offsets[t]:trip_offsets[t + 1]]
+    st_stop, st_time stop index and service-day minutes (monotonic within a trip, >= 24:00 after midnight)
+    trip_route, trip_train_number, trip_train_type, trip_destination,
+    trip_direction, trip_day          per-trip attributes (strings are string-table ids)
+    stop_station_id, stop_name, stop_name_ja, route_railway_id, route_railway_name
+    stop_dep_offsets, stop_dep_st     per-stop departure index: stop_times at stop s
+                                      sorted by time are stop_dep_st[stop_dep_offsets[s]:...]
+    pat_*, stop_pat*, stop_xfer*,     route patterns, transfers and through service
+    trip_next                         for timetable routing (see timetable/patterns)
+    str_offsets, str_blob             interned strings
+"""
+import bisect
+import os
+import time
+from array import array
+from typing import Dict, List, Optional
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+from services.mmap_store import MappedFile, StringTable, write_sections
+from .patterns import build_patterns
+
+MAGIC = b"TTABLE02"
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "data")
+ARTIFACT_PATH = os.path.join(DATA_DIR, "timetable.bin")
+
+MINUTES_PER_DAY = 24 * 60
+SERVICE_DAY_START = 3 * 60  # Times before 03:00 count as the end of the previous day
+
+
+def service_minutes(time_str: str) -> int:
+    """HH:MM -> minutes on the service-day clock (00:30 -> 24:30)."""
+    h, m = time_str.split(":")[:2]
+    minutes = int(h) * 60 + int(m)
+    return minutes + MINUTES_PER_DAY if minutes < SERVICE_DAY_START else minutes
+
+
+def build_artifact(db: Session, path: str = ARTIFACT_PATH, version: Optional[str] = None) -> str:
+    """
+    Flatten stops/routes/trips/stop_times into a timetable artifact.
+
+    The file is written next to the target and renamed into place, so
+    workers that still map the previous version keep a consistent view.
+
+    Returns:
+        The artifact version string.
+    """
+    strings = StringTable()
+    version = version or time.strftime("%Y%m%d%H%M%S")
+
+    # Stops and routes
+    stop_index: Dict[int, int] = {}
+    stop_station_id, stop_name, stop_name_ja = array("i"), array("i"), array("i")
+    for pk, station_id, name, name_ja in db.execute(text(
+        "SELECT id, station_id, station_name, station_name_ja FROM stops ORDER BY id"
+    )):
+        stop_index[pk] = len(stop_index)
+        stop_station_id.append(strings.intern(station_id))
+        stop_name.append(strings.intern(name))
+        stop_name_ja.append(strings.intern(name_ja))
+
+    route_index: Dict[int, int] = {}
+    route_railway_id, route_railway_name = array("i"), array("i")
+    for pk, railway_id, railway_name in db.execute(text(
+        "SELECT id, railway_id, railway_name FROM routes ORDER BY id"
+    )):
+        route_index[pk] = len(route_index)
+        route_railway_id.append(strings.intern(railway_id))
+        route_railway_name.append(strings.intern(railway_name))
+
+    # Trips
+    trip_index: Dict[int, int] = {}
+    trip_cols = {name: array("i") for name in (
+        "trip_route", "trip_train_number", "trip_train_type",
+        "trip_destination", "trip_direction", "trip_day",
+    )}
+    for pk, route_id, train_number, train_type, destination, direction, weekday_type in db.execute(text(
+        "SELECT id, route_id, train_number, train_type, destination_station, direction, weekday_type "
+        "FROM trips ORDER BY id"
+    )):
+        trip_index[pk] = len(trip_index)
+        trip_cols["trip_route"].append(route_index[route_id])
+        trip_cols["trip_train_number"].append(strings.intern(train_number))
+        trip_cols["trip_train_type"].append(strings.intern(train_type))
+        trip_cols["trip_destination"].append(strings.intern(destination))
+        trip_cols["trip_direction"].append(strings.intern(direction))
+        trip_cols["trip_day"].append(strings.intern(weekday_type))
+
+    # Stop times, trip-major. Trips are written in id order so offsets are a running count.
+    n_trips = len(trip_index)
+    trip_offsets = array("i", bytes(4 * (n_trips + 1)))
+    st_stop, st_time = array("i"), array("i")
+    last_trip, last_time = -1, 0
+    for trip_id, stop_id, minutes in db.execute(text(
+        "SELECT trip_id, stop_id, departure_minutes FROM stop_times ORDER BY trip_id, stop_sequence"
+    )):
+        t = trip_index.get(trip_id)
+        if t is None or stop_id not in stop_index:
+            continue
+        if t != last_trip:
+            last_trip, last_time = t, -1
+            # Trips starting after midnight belong to the previous service day
+            if minutes < SERVICE_DAY_START:
+                minutes += MINUTES_PER_DAY
+        # Stored times wrap at midnight; unwrap so times grow along the trip
+        while minutes < last_time:
+            minutes += MINUTES_PER_DAY
+        last_time = minutes
+        st_stop.append(stop_index[stop_id])
+        st_time.append(minutes)
+        trip_offsets[t + 1] += 1
+    for t in range(n_trips):
+        trip_offsets[t + 1] += trip_offsets[t]
+
+    # Per-stop departure index sorted by time
+    n_stops = len(stop_index)
+    order = sorted(range(len(st_stop)), key=lambda i: (st_stop[i], st_time[i]))
+    stop_dep_st = array("i", order)
+    stop_dep_offsets = array("i", bytes(4 * (n_stops + 1)))
+    for s in st_stop:
+        stop_dep_offsets[s + 1] += 1
+    for s in range(n_stops):
+        stop_dep_offsets[s + 1] += stop_dep_offsets[s]
+
+    patterns = build_patterns(
+        trip_offsets, st_stop, st_time,
+        trip_cols["trip_day"], trip_cols["trip_route"], trip_cols["trip_train_number"],
+        stop_names=[strings.values[sid] for sid in stop_name],
+        empty_string=strings.intern(""),
+    )
+
+    sections = {
+        "trip_offsets": trip_offsets,
+        "st_stop": st_stop,
+        "st_time": st_time,
+        **trip_cols,
+        "stop_station_id": stop_station_id,
+        "stop_name": stop_name,
+        "stop_name_ja": stop_name_ja,
+        "route_railway_id": route_railway_id,
+        "route_railway_name": route_railway_name,
+        "stop_dep_offsets": stop_dep_offsets,
+        "stop_dep_st": stop_dep_st,
+        **patterns,
+        **strings.sections(),
+    }
+    meta = {
+        "version": version,
+        "built_at": time.time(),
+        "days": {strings.values[sid]: sid for sid in set(trip_cols["trip_day"])},
+    }
+    write_sections(path, MAGIC, sections, meta)
+    print(f"Timetable artifact {version}: {n_stops} stops, {n_trips} trips, "
+          f"{len(st_stop)} stop_times, {len(patterns['pat_day'])} patterns -> {path} ({os.path.getsize(path) // 1024} KB)")
+    return version
+
+
+class TimetableArtifact(MappedFile):
+    """Read-only, zero-copy view of a timetable artifact file."""
+
+    MAGIC = MAGIC
+
+    def __init__(self, path: str = ARTIFACT_PATH):
+        super().__init__(path)
+        self.version = self.meta["version"]
+        self.built_at = self.meta["built_at"]
+        self.days: Dict[str, int] = self.meta["days"]  # weekday_type label -> string id
+
+        self.trip_count = len(self.trip_offsets) - 1
+        self.stop_count = len(self.stop_dep_offsets) - 1
+        self.pattern_count = len(self.pat_day)
+        self._stops_by_name: Optional[Dict[str, List[int]]] = None
+        self._stops_by_station: Optional[Dict[str, int]] = None
+        self._trip_prev: Optional[array] = None
+
+    def stop_label(self, stop_idx: int) -> str:
+        """Japanese station name when known, otherwise the English one."""
+        return self.string(self.stop_name_ja[stop_idx]) or self.string(self.stop_name[stop_idx])
+
+    def railway_name(self, route_idx: int) -> str:
+        return self.string(self.route_railway_name[route_idx])
+
+    def stops_by_name(self) -> Dict[str, List[int]]:
+        """Lower-cased English and Japanese station name -> stop indices (built on first use)."""
+        if self._stops_by_name is None:
+            index: Dict[str, List[int]] = {}
+            for s in range(self.stop_count):
+                for sid in {self.stop_name[s], self.stop_name_ja[s]}:
+                    name = self.string(sid)
+                    if name:
+                        index.setdefault(name.lower(), []).append(s)
+            self._stops_by_name = index
+        return self._stops_by_name
+
+    def find_stops(self, name: str) -> List[int]:
+        """Stops matching a station name (hyphens ignored, e.g. Shin-Okubo / ShinOkubo)."""
+        index = self.stops_by_name()
+        key = name.lower()
+        return index.get(key) or index.get(key.replace("-", ""), [])
+
+    def stop_for_station(self, station_id: str) -> Optional[int]:
+        """Stop index of an ODPT/GTFS station id."""
+        if self._stops_by_station is None:
+            self._stops_by_station = {self.string(self.stop_station_id[s]): s for s in range(self.stop_count)}
+        return self._stops_by_station.get(station_id)
+
+    def transfers_from(self, stop_idx: int):
+        """Other stops of the same station."""
+        return self.stop_xfer[self.stop_xfer_offsets[stop_idx]:self.stop_xfer_offsets[stop_idx + 1]]
+
+    def trip_of(self, st: int) -> int:
+        """Trip owning stop_time st (binary search over trip_offsets)."""
+        return bisect.bisect_right(self.trip_offsets, st) - 1
+
+    def trip_prev(self) -> array:
+        """Inverse of trip_next: the trip a through train came from, or -1 (built on first use)."""
+        if self._trip_prev is None:
+            prev = array("i", [-1]) * self.trip_count
+            for t, nxt in enumerate(self.trip_next):
+                if nxt >= 0:
+                    prev[nxt] = t
+            self._trip_prev = prev
+        return self._trip_prev
+
+    def departures_at(self, stop_idx: int, after_minutes: int = 0) -> range:
+        """Range into stop_dep_st of departures at a stop at or after a time."""
+        lo, hi = self.stop_dep_offsets[stop_idx], self.stop_dep_offsets[stop_idx + 1]
+        st_time, dep_st = self.st_time, self.stop_dep_st
+        end = hi
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if st_time[dep_st[mid]] < after_minutes:
+                lo = mid + 1
+            else:
+                hi = mid
+        return range(lo, end)
+
+    def day_ids(self, labels) -> frozenset:
+        """trip_day values of the given weekday_type labels."""
+        return frozenset(self.days[label] for label in labels if label in self.days)
+
+
+_artifact: Optional[TimetableArtifact] = None
+_rejected: Optional[tuple] = None  # (st_ino, st_mtime_ns) of a file that failed to map
+
+
+def get_timetable() -> Optional[TimetableArtifact]:
+    """
+    Process-wide mapped timetable (None if no artifact has been built yet).
+
+    Re-maps transparently when the refresh pipeline replaces the file. A file
+    in an old format is rejected once and the last good artifact kept.
+    """
+    global _artifact, _rejected
+    if _artifact is not None and _artifact.is_current():
+        return _artifact
+    try:
+        st = os.stat(ARTIFACT_PATH)
+    except FileNotFoundError:
+        return _artifact
+    if (st.st_ino, st.st_mtime_ns) == _rejected:
+        return _artifact
+    try:
+        artifact = TimetableArtifact(ARTIFACT_PATH)
+    except ValueError:
+        _rejected = (st.st_ino, st.st_mtime_ns)
+        print(f"Timetable artifact {ARTIFACT_PATH} has an old format; "
+              f"rebuild it with scripts/build_timetable_artifact.py")
+        return _artifact
+    _artifact = artifact
+    print(f"Mapped timetable artifact {_artifact.version} "
+          f"({_artifact.trip_count} trips, {_artifact.stop_count} stops)")
+    return _artifact
+    if not os.path.exists(ARTIFACT_PATH):
+        return _artifact
+    try:
+        _artifact = TimetableArtifact(ARTIFACT_PATH)
+    except ValueError:
+        print(f"Timetable artifact {ARTIFACT_PATH} has an old format; "
+              f"rebuild it with scripts/build_timetable_artifact.py")
+        return None
+    print(f"Mapped timetable artifact {_artifact.version} "
+          f"({_artifact.trip_count} trips, {_artifact.stop_count} stops)")
+    return _artifact
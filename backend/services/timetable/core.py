@@ -2,19 +2,64 @@
 """
 Core timetable search logic.
 """
+import asyncio
+import bisect
+import threading
 from typing import Dict, List, Optional
 from sqlalchemy.orm import Session
-from .finder import find_train_for_segment, get_arrival_time
+from db.database import SessionLocal
+from services.executors import run_io
+from .artifact import get_timetable, service_minutes
+from .finder import find_fastest_train_for_segment, find_train_for_segment, get_arrival_time
 from .utils import time_to_minutes, minutes_to_time
 
 
+class ArrivalBound:
+    """
+    The k-th best arrival (service-day minutes) mapped so far.
+
+    Shared by candidates mapped concurrently: a candidate is abandoned as
+    soon as its optimistic arrival can no longer beat it.
+    """
+
+    def __init__(self, k: int):
+        self.k = k
+        self._arrivals: List[int] = []
+        self._lock = threading.Lock()
+
+    @property
+    def cutoff(self) -> float:
+        with self._lock:
+            return self._arrivals[self.k - 1] if len(self._arrivals) >= self.k else float("inf")
+
+    def add(self, arrival: int):
+        with self._lock:
+            bisect.insort(self._arrivals, arrival)
+            del self._arrivals[self.k:]
+
+    def excludes(self, earliest_arrival: float) -> bool:
+        """True if a candidate that cannot arrive before earliest_arrival can be dropped."""
+        return earliest_arrival >= self.cutoff
+
+
+def ride_minutes(route_result: Dict) -> float:
+    """
+    Theoretical riding time of a graph route, a lower bound on its travel time.
+
+    Summed from the ride segments: the route's total_time may include the
+    penalties find_routes puts on edges shared with earlier alternatives.
+    """
+    return sum(float(s.get("theoretical_time") or 0) for s in route_result.get("segments", []) if s.get("type") == "ride")
+
+
 def search_route_with_times(
     db: Session,
     route_result: Dict,
     departure_time: str,
     weekday: str = "Weekday",
     transfer_buffer: int = 5,
-    station_name_map: Dict[str, str] = None
+    station_name_map: Dict[str, str] = None,
+    bound: Optional[ArrivalBound] = None
 ) -> Dict:
     """
     Take a route from /search and add actual train times from timetable.
@@ -23,9 +68,11 @@ def search_route_with_times(
         db: Database session
         route_result: Result from route_graph.find_route()
         departure_time: Desired departure time (HH:MM)
-        weekday: Weekday/Saturday/Holiday
+        weekday: Day type (Weekday/Saturday/Holiday), see service_calendar
         transfer_buffer: Minutes needed for transfer
         station_name_map: Mapping from Japanese to English station names
+        bound: Stop mapping (result has "pruned": True) once the current time plus
+               the remaining theoretical time cannot beat bound.cutoff
     
     Returns:
         Route with actual train times for each segment
@@ -43,10 +90,16 @@ def search_route_with_times(
     
     timed_segments = []
     current_time = departure_time
+    timetable = get_timetable()
+    remaining = [float(s.get("theoretical_time") or 0) for s in segments]
     
-    for segment in segments:
+    for i, segment in enumerate(segments):
         if segment.get("type") != "ride":
             continue
+
+        # Branch and bound: optimistic arrival of the rest of the route
+        if bound is not None and bound.excludes(service_minutes(current_time) + sum(remaining[i:])):
+            return {"error": "Pruned: cannot beat the routes found so far", "pruned": True}
             
         from_station_ja = segment.get("from", "")
         to_station_ja = segment.get("to", "")
@@ -56,13 +109,20 @@ def search_route_with_times(
         from_station_en = station_name_map.get(from_station_ja, from_station_ja)
         to_station_en = station_name_map.get(to_station_ja, to_station_ja)
         
-        # Find actual train (with direction filtering)
-        train = find_train_for_segment(db, from_station_en, to_station_en, railway, current_time, weekday)
+        # Find the earliest-arriving train from the artifact's trip index,
+        # else the first departure via SQL (with direction filtering)
+        train = None
+        if timetable is not None:
+            train = find_fastest_train_for_segment(
+                timetable, from_station_en, to_station_en, railway, current_time, weekday
+            )
+        if train is None:
+            train = find_train_for_segment(db, from_station_en, to_station_en, railway, current_time, weekday)
         
         if train:
             # Calculate actual arrival time at destination station
             # Use English railway name from train dict (it's normalized in find_train_for_segment)
-            arrival_time = get_arrival_time(
+            arrival_time = train.get("arrival_time") or get_arrival_time(
                 db, 
                 train["train_number"], 
                 train["railway"], 
@@ -142,6 +202,10 @@ def search_route_with_times(
             
             actual_total_time = round(float(end_m - start_m), 2)
             
+    # Only a fully mapped route arrives at the destination; a partial one would tighten the bound too much
+    if bound is not None and timed_segments and all(s.get("departure_time") for s in timed_segments):
+        bound.add(service_minutes(timed_segments[-1]["arrival_time"]))
+
     return {
         "from": route_result.get("from"),
         "to": route_result.get("to"),
@@ -150,3 +214,45 @@ def search_route_with_times(
         "requested_departure": departure_time,
         "segments": timed_segments
     }
+
+
+async def search_routes_with_times(
+    route_results: List[Dict],
+    departure_time: str,
+    weekday: str = "Weekday",
+    transfer_buffer: int = 5,
+    station_name_map: Dict[str, str] = None,
+    limit: Optional[int] = None
+) -> List[Dict]:
+    """
+    Map several candidate routes concurrently on the shared I/O pool.
+
+    Awaitable: the request coroutine is suspended while the mapping runs.
+
+    Each candidate runs on its own session (sessions are not thread-safe),
+    so wall-clock time approaches that of the slowest candidate.
+
+    With a limit, candidates are started in order of their lower bound
+    (departure + ride_minutes) and share an ArrivalBound, so a candidate
+    that can no longer make the best `limit` is abandoned mid-mapping and
+    later ones are usually pruned before their first query.
+
+    Returns:
+        Results in bound order (pruned candidates carry "pruned": True).
+    """
+    bound = ArrivalBound(limit) if limit else None
+    if bound is not None:
+        route_results = sorted(route_results, key=ride_minutes)
+
+    def run(route_result: Dict) -> Dict:
+        if bound is not None and bound.excludes(service_minutes(departure_time) + ride_minutes(route_result)):
+            return {"error": "Pruned: cannot beat the routes found so far", "pruned": True}
+        db = SessionLocal()
+        try:
+            return search_route_with_times(
+                db, route_result, departure_time, weekday, transfer_buffer, station_name_map, bound
+            )
+        finally:
+            db.close()
+
+    return list(await asyncio.gather(*(run_io(run, route_result) for route_result in route_results)))
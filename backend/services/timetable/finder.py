@@ -6,7 +6,14 @@ from typing import List, Dict, Optional
 from sqlalchemy.orm import Session
 from sqlalchemy import or_
 from db.models import StationDeparture, StationOrder
+from .artifact import TimetableArtifact, service_minutes
 from .direction import get_expected_direction, get_heuristic_direction
+from .service_calendar import day_type_labels
+from .utils import minutes_to_time, time_to_minutes
+
+# Look-ahead when choosing the earliest-arriving train for a segment
+LOOKAHEAD_DEPARTURES = 20
+LOOKAHEAD_MINUTES = 60
 
 
 def get_arrival_time(
@@ -23,7 +30,7 @@ def get_arrival_time(
         StationDeparture.train_number == train_number,
         StationDeparture.railway_name == railway_name,
         StationDeparture.station_name.ilike(station_name),
-        StationDeparture.weekday_type == weekday
+        StationDeparture.weekday_type.in_(day_type_labels(weekday))
     ).first()
     
     if record:
@@ -34,7 +41,7 @@ def get_arrival_time(
     record = db.query(StationDeparture).filter(
         StationDeparture.train_number == train_number,
         StationDeparture.station_name.ilike(station_name),
-        StationDeparture.weekday_type == weekday
+        StationDeparture.weekday_type.in_(day_type_labels(weekday))
     ).first()
     
     if record:
@@ -68,16 +75,17 @@ def find_train_for_segment(
         
     departures = []
     found_station_name = from_station
+    after_minutes = time_to_minutes(after_time)
     
     for station_name in search_stations:
         # First try detailed direction if available (but for ChuoSobuLocal we might skip)
         query = db.query(StationDeparture).filter(
             StationDeparture.station_name.ilike(station_name),
             StationDeparture.railway_name == railway_en,
-            StationDeparture.departure_time >= after_time,
-            StationDeparture.weekday_type == weekday
+            StationDeparture.departure_minutes >= after_minutes,
+            StationDeparture.weekday_type.in_(day_type_labels(weekday))
         )
-        results = query.order_by(StationDeparture.departure_time).limit(30).all()
+        results = query.order_by(StationDeparture.departure_minutes).limit(30).all()
         if results:
             departures = results
             found_station_name = station_name
@@ -173,3 +181,67 @@ def find_train_for_segment(
         }
     
     return None
+
+
+def find_fastest_train_for_segment(
+    tt: TimetableArtifact,
+    from_station: str,
+    to_station: str,
+    railway: str,
+    after_time: str,
+    weekday: str = "Weekday",
+    lookahead_departures: int = LOOKAHEAD_DEPARTURES,
+    lookahead_minutes: int = LOOKAHEAD_MINUTES,
+) -> Optional[Dict]:
+    """
+    Train on a railway arriving earliest at to_station, leaving from_station after a time.
+
+    Scans the next departures through the artifact's per-stop index (bounded by
+    count and time window, and stopping once a departure is later than the best
+    arrival), so a rapid leaving a minute after a local still wins. Direction
+    needs no heuristics: to_station must come after from_station in the trip.
+
+    Returns:
+        Same fields as find_train_for_segment plus "arrival_time", or None.
+    """
+    from services.constants import RAILWAY_JA_TO_EN
+    railway_en = RAILWAY_JA_TO_EN.get(railway, railway)
+
+    to_stops = set(tt.find_stops(to_station))
+    if not to_stops:
+        return None
+    day_ids = tt.day_ids(day_type_labels(weekday))
+    after = service_minutes(after_time)
+    st_time, st_stop, dep_st = tt.st_time, tt.st_stop, tt.stop_dep_st
+
+    best = None
+    for stop in tt.find_stops(from_station):
+        scanned = 0
+        for i in tt.departures_at(stop, after):
+            st = dep_st[i]
+            departure = st_time[st]
+            if departure > after + lookahead_minutes or scanned >= lookahead_departures:
+                break
+            if best is not None and departure >= best[0]:
+                break
+            trip = tt.trip_of(st)
+            if tt.trip_day[trip] not in day_ids or tt.railway_name(tt.trip_route[trip]) != railway_en:
+                continue
+            scanned += 1
+            end = tt.trip_offsets[trip + 1]
+            arrival_st = next((j for j in range(st + 1, end) if st_stop[j] in to_stops), None)
+            if arrival_st is not None and (best is None or st_time[arrival_st] < best[0]):
+                best = (st_time[arrival_st], departure, trip)
+
+    if best is None:
+        return None
+    arrival, departure, trip = best
+    return {
+        "departure_time": minutes_to_time(departure),
+        "arrival_time": minutes_to_time(arrival),
+        "railway": railway_en,
+        "train_type": tt.string(tt.trip_train_type[trip]),
+        "destination": tt.string(tt.trip_destination[trip]),
+        "train_number": tt.string(tt.trip_train_number[trip]),
+        "direction": tt.string(tt.trip_direction[trip]),
+    }
@@ -0,0 +1,247 @@
+"""
+Multi-criteria RAPTOR (McRAPTOR) for trade-off route options.
+
+Instead of one label per stop, every stop keeps a bag of Pareto-optimal
+labels over (arrival, risk, fare); rounds add the number of transfers as
+the fourth criterion. Risk is the sum of the historical delay rates of the
+lines boarded (per hour of boarding) and fare the sum of base fares of the
+operators entered, both read from precomputed per-line scores, so every
+criterion shapes the search instead of being attached afterwards.
+
+Labels are tuples (time, risk, fare, operator, back) where back is
+(trip, board_pos, alight_pos, through_service, previous label), or None at
+the origin.
+
+A base fare is charged whenever the operator changes, since a new ticket is
+needed; leaving an operator and entering it again later (JR -> Metro -> JR)
+pays its base fare again. Because the next fare depends on the current
+operator, labels at a stop only dominate labels of the same operator.
+"""
+from typing import Dict, Iterable, List, Optional, Tuple
+from services.line_scores import LineScores, get_line_scores
+from .artifact import TimetableArtifact, service_minutes
+from .raptor import _display_name, _earliest_trip, graph_names, journey_result, resolve_stops
+from .service_calendar import day_type_labels
+
+MAX_ROUNDS = 6
+RISK_STEP = 0.01  # Risk is compared in steps of this size to keep bags small
+
+
+def _no_worse(a: tuple, b: tuple) -> bool:
+    """a is at least as good as b on (time, risk, fare)."""
+    return a[0] <= b[0] and a[1] <= b[1] and a[2] <= b[2]
+
+
+def _dominates(a: tuple, b: tuple) -> bool:
+    """Dominance at a stop: also requires the same operator, which decides the next fare."""
+    return a[3] == b[3] and _no_worse(a, b)
+
+
+def _merge(bag: List[tuple], label: tuple, dominates=_dominates) -> bool:
+    """Insert label unless dominated; drop labels it dominates. True if inserted."""
+    for other in bag:
+        if dominates(other, label):
+            return False
+    bag[:] = [other for other in bag if not dominates(label, other)]
+    bag.append(label)
+    return True
+
+
+def _route_info(tt: TimetableArtifact) -> List[Tuple[str, str]]:
+    """(operator, English railway name) per route."""
+    info = []
+    for r in range(len(tt.route_railway_id)):
+        railway_id = tt.string(tt.route_railway_id[r])
+        operator = railway_id.split(":", 1)[-1].split(".", 1)[0]
+        info.append((operator, tt.railway_name(r)))
+    return info
+
+
+def pareto_journeys(
+    tt: TimetableArtifact,
+    origins: Iterable[int],
+    targets: Iterable[int],
+    departure: int,
+    day_ids: frozenset,
+    transfer_buffer: int = 5,
+    scores: Optional[LineScores] = None,
+    max_rounds: int = MAX_ROUNDS,
+) -> List[Tuple[List[Tuple[int, int, int, bool]], Dict]]:
+    """
+    Pareto set over (arrival, transfers, risk, fare).
+
+    Returns:
+        (legs, criteria) pairs ordered by arrival; legs as in raptor.earliest_arrival.
+    """
+    scores = scores or get_line_scores()
+    trip_offsets, st_stop, st_time, trip_route = tt.trip_offsets, tt.st_stop, tt.st_time, tt.trip_route
+    pat_stop_offsets, pat_stops, pat_day = tt.pat_stop_offsets, tt.pat_stops, tt.pat_day
+    stop_pat_offsets, stop_pat, stop_pat_pos = tt.stop_pat_offsets, tt.stop_pat, tt.stop_pat_pos
+    trip_next = tt.trip_next
+    routes = _route_info(tt)
+
+    target_set = set(targets)
+    origins = set(origins)
+    if not origins or not target_set:
+        return []
+
+    def boarding(label: tuple, trip: int, pos: int) -> Tuple[float, int, str]:
+        """Risk, fare and operator after boarding trip at pos from label."""
+        operator, railway = routes[trip_route[trip]]
+        risk = label[1] + scores.risk(railway, st_time[trip_offsets[trip] + pos])
+        fare = label[2] + (scores.fare(operator) if operator != label[3] else 0)
+        return round(risk / RISK_STEP) * RISK_STEP, fare, operator
+
+    origin_label = (departure, 0.0, 0, None, None)
+    ready: Dict[int, List[tuple]] = {s: [origin_label] for s in origins}
+    best_ready: Dict[int, List[tuple]] = {s: [origin_label] for s in origins}
+    best_arrival: Dict[int, List[tuple]] = {}
+    target_bag: List[tuple] = []
+    found: List[Tuple[int, tuple]] = []
+
+    for k in range(1, max_rounds + 1):
+        queue: Dict[int, int] = {}
+        for s in ready:
+            for i in range(stop_pat_offsets[s], stop_pat_offsets[s + 1]):
+                p = stop_pat[i]
+                if pat_day[p] in day_ids:
+                    pos = stop_pat_pos[i]
+                    if queue.get(p, 1 << 30) > pos:
+                        queue[p] = pos
+
+        arrived: Dict[int, List[tuple]] = {}
+        through: List[Tuple[int, tuple]] = []
+
+        def alight(s: int, label: tuple):
+            # Criteria only grow, so a journey already found bounds every operator
+            if any(_no_worse(other, label) for other in target_bag):
+                return
+            if _merge(best_arrival.setdefault(s, []), label):
+                arrived.setdefault(s, []).append(label)
+                if s in target_set and _merge(target_bag, label, _no_worse):
+                    found.append((k, label))
+
+        for p, start in queue.items():
+            first, end = pat_stop_offsets[p], pat_stop_offsets[p + 1]
+            # Route bag entries: (trip, board_pos, risk, fare, operator, previous label);
+            # all trips of a pattern share its route, hence its operator
+            route_bag: List[tuple] = []
+            for pos in range(start, end - first):
+                s = pat_stops[first + pos]
+                for trip, board_pos, risk, fare, operator, prev in route_bag:
+                    alight(s, (st_time[trip_offsets[trip] + pos], risk, fare, operator,
+                               (trip, board_pos, pos, False, prev)))
+                for label in ready.get(s, ()):
+                    trip = _earliest_trip(tt, p, pos, label[0])
+                    if trip < 0:
+                        continue
+                    risk, fare, operator = boarding(label, trip, pos)
+                    entry = (trip, pos, risk, fare, operator, label)
+                    key = (st_time[trip_offsets[trip] + pos], risk, fare)
+                    if any(_no_worse((st_time[trip_offsets[e[0]] + pos], e[2], e[3]), key) for e in route_bag):
+                        continue
+                    route_bag = [
+                        e for e in route_bag
+                        if not _no_worse(key, (st_time[trip_offsets[e[0]] + pos], e[2], e[3]))
+                    ]
+                    route_bag.append(entry)
+            last = end - first - 1
+            for trip, board_pos, risk, fare, operator, prev in route_bag:
+                if trip_next[trip] >= 0 and board_pos < last:
+                    junction = (st_time[trip_offsets[trip] + last], risk, fare, operator,
+                                (trip, board_pos, last, False, prev))
+                    through.append((trip_next[trip], junction))
+
+        # Through service: continue onto the next line without a transfer
+        while through:
+            trip, junction = through.pop()
+            risk, fare, operator = boarding(junction, trip, 0)
+            base, end = trip_offsets[trip], trip_offsets[trip + 1]
+            for pos in range(1, end - base):
+                alight(st_stop[base + pos], (st_time[base + pos], risk, fare, operator,
+                                             (trip, 0, pos, True, junction)))
+            if trip_next[trip] >= 0:
+                through.append((trip_next[trip], (st_time[end - 1], risk, fare, operator,
+                                                  (trip, 0, end - base - 1, True, junction))))
+
+        ready = {}
+        for s, labels in arrived.items():
+            for label in labels:
+                moved = (label[0] + transfer_buffer,) + label[1:]
+                if any(_no_worse(other, moved) for other in target_bag):
+                    continue
+                for u in (s, *tt.transfers_from(s)):
+                    if _merge(best_ready.setdefault(u, []), moved):
+                        ready.setdefault(u, []).append(moved)
+        if not ready:
+            break
+
+    journeys = []
+    for k, label in found:
+        legs = []
+        node = label
+        while node[4] is not None:
+            trip, board_pos, alight_pos, through_service, node = node[4]
+            legs.append((trip, board_pos, alight_pos, through_service))
+        legs.reverse()
+        transfers = max(0, sum(1 for leg in legs if not leg[3]) - 1)
+        criteria = {"arrival": label[0], "transfers": transfers, "risk": round(label[1], 2), "fare": label[2]}
+        journeys.append((legs, criteria))
+
+    # Keep the Pareto set over all four criteria
+    def dominated(c: Dict) -> bool:
+        return any(
+            o is not c and all(o[key] <= c[key] for key in c) and any(o[key] < c[key] for key in c)
+            for _, o in journeys
+        )
+    journeys = [(legs, c) for legs, c in journeys if not dominated(c)]
+    journeys.sort(key=lambda j: (j[1]["arrival"], j[1]["transfers"], j[1]["risk"], j[1]["fare"]))
+    return journeys
+
+
+def pick_tradeoffs(journeys: List[Tuple[list, Dict]], limit: int = 3) -> List[Tuple[list, Dict]]:
+    """Fastest, fewest transfers, lowest risk and cheapest first, then the rest by arrival."""
+    picked = []
+    for key in ("arrival", "transfers", "risk", "fare"):
+        best = min(journeys, key=lambda j: (j[1][key], j[1]["arrival"]), default=None)
+        if best is not None and best not in picked:
+            picked.append(best)
+    picked += [j for j in journeys if j not in picked]
+    picked = picked[:limit]
+    picked.sort(key=lambda j: j[1]["arrival"])
+    return picked
+
+
+def multi_with_timetable(
+    tt: TimetableArtifact,
+    graph,
+    from_station: str,
+    to_station: str,
+    departure_time: str,
+    weekday: str = "Weekday",
+    transfer_buffer: int = 5,
+    limit: int = 3,
+) -> Optional[List[Dict]]:
+    """
+    Trade-off journeys in the search_with_times format, each with a "criteria" entry.
+
+    Returns None when either station has no timetable stops.
+    """
+    origins = resolve_stops(tt, graph, from_station)
+    targets = resolve_stops(tt, graph, to_station)
+    if not origins or not targets:
+        return None
+
+    journeys = pareto_journeys(
+        tt, origins, targets, service_minutes(departure_time),
+        tt.day_ids(day_type_labels(weekday)), transfer_buffer,
+    )
+    station_names, railway_names = graph_names(graph)
+    from_name, to_name = _display_name(graph, from_station), _display_name(graph, to_station)
+
+    results = []
+    for legs, criteria in pick_tradeoffs(journeys, limit):
+        result = journey_result(tt, legs, from_name, to_name, departure_time, station_names, railway_names)
+        result["criteria"] = {"risk": criteria["risk"], "fare": criteria["fare"]}
+        results.append(result)
+    return results
@@ -0,0 +1,149 @@
+"""
+Route patterns for timetable routing.
+
+Built together with the timetable artifact (see artifact.build_artifact) so
+workers map them instead of recomputing them:
+
+    pat_stop_offsets, pat_stops     stop sequence of pattern p
+    pat_trip_offsets, pat_trips     trips of pattern p, ordered by departure
+    pat_day                         weekday_type (string id) of all trips of p
+    stop_pat_offsets, stop_pat,     patterns serving stop s and the stop's
+    stop_pat_pos                    position in each of them
+    stop_xfer_offsets, stop_xfer    other stops of the same station (transfers)
+    trip_next                       through-service continuation of a trip, or -1
+
+A pattern groups trips of one day type that call at exactly the same stops.
+Trips that would overtake each other are split into separate patterns, so
+within a pattern the trip order is the same at every stop and the earliest
+trip from a stop can be found by binary search.
+"""
+from array import array
+from typing import Dict, List, Sequence
+
+THROUGH_MAX_WAIT = 10  # Minutes a through train may stand at the junction station
+
+
+def station_key(name: str) -> str:
+    """Normalize a station name for matching across lines (Shin-Okubo == ShinOkubo)."""
+    return name.lower().replace("-", "").replace(" ", "")
+
+
+def _csr(lists: List[List[int]]):
+    offsets = array("i", [0])
+    values = array("i")
+    for items in lists:
+        values.extend(items)
+        offsets.append(len(values))
+    return offsets, values
+
+
+def build_patterns(
+    trip_offsets: Sequence[int],
+    st_stop: Sequence[int],
+    st_time: Sequence[int],
+    trip_day: Sequence[int],
+    trip_route: Sequence[int],
+    trip_train_number: Sequence[int],
+    stop_names: List[str],
+    empty_string: int,
+) -> Dict[str, array]:
+    """
+    Compute the pattern sections for an artifact.
+
+    Args:
+        stop_names: English station name of every stop (used for transfers and through service)
+        empty_string: string id of "" (trips without a train number never continue)
+    """
+    n_trips = len(trip_offsets) - 1
+    n_stops = len(stop_names)
+
+    # Group trips by (day, stop sequence)
+    groups: Dict[tuple, List[int]] = {}
+    for t in range(n_trips):
+        a, b = trip_offsets[t], trip_offsets[t + 1]
+        if b - a < 2:
+            continue
+        groups.setdefault((trip_day[t], tuple(st_stop[a:b])), []).append(t)
+
+    pat_stops: List[List[int]] = []
+    pat_trips: List[List[int]] = []
+    pat_day = array("i")
+    for (day, stops), trips in groups.items():
+        trips.sort(key=lambda t: tuple(st_time[trip_offsets[t]:trip_offsets[t + 1]]))
+        # Split into FIFO lanes: a trip joins the first lane it does not overtake
+        lanes: List[List[int]] = []
+        lane_last: List[Sequence[int]] = []
+        for t in trips:
+            times = st_time[trip_offsets[t]:trip_offsets[t + 1]]
+            for i, last in enumerate(lane_last):
+                if all(x <= y for x, y in zip(last, times)):
+                    lanes[i].append(t)
+                    lane_last[i] = times
+                    break
+            else:
+                lanes.append([t])
+                lane_last.append(times)
+        for lane in lanes:
+            pat_stops.append(list(stops))
+            pat_trips.append(lane)
+            pat_day.append(day)
+
+    stop_pats: List[List[int]] = [[] for _ in range(n_stops)]
+    stop_pos: List[List[int]] = [[] for _ in range(n_stops)]
+    for p, stops in enumerate(pat_stops):
+        for pos, s in enumerate(stops):
+            stop_pats[s].append(p)
+            stop_pos[s].append(pos)
+
+    # Transfers: stops sharing a station name on other lines
+    by_name: Dict[str, List[int]] = {}
+    for s, name in enumerate(stop_names):
+        if name:
+            by_name.setdefault(station_key(name), []).append(s)
+    stop_xfers = [
+        [u for u in by_name.get(station_key(name), []) if u != s] if name else []
+        for s, name in enumerate(stop_names)
+    ]
+
+    # Through service: the same train number continues from the last stop of
+    # one trip as the first stop of a trip on another line
+    starts: Dict[tuple, List[int]] = {}
+    for t in range(n_trips):
+        a, b = trip_offsets[t], trip_offsets[t + 1]
+        if b > a and trip_train_number[t] != empty_string:
+            key = (trip_train_number[t], trip_day[t], station_key(stop_names[st_stop[a]]))
+            starts.setdefault(key, []).append(t)
+    trip_next = array("i", [-1]) * n_trips
+    for t in range(n_trips):
+        a, b = trip_offsets[t], trip_offsets[t + 1]
+        if b <= a or trip_train_number[t] == empty_string:
+            continue
+        end = st_time[b - 1]
+        key = (trip_train_number[t], trip_day[t], station_key(stop_names[st_stop[b - 1]]))
+        best, best_start = -1, None
+        for u in starts.get(key, ()):
+            start = st_time[trip_offsets[u]]
+            if trip_route[u] != trip_route[t] and 0 <= start - end <= THROUGH_MAX_WAIT:
+                if best_start is None or start < best_start:
+                    best, best_start = u, start
+        trip_next[t] = best
+
+    pat_stop_offsets, pat_stops_flat = _csr(pat_stops)
+    pat_trip_offsets, pat_trips_flat = _csr(pat_trips)
+    stop_pat_offsets, stop_pat = _csr(stop_pats)
+    _, stop_pat_pos = _csr(stop_pos)
+    stop_xfer_offsets, stop_xfer = _csr(stop_xfers)
+
+    return {
+        "pat_stop_offsets": pat_stop_offsets,
+        "pat_stops": pat_stops_flat,
+        "pat_trip_offsets": pat_trip_offsets,
+        "pat_trips": pat_trips_flat,
+        "pat_day": pat_day,
+        "stop_pat_offsets": stop_pat_offsets,
+        "stop_pat": stop_pat,
+        "stop_pat_pos": stop_pat_pos,
+        "stop_xfer_offsets": stop_xfer_offsets,
+        "stop_xfer": stop_xfer,
+        "trip_next": trip_next,
+    }
@@ -0,0 +1,244 @@
+"""
+Precomputed journeys between the busiest stations.
+
+An offline job (scripts/build_popular_routes.py) takes the top-N stations
+of data/station_stats.json and, for every ordered pair, every day type and
+every fixed departure bucket of the service day (default every 15 minutes),
+stores the earliest-arriving journey. One one-to-all RAPTOR pass per
+(origin, day type, bucket) covers all destinations; origins run in
+parallel, one process per core.
+
+The table is a mapped array file (mmap_store), so a freshly started worker
+answers these pairs without searching. A stored journey answers any query
+time q in its bucket [b, b + step) as long as it leaves at or after q:
+earliest arrival is monotone in the departure time, so a journey that is
+optimal from b and still catchable at q is optimal from q as well. Other
+queries fall back to the regular search.
+
+Layout (sections):
+    entry_offsets                    legs of entry e are leg_*[entry_offsets[e]:entry_offsets[e + 1]]
+    leg_trip, leg_board, leg_alight, leg_through
+    entry e = ((origin * N + destination) * day types + day) * buckets + bucket
+"""
+import os
+import time
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+from services.mmap_store import MappedFile, write_sections
+from .artifact import DATA_DIR, MINUTES_PER_DAY, SERVICE_DAY_START, TimetableArtifact, get_timetable, service_minutes
+from .raptor import _display_name, graph_names, journey_result, one_to_all
+from .service_calendar import DAY_TYPES, day_type_labels
+
+POPULAR_ROUTES_PATH = os.path.join(DATA_DIR, "popular_routes.bin")
+MAGIC = b"POPRT001"
+BUCKET_MINUTES = 15
+
+
+def _origin_table(args: Tuple[int, List[List[int]], int, int]) -> Tuple[int, List[list]]:
+    """
+    Best legs from one origin to every listed station (runs in a worker process).
+
+    Returns:
+        (origin index, [day][bucket][destination] -> legs or None)
+    """
+    origin, stations, transfer_buffer, bucket_minutes = args
+    tt = get_timetable()
+    stop_station: Dict[int, List[int]] = {}
+    for d, stops in enumerate(stations):
+        for s in stops:
+            stop_station.setdefault(s, []).append(d)
+
+    table = []
+    for day_type in DAY_TYPES:
+        day_ids = tt.day_ids(day_type_labels(day_type))
+        per_bucket = []
+        for departure in range(SERVICE_DAY_START, SERVICE_DAY_START + MINUTES_PER_DAY, bucket_minutes):
+            best: List[Optional[tuple]] = [None] * len(stations)
+            for stop, legs in one_to_all(tt, stations[origin], departure, day_ids, transfer_buffer):
+                if not legs or stop not in stop_station:
+                    continue
+                arrival = tt.st_time[tt.trip_offsets[legs[-1][0]] + legs[-1][2]]
+                for d in stop_station[stop]:
+                    if d != origin and (best[d] is None or arrival < best[d][0]):
+                        best[d] = (arrival, legs)
+            per_bucket.append([b[1] if b else None for b in best])
+        table.append(per_bucket)
+    return origin, table
+
+
+def build_popular_routes(
+    stations: Dict[str, List[int]],
+    path: str = POPULAR_ROUTES_PATH,
+    transfer_buffer: int = 5,
+    bucket_minutes: int = BUCKET_MINUTES,
+    processes: Optional[int] = None,
+) -> int:
+    """
+    Precompute journeys between every pair of the given stations and write the table.
+
+    Args:
+        stations: station name (as queried) -> timetable stops of the station
+    Returns:
+        Number of stored journeys.
+    """
+    tt = get_timetable()
+    if tt is None:
+        raise RuntimeError("Timetable artifact is not available")
+
+    names = list(stations)
+    stops = [stations[name] for name in names]
+    n, buckets = len(names), len(range(0, MINUTES_PER_DAY, bucket_minutes))
+
+    tables: List[Optional[list]] = [None] * n
+    jobs = [(o, stops, transfer_buffer, bucket_minutes) for o in range(n)]
+    with ProcessPoolExecutor(max_workers=processes) as pool:
+        for origin, table in pool.map(_origin_table, jobs):
+            tables[origin] = table
+            print(f"  {names[origin]}: done")
+
+    entry_offsets = array("i", [0])
+    leg_trip, leg_board, leg_alight, leg_through = array("i"), array("h"), array("h"), array("b")
+    stored = 0
+    for o in range(n):
+        for d in range(n):
+            for day in range(len(DAY_TYPES)):
+                for b in range(buckets):
+                    legs = tables[o][day][b][d]
+                    if legs:
+                        stored += 1
+                        for trip, board_pos, alight_pos, through in legs:
+                            leg_trip.append(trip)
+                            leg_board.append(board_pos)
+                            leg_alight.append(alight_pos)
+                            leg_through.append(1 if through else 0)
+                    entry_offsets.append(len(leg_trip))
+
+    meta = {
+        "version": tt.version,
+        "built_at": time.time(),
+        "stations": names,
+        "day_types": list(DAY_TYPES),
+        "bucket_start": SERVICE_DAY_START,
+        "bucket_minutes": bucket_minutes,
+        "bucket_count": buckets,
+        "transfer_buffer": transfer_buffer,
+    }
+    write_sections(path, MAGIC, {
+        "entry_offsets": entry_offsets,
+        "leg_trip": leg_trip,
+        "leg_board": leg_board,
+        "leg_alight": leg_alight,
+        "leg_through": leg_through,
+    }, meta)
+    print(f"Popular routes: {n} stations, {stored} journeys -> {path}")
+    return stored
+
+
+class PopularRoutes(MappedFile):
+    """Mapped table of precomputed journeys."""
+
+    MAGIC = MAGIC
+
+    def __init__(self, path: str):
+        super().__init__(path)
+        self.version = self.meta["version"]
+        self.stations: Dict[str, int] = {name: i for i, name in enumerate(self.meta["stations"])}
+        self.day_types: List[str] = self.meta["day_types"]
+        self.bucket_start = self.meta["bucket_start"]
+        self.bucket_minutes = self.meta["bucket_minutes"]
+        self.bucket_count = self.meta["bucket_count"]
+        self.transfer_buffer = self.meta["transfer_buffer"]
+
+    def legs(
+        self, from_station: str, to_station: str, departure: int, weekday: str
+    ) -> Optional[List[Tuple[int, int, int, bool]]]:
+        """Stored legs for the bucket of departure (service-day minutes), or None if not covered."""
+        o, d = self.stations.get(from_station), self.stations.get(to_station)
+        if o is None or d is None or o == d or weekday not in self.day_types:
+            return None
+        bucket = (departure - self.bucket_start) // self.bucket_minutes
+        if not 0 <= bucket < self.bucket_count:
+            return None
+        n = len(self.stations)
+        entry = ((o * n + d) * len(self.day_types) + self.day_types.index(weekday)) * self.bucket_count + bucket
+        start, end = self.entry_offsets[entry], self.entry_offsets[entry + 1]
+        if start == end:
+            return None
+        return [
+            (self.leg_trip[i], self.leg_board[i], self.leg_alight[i], bool(self.leg_through[i]))
+            for i in range(start, end)
+        ]
+
+
+_table: Optional[PopularRoutes] = None
+_rejected: Optional[tuple] = None  # (st_ino, st_mtime_ns) of a file that failed to map
+
+
+def get_popular_routes() -> Optional[PopularRoutes]:
+    """
+    Process-wide mapped table (None if the job has not run); re-mapped when the file is replaced.
+
+    A file in an unknown format is rejected once and the last good table kept.
+    """
+    global _table, _rejected
+    if _table is not None and _table.is_current():
+        return _table
+    try:
+        st = os.stat(POPULAR_ROUTES_PATH)
+    except FileNotFoundError:
+        return _table
+    if (st.st_ino, st.st_mtime_ns) == _rejected:
+        return _table
+    try:
+        table = PopularRoutes(POPULAR_ROUTES_PATH)
+    except ValueError:
+        _rejected = (st.st_ino, st.st_mtime_ns)
+        print(f"Popular routes table {POPULAR_ROUTES_PATH} has an unknown format; rebuild it")
+        return _table
+    _table = table
+    print(f"Mapped popular routes for {len(_table.stations)} stations (timetable {_table.version})")
+    return _table
+    if not os.path.exists(POPULAR_ROUTES_PATH):
+        return _table
+    try:
+        _table = PopularRoutes(POPULAR_ROUTES_PATH)
+    except ValueError:
+        print(f"Popular routes table {POPULAR_ROUTES_PATH} has an unknown format; rebuild it")
+        return None
+    print(f"Mapped popular routes for {len(_table.stations)} stations (timetable {_table.version})")
+    return _table
+
+
+def search_popular(
+    tt: TimetableArtifact,
+    graph,
+    from_station: str,
+    to_station: str,
+    departure_time: str,
+    weekday: str = "Weekday",
+    transfer_buffer: int = 5,
+) -> Optional[Dict]:
+    """
+    Answer a query from the precomputed table, in the search_with_timetable format.
+
+    Returns None when the pair or time is not covered, the table was built
+    for another timetable version, or the stored journey has already left.
+    """
+    table = get_popular_routes()
+    if table is None or table.version != tt.version or table.transfer_buffer != transfer_buffer:
+        return None
+    departure = service_minutes(departure_time)
+    legs = table.legs(from_station, to_station, departure, weekday)
+    if not legs:
+        return None
+    trip, board_pos = legs[0][0], legs[0][1]
+    if tt.st_time[tt.trip_offsets[trip] + board_pos] < departure:
+        return None
+
+    station_names, railway_names = graph_names(graph)
+    return journey_result(
+        tt, legs, _display_name(graph, from_station), _display_name(graph, to_station),
+        departure_time, station_names, railway_names,
+    )
@@ -0,0 +1,769 @@
+"""
+RAPTOR earliest-arrival search over the timetable artifact.
+
+Round k scans every route pattern served by a stop that improved in round
+k - 1, so after round k the labels hold the earliest arrival at each stop
+using at most k trains. Changing trains costs transfer_buffer minutes (also
+between platforms of the same station); through-service continuations (the
+same train number running on into the next line) are ridden without a
+transfer.
+
+The result uses the same format as core.search_route_with_times.
+
+profile() answers a whole departure window with rRAPTOR: departures are
+scanned from the latest to the earliest and each run keeps the labels of the
+later ones, so an earlier departure only yields a journey when it arrives
+strictly earlier (the Pareto set of departure/arrival pairs).
+
+latest_departure() is the same scan run backwards from the destination for
+arrive-by queries: labels hold the latest time a stop can be left while
+still arriving in time, and patterns are scanned from their last stop.
+
+Delay-aware searches (avoid_delays) shift every arrival of a trip by the
+live delay of its route (services/delay_overlay.py); departures stay as
+scheduled, so connections are never assumed to be caught thanks to a delay.
+"""
+from typing import Dict, Iterable, List, Optional, Tuple
+from services.constants import RAILWAY_EN_TO_JA
+from services.delay_overlay import get_delay_overlay
+from .artifact import MINUTES_PER_DAY, SERVICE_DAY_START, TimetableArtifact, service_minutes
+from .service_calendar import day_type_labels
+from .utils import minutes_to_time
+
+MAX_ROUNDS = 8
+INF = 1 << 30
+
+# A leg is (trip, board_pos, board_stop, through_from) where through_from is the
+# leg of the train it continues (through service) or None when boarded at a stop.
+Leg = Tuple[int, int, int, Optional[tuple]]
+
+
+class SearchBounds:
+    """Best labels carried across searches; later departures bound earlier ones (rRAPTOR)."""
+
+    def __init__(self):
+        self.best_ready: Dict[int, int] = {}
+        self.best_arrival: Dict[int, int] = {}
+        self.best_target = INF
+
+
+def resolve_stops(tt: TimetableArtifact, graph, query: str) -> List[int]:
+    """
+    Stops of a station query (name or station id), including every platform of the station.
+
+    Station ids come from the route graph, so Japanese names work for lines
+    whose timetable only carries English names.
+    """
+    if query in graph.station_info:
+        station_ids = [query]
+    else:
+        station_ids = graph.find_station_by_name(query)
+
+    stops = set()
+    names = {query}
+    for station_id in station_ids:
+        stop = tt.stop_for_station(station_id)
+        if stop is not None:
+            stops.add(stop)
+        info = graph.station_info.get(station_id) or {}
+        if info.get("name_en"):
+            names.add(info["name_en"])
+    for name in names:
+        stops.update(tt.find_stops(name))
+    for stop in list(stops):
+        stops.update(tt.transfers_from(stop))
+    return sorted(stops)
+
+
+def _earliest_trip(tt: TimetableArtifact, pattern: int, pos: int, ready: int) -> int:
+    """First trip of a pattern leaving the pattern's pos-th stop at or after ready (-1 if none)."""
+    trips, trip_offsets, st_time = tt.pat_trips, tt.trip_offsets, tt.st_time
+    lo, hi = tt.pat_trip_offsets[pattern], tt.pat_trip_offsets[pattern + 1]
+    while lo < hi:
+        mid = (lo + hi) // 2
+        if st_time[trip_offsets[trips[mid]] + pos] < ready:
+            lo = mid + 1
+        else:
+            hi = mid
+    return trips[lo] if lo < tt.pat_trip_offsets[pattern + 1] else -1
+
+
+def earliest_arrival(
+    tt: TimetableArtifact,
+    origins: Iterable[int],
+    targets: Iterable[int],
+    departure: int,
+    day_ids: frozenset,
+    transfer_buffer: int = 5,
+    max_rounds: int = MAX_ROUNDS,
+    bounds: Optional[SearchBounds] = None,
+    late: Optional[Dict[int, int]] = None,
+) -> Optional[List[Tuple[int, int, int, bool]]]:
+    """
+    Earliest arrival at any target stop when leaving any origin stop at departure.
+
+    Args:
+        departure: Service-day minutes
+        day_ids: trip_day string ids running on the travel date (TimetableArtifact.day_ids)
+        bounds: Labels of previous searches; only journeys beating them are returned
+        late: route index -> live delay minutes added to the route's arrivals
+
+    Returns:
+        Legs (trip, board_pos, alight_pos, through_service) in travel order, or None.
+    """
+    target_set = set(targets)
+    origins = set(origins)
+    if not origins or not target_set:
+        return None
+    arrivals, ready, best_label = _rounds(
+        tt, origins, target_set, departure, day_ids, transfer_buffer, max_rounds, bounds, late
+    )
+    if best_label is None:
+        return None
+    return _unwind(tt, arrivals, ready, *best_label)
+
+
+def one_to_all(
+    tt: TimetableArtifact,
+    origins: Iterable[int],
+    departure: int,
+    day_ids: frozenset,
+    transfer_buffer: int = 5,
+    bounds: Optional[SearchBounds] = None,
+    max_rounds: int = MAX_ROUNDS,
+):
+    """
+    Yield (stop, legs) for every stop whose earliest arrival this search improved.
+
+    With shared bounds over departures scanned latest first this enumerates
+    the one-to-all profile (used to precompute transfer patterns).
+    """
+    arrivals, ready, _ = _rounds(
+        tt, set(origins), set(), departure, day_ids, transfer_buffer, max_rounds, bounds
+    )
+    final: Dict[int, int] = {}
+    for k in range(1, len(arrivals)):
+        for s in arrivals[k]:
+            final[s] = k
+    for s, k in final.items():
+        yield s, _unwind(tt, arrivals, ready, k, s)
+
+
+def _rounds(
+    tt: TimetableArtifact,
+    origins: set,
+    target_set: set,
+    departure: int,
+    day_ids: frozenset,
+    transfer_buffer: int,
+    max_rounds: int,
+    bounds: Optional[SearchBounds],
+    late: Optional[Dict[int, int]] = None,
+):
+    """RAPTOR rounds; returns (arrivals, ready, best target label as (round, stop) or None)."""
+    trip_offsets, st_stop, st_time = tt.trip_offsets, tt.st_stop, tt.st_time
+    trip_route = tt.trip_route
+    pat_stop_offsets, pat_stops, pat_day = tt.pat_stop_offsets, tt.pat_stops, tt.pat_day
+    stop_pat_offsets, stop_pat, stop_pat_pos = tt.stop_pat_offsets, tt.stop_pat, tt.stop_pat_pos
+    trip_next = tt.trip_next
+
+    # ready[k][stop] = (time the next train can be boarded, stop alighted at in round k)
+    # arrivals[k][stop] = (arrival time, leg, alight position)
+    bounds = bounds or SearchBounds()
+    best_ready, best_arrival = bounds.best_ready, bounds.best_arrival
+    best_target, best_label = bounds.best_target, None
+    marked = {s for s in origins if departure < best_ready.get(s, INF)}
+    ready: List[Dict[int, tuple]] = [{s: (departure, None) for s in marked}]
+    arrivals: List[Dict[int, tuple]] = [{}]
+    for s in marked:
+        best_ready[s] = departure
+
+    for k in range(1, max_rounds + 1):
+        # Patterns to scan, each from the earliest marked position
+        queue: Dict[int, int] = {}
+        for s in marked:
+            for i in range(stop_pat_offsets[s], stop_pat_offsets[s + 1]):
+                p = stop_pat[i]
+                if pat_day[p] in day_ids:
+                    pos = stop_pat_pos[i]
+                    if queue.get(p, INF) > pos:
+                        queue[p] = pos
+
+        prev_ready = ready[k - 1]
+        arrived: Dict[int, tuple] = {}
+        through: List[Tuple[int, Leg]] = []
+
+        def alight(s, time, leg, pos):
+            nonlocal best_target, best_label
+            if time < best_arrival.get(s, INF) and time < best_target:
+                best_arrival[s] = time
+                arrived[s] = (time, leg, pos)
+                if s in target_set:
+                    best_target, best_label = time, (k, s)
+
+        for p, start in queue.items():
+            first, end = pat_stop_offsets[p], pat_stop_offsets[p + 1]
+            trip, base, leg, delay = -1, 0, None, 0
+            for pos in range(start, end - first):
+                s = pat_stops[first + pos]
+                if trip >= 0:
+                    alight(s, st_time[base + pos] + delay, leg, pos)
+                label = prev_ready.get(s)
+                if label is not None and (trip < 0 or label[0] < st_time[base + pos]):
+                    t = _earliest_trip(tt, p, pos, label[0])
+                    if t >= 0 and (trip < 0 or st_time[trip_offsets[t] + pos] < st_time[base + pos]):
+                        trip, base, leg = t, trip_offsets[t], (t, pos, s, None)
+                        delay = late.get(trip_route[t], 0) if late else 0
+            if trip >= 0 and trip_next[trip] >= 0 and st_time[trip_offsets[trip + 1] - 1] < best_target:
+                through.append((trip_next[trip], leg))
+
+        # Through service: stay on the train onto the next line, still in round k
+        continued = set()
+        while through:
+            t, prev_leg = through.pop()
+            if t in continued:
+                continue
+            continued.add(t)
+            base, end = trip_offsets[t], trip_offsets[t + 1]
+            leg = (t, 0, st_stop[base], prev_leg)
+            delay = late.get(trip_route[t], 0) if late else 0
+            for pos in range(1, end - base):
+                alight(st_stop[base + pos], st_time[base + pos] + delay, leg, pos)
+            if trip_next[t] >= 0 and st_time[end - 1] < best_target:
+                through.append((trip_next[t], leg))
+
+        # Transfers (including staying on the platform) cost transfer_buffer
+        ready_k: Dict[int, tuple] = {}
+        marked = set()
+        for s, (time, _, _) in arrived.items():
+            t_ready = time + transfer_buffer
+            if t_ready >= best_target:
+                continue
+            for u in (s, *tt.transfers_from(s)):
+                if t_ready < best_ready.get(u, INF):
+                    best_ready[u] = t_ready
+                    ready_k[u] = (t_ready, s)
+                    marked.add(u)
+
+        ready.append(ready_k)
+        arrivals.append(arrived)
+        if not marked:
+            break
+
+    bounds.best_target = best_target
+    return arrivals, ready, best_label
+
+
+def _unwind(tt: TimetableArtifact, arrivals: list, ready: list, k: int, s: int) -> List[Tuple[int, int, int, bool]]:
+    """Walk the labels back from stop s reached in round k to the origin."""
+    trip_offsets = tt.trip_offsets
+    legs = []
+    while k > 0:
+        _, leg, pos = arrivals[k][s]
+        while leg is not None:
+            trip, board_pos, board_stop, through_from = leg
+            legs.append((trip, board_pos, pos, through_from is not None))
+            if through_from is not None:
+                pos = trip_offsets[through_from[0] + 1] - trip_offsets[through_from[0]] - 1
+            leg = through_from
+        _, s = ready[k - 1][board_stop]
+        k -= 1
+    legs.reverse()
+    return legs
+
+
+def _latest_trip(tt: TimetableArtifact, pattern: int, pos: int, deadline: int) -> int:
+    """Last trip of a pattern reaching the pattern's pos-th stop at or before deadline (-1 if none)."""
+    trips, trip_offsets, st_time = tt.pat_trips, tt.trip_offsets, tt.st_time
+    first = tt.pat_trip_offsets[pattern]
+    lo, hi = first, tt.pat_trip_offsets[pattern + 1]
+    while lo < hi:
+        mid = (lo + hi) // 2
+        if st_time[trip_offsets[trips[mid]] + pos] <= deadline:
+            lo = mid + 1
+        else:
+            hi = mid
+    return trips[lo - 1] if lo > first else -1
+
+
+def latest_departure(
+    tt: TimetableArtifact,
+    origins: Iterable[int],
+    targets: Iterable[int],
+    arrive_by: int,
+    day_ids: frozenset,
+    transfer_buffer: int = 5,
+    max_rounds: int = MAX_ROUNDS,
+) -> Optional[List[Tuple[int, int, int, bool]]]:
+    """
+    Latest departure from any origin stop that reaches a target stop by arrive_by.
+
+    Mirror image of earliest_arrival: round k scans patterns backwards from
+    stops improved in round k - 1 and through service is followed upstream.
+
+    Returns:
+        Legs (trip, board_pos, alight_pos, through_service) in travel order, or None.
+    """
+    trip_offsets, st_stop, st_time = tt.trip_offsets, tt.st_stop, tt.st_time
+    pat_stop_offsets, pat_stops, pat_day = tt.pat_stop_offsets, tt.pat_stops, tt.pat_day
+    stop_pat_offsets, stop_pat, stop_pat_pos = tt.stop_pat_offsets, tt.stop_pat, tt.stop_pat_pos
+    trip_prev = tt.trip_prev()
+
+    origin_set = set(origins)
+    targets = set(targets)
+    if not origin_set or not targets:
+        return None
+
+    # deadline[k][stop] = (latest time to be at the stop, stop boarded at in round k)
+    # departures[k][stop] = (departure time, leg, board position); a leg here is
+    # (trip, alight_pos, alight_stop, through_to) with through_to the leg it runs into
+    deadline: List[Dict[int, tuple]] = [{s: (arrive_by, None) for s in targets}]
+    departures: List[Dict[int, tuple]] = [{}]
+    best_deadline = {s: arrive_by for s in targets}
+    best_departure: Dict[int, int] = {}
+    best_origin, best_label = -INF, None
+    marked = targets
+
+    for k in range(1, max_rounds + 1):
+        # Patterns to scan, each from the latest marked position
+        queue: Dict[int, int] = {}
+        for s in marked:
+            for i in range(stop_pat_offsets[s], stop_pat_offsets[s + 1]):
+                p = stop_pat[i]
+                if pat_day[p] in day_ids:
+                    pos = stop_pat_pos[i]
+                    if queue.get(p, -1) < pos:
+                        queue[p] = pos
+
+        prev_deadline = deadline[k - 1]
+        boarded: Dict[int, tuple] = {}
+        through: List[Tuple[int, Leg]] = []
+
+        def board(s, time, leg, pos):
+            nonlocal best_origin, best_label
+            if time > best_departure.get(s, -INF) and time > best_origin:
+                best_departure[s] = time
+                boarded[s] = (time, leg, pos)
+                if s in origin_set:
+                    best_origin, best_label = time, (k, s)
+
+        for p, start in queue.items():
+            first = pat_stop_offsets[p]
+            trip, base, leg = -1, 0, None
+            for pos in range(start, -1, -1):
+                s = pat_stops[first + pos]
+                if trip >= 0:
+                    board(s, st_time[base + pos], leg, pos)
+                label = prev_deadline.get(s)
+                if label is not None and (trip < 0 or label[0] > st_time[base + pos]):
+                    t = _latest_trip(tt, p, pos, label[0])
+                    if t >= 0 and (trip < 0 or st_time[trip_offsets[t] + pos] > st_time[base + pos]):
+                        trip, base, leg = t, trip_offsets[t], (t, pos, s, None)
+            if trip >= 0 and trip_prev[trip] >= 0 and st_time[trip_offsets[trip]] > best_origin:
+                through.append((trip_prev[trip], leg))
+
+        # Through service: the train came from the previous line, still in round k
+        continued = set()
+        while through:
+            t, next_leg = through.pop()
+            if t in continued:
+                continue
+            continued.add(t)
+            base, end = trip_offsets[t], trip_offsets[t + 1]
+            last = end - base - 1
+            leg = (t, last, st_stop[end - 1], next_leg)
+            for pos in range(last - 1, -1, -1):
+                board(st_stop[base + pos], st_time[base + pos], leg, pos)
+            if trip_prev[t] >= 0 and st_time[base] > best_origin:
+                through.append((trip_prev[t], leg))
+
+        # Transfers (including staying on the platform) cost transfer_buffer
+        deadline_k: Dict[int, tuple] = {}
+        marked = set()
+        for s, (time, _, _) in boarded.items():
+            t_deadline = time - transfer_buffer
+            if t_deadline <= best_origin:
+                continue
+            for u in (s, *tt.transfers_from(s)):
+                if t_deadline > best_deadline.get(u, -INF):
+                    best_deadline[u] = t_deadline
+                    deadline_k[u] = (t_deadline, s)
+                    marked.add(u)
+
+        deadline.append(deadline_k)
+        departures.append(boarded)
+        if not marked:
+            break
+
+    if best_label is None:
+        return None
+
+    # Walk the labels forward from the origin
+    legs = []
+    k, s = best_label
+    while k > 0:
+        _, leg, pos = departures[k][s]
+        through = False
+        while leg is not None:
+            trip, alight_pos, alight_stop, through_to = leg
+            legs.append((trip, pos, alight_pos, through))
+            pos, through = 0, True
+            leg = through_to
+        _, s = deadline[k - 1][alight_stop]
+        k -= 1
+    return legs
+
+
+def departures_in_window(
+    tt: TimetableArtifact, origins: Iterable[int], start: int, end: int, day_ids: frozenset
+) -> List[int]:
+    """Distinct departure times from the origin stops within [start, end], latest first."""
+    trip_offsets, st_time, pat_trips = tt.trip_offsets, tt.st_time, tt.pat_trips
+    times = set()
+    for s in origins:
+        for i in range(tt.stop_pat_offsets[s], tt.stop_pat_offsets[s + 1]):
+            p = tt.stop_pat[i]
+            pos = tt.stop_pat_pos[i]
+            if tt.pat_day[p] not in day_ids or pos == tt.pat_stop_offsets[p + 1] - tt.pat_stop_offsets[p] - 1:
+                continue
+            for j in range(tt.pat_trip_offsets[p], tt.pat_trip_offsets[p + 1]):
+                time = st_time[trip_offsets[pat_trips[j]] + pos]
+                if start <= time <= end:
+                    times.add(time)
+    return sorted(times, reverse=True)
+
+
+def profile(
+    tt: TimetableArtifact,
+    origins: Iterable[int],
+    targets: Iterable[int],
+    start: int,
+    end: int,
+    day_ids: frozenset,
+    transfer_buffer: int = 5,
+) -> List[List[Tuple[int, int, int, bool]]]:
+    """
+    Every Pareto-optimal journey (later departure / earlier arrival) leaving in [start, end].
+
+    Returns:
+        Journeys as legs (see earliest_arrival), ordered by departure.
+    """
+    origins = list(origins)
+    bounds = SearchBounds()
+    journeys = []
+    for departure in departures_in_window(tt, origins, start, end, day_ids):
+        legs = earliest_arrival(tt, origins, targets, departure, day_ids, transfer_buffer, bounds=bounds)
+        if legs:
+            journeys.append(legs)
+    journeys.reverse()
+    return journeys
+
+
+def journey_result(
+    tt: TimetableArtifact,
+    legs: List[Tuple[int, int, int, bool]],
+    from_name: str,
+    to_name: str,
+    departure_time: str,
+    station_names: Optional[Dict[str, str]] = None,
+    railway_names: Optional[Dict[str, str]] = None,
+) -> Dict:
+    """
+    Format legs like core.search_route_with_times.
+
+    Args:
+        station_names: station id -> Japanese name (route graph), preferred over timetable names
+        railway_names: railway id -> Japanese name (route graph)
+    """
+    station_names = station_names or {}
+    railway_names = railway_names or {}
+
+    def stop_name(stop: int) -> str:
+        return station_names.get(tt.string(tt.stop_station_id[stop])) or tt.stop_label(stop)
+
+    segments = []
+    for trip, board_pos, alight_pos, through in legs:
+        base = tt.trip_offsets[trip]
+        route = tt.trip_route[trip]
+        railway_en = tt.railway_name(route)
+        segment = {
+            "from": stop_name(tt.st_stop[base + board_pos]),
+            "to": stop_name(tt.st_stop[base + alight_pos]),
+            "railway": (railway_names.get(tt.string(tt.route_railway_id[route]))
+                        or RAILWAY_EN_TO_JA.get(railway_en, railway_en)),
+            "departure_time": minutes_to_time(tt.st_time[base + board_pos]),
+            "arrival_time": minutes_to_time(tt.st_time[base + alight_pos]),
+            "train_type": tt.string(tt.trip_train_type[trip]),
+            "destination": tt.string(tt.trip_destination[trip]),
+            "train_number": tt.string(tt.trip_train_number[trip]),
+        }
+        if through:
+            segment["through_service"] = True
+        segments.append(segment)
+
+    first, last = legs[0], legs[-1]
+    start = tt.st_time[tt.trip_offsets[first[0]] + first[1]]
+    end = tt.st_time[tt.trip_offsets[last[0]] + last[2]]
+    return {
+        "from": from_name,
+        "to": to_name,
+        "theoretical_time": round(float(end - start), 2),
+        "transfers": max(0, sum(1 for leg in legs if not leg[3]) - 1),
+        "requested_departure": departure_time,
+        "segments": segments,
+    }
+
+
+_names_cache: Optional[Tuple[object, Optional[str], Tuple[Dict[str, str], Dict[str, str]]]] = None
+
+
+def graph_names(graph) -> Tuple[Dict[str, str], Dict[str, str]]:
+    """
+    Japanese station and railway names from the route graph, keyed by id.
+
+    Built once per graph and snapshot version; callers must not modify the dicts.
+    """
+    global _names_cache
+    cached = _names_cache
+    if cached is not None and cached[0] is graph and cached[1] == graph.snapshot_version:
+        return cached[2]
+    station_names = {sid: info["name_ja"] for sid, info in graph.station_info.items() if info.get("name_ja")}
+    railway_names = {rid: info["name_ja"] for rid, info in graph.railways.items() if info.get("name_ja")}
+    _names_cache = (graph, graph.snapshot_version, (station_names, railway_names))
+    return _names_cache[2]
+
+
+def search_with_timetable(
+    tt: TimetableArtifact,
+    graph,
+    from_station: str,
+    to_station: str,
+    departure_time: str,
+    weekday: str = "Weekday",
+    transfer_buffer: int = 5,
+    avoid_delays: bool = False,
+) -> Optional[Dict]:
+    """
+    Earliest-arrival journey from the timetable in one RAPTOR pass.
+
+    With avoid_delays, arrivals of delayed routes are shifted by their live
+    delay and the result gets expected_delay (minutes at the destination).
+
+    Returns None when either station has no timetable stops or nothing
+    reaches the destination, so callers can fall back to graph + mapping.
+    """
+    origins = resolve_stops(tt, graph, from_station)
+    targets = resolve_stops(tt, graph, to_station)
+    if not origins or not targets:
+        return None
+
+    late = live_route_delays(tt) if avoid_delays else None
+    legs = earliest_arrival(
+        tt, origins, targets, service_minutes(departure_time),
+        tt.day_ids(day_type_labels(weekday)), transfer_buffer, late=late,
+    )
+    if not legs:
+        return None
+
+    station_names, railway_names = graph_names(graph)
+    result = journey_result(
+        tt, legs, _display_name(graph, from_station), _display_name(graph, to_station),
+        departure_time, station_names, railway_names,
+    )
+    if avoid_delays:
+        result["expected_delay"] = (late or {}).get(tt.trip_route[legs[-1][0]], 0)
+    return result
+
+
+_route_delays: Tuple[tuple, Dict[int, int]] = ((), {})
+
+
+def live_route_delays(tt: TimetableArtifact) -> Dict[int, int]:
+    """Route index -> live delay minutes from the delay overlay (recomputed per overlay version)."""
+    global _route_delays
+    overlay = get_delay_overlay()
+    if overlay is None or not overlay.delays:
+        return {}
+    key = (tt.version, overlay.version)
+    if _route_delays[0] != key:
+        delays = {}
+        for route in range(len(tt.route_railway_id)):
+            minutes = overlay.delays.get(tt.string(tt.route_railway_id[route]))
+            if minutes:
+                delays[route] = round(minutes)
+        _route_delays = (key, delays)
+    return _route_delays[1]
+
+
+def one_to_many_with_timetable(
+    tt: TimetableArtifact,
+    graph,
+    from_station: str,
+    to_stations: List[str],
+    departure_time: str,
+    weekday: str = "Weekday",
+    transfer_buffer: int = 5,
+) -> Dict[str, Optional[Dict]]:
+    """
+    Earliest-arrival journeys from one station to several, from a single one-to-all pass.
+
+    Returns:
+        destination query -> journey in the search_with_timetable format, or None
+    """
+    results: Dict[str, Optional[Dict]] = {to: None for to in to_stations}
+    origins = resolve_stops(tt, graph, from_station)
+    if not origins:
+        return results
+
+    reached = dict(one_to_all(
+        tt, origins, service_minutes(departure_time), tt.day_ids(day_type_labels(weekday)), transfer_buffer
+    ))
+    station_names, railway_names = graph_names(graph)
+    from_name = _display_name(graph, from_station)
+    for to_station in results:
+        best = None
+        for stop in resolve_stops(tt, graph, to_station):
+            legs = reached.get(stop)
+            if legs:
+                arrival = tt.st_time[tt.trip_offsets[legs[-1][0]] + legs[-1][2]]
+                if best is None or arrival < best[0]:
+                    best = (arrival, legs)
+        if best is not None:
+            results[to_station] = journey_result(
+                tt, best[1], from_name, _display_name(graph, to_station),
+                departure_time, station_names, railway_names,
+            )
+    return results
+
+
+def reachable_with_timetable(
+    tt: TimetableArtifact,
+    graph,
+    from_station: str,
+    departure_time: str,
+    max_minutes: int,
+    weekday: str = "Weekday",
+    transfer_buffer: int = 5,
+) -> Optional[Dict[str, Tuple[int, int]]]:
+    """
+    Stations reachable within max_minutes of departure_time (waiting included), in one bounded pass.
+
+    The target bound is set to the time limit, so RAPTOR prunes every label
+    arriving later instead of searching the whole day.
+
+    Returns:
+        Japanese station name -> (minutes, transfers), or None if the station has no timetable stops.
+    """
+    origins = resolve_stops(tt, graph, from_station)
+    if not origins:
+        return None
+
+    departure = service_minutes(departure_time)
+    bounds = SearchBounds()
+    bounds.best_target = departure + max_minutes + 1
+    station_names, _ = graph_names(graph)
+    reached: Dict[str, Tuple[int, int]] = {}
+    for stop in origins:
+        reached[station_names.get(tt.string(tt.stop_station_id[stop])) or tt.stop_label(stop)] = (0, 0)
+    for stop, legs in one_to_all(
+        tt, origins, departure, tt.day_ids(day_type_labels(weekday)), transfer_buffer, bounds
+    ):
+        if not legs:
+            continue
+        last = legs[-1]
+        label = (
+            tt.st_time[tt.trip_offsets[last[0]] + last[2]] - departure,
+            max(0, sum(1 for leg in legs if not leg[3]) - 1),
+        )
+        name = station_names.get(tt.string(tt.stop_station_id[stop])) or tt.stop_label(stop)
+        if name not in reached or label < reached[name]:
+            reached[name] = label
+    return reached
+
+
+def arrive_by_with_timetable(
+    tt: TimetableArtifact,
+    graph,
+    from_station: str,
+    to_station: str,
+    arrival_time: str,
+    weekday: str = "Weekday",
+    transfer_buffer: int = 5,
+) -> Optional[Dict]:
+    """
+    Latest-departing journey that arrives by arrival_time, in one backward pass.
+
+    Same format as search_with_timetable, with requested_departure set to the
+    journey's departure and requested_arrival to the requested time.
+    Returns None when either station has no timetable stops or nothing arrives in time.
+    """
+    origins = resolve_stops(tt, graph, from_station)
+    targets = resolve_stops(tt, graph, to_station)
+    if not origins or not targets:
+        return None
+
+    legs = latest_departure(
+        tt, origins, targets, service_minutes(arrival_time),
+        tt.day_ids(day_type_labels(weekday)), transfer_buffer,
+    )
+    if not legs:
+        return None
+
+    trip, board_pos = legs[0][0], legs[0][1]
+    departure_time = minutes_to_time(tt.st_time[tt.trip_offsets[trip] + board_pos])
+    station_names, railway_names = graph_names(graph)
+    result = journey_result(
+        tt, legs, _display_name(graph, from_station), _display_name(graph, to_station),
+        departure_time, station_names, railway_names,
+    )
+    result["requested_arrival"] = arrival_time
+    return result
+
+
+def profile_with_timetable(
+    tt: TimetableArtifact,
+    graph,
+    from_station: str,
+    to_station: str,
+    start_time: str,
+    end_time: Optional[str] = None,
+    weekday: str = "Weekday",
+    transfer_buffer: int = 5,
+) -> Optional[Dict]:
+    """
+    All optimal journeys leaving between start_time and end_time.
+
+    end_time defaults to the end of the service day, so the last journey
+    is the last train that still reaches the destination.
+    Returns None when either station has no timetable stops.
+    """
+    origins = resolve_stops(tt, graph, from_station)
+    targets = resolve_stops(tt, graph, to_station)
+    if not origins or not targets:
+        return None
+
+    start = service_minutes(start_time)
+    end = service_minutes(end_time) if end_time else SERVICE_DAY_START + MINUTES_PER_DAY
+    journeys = profile(tt, origins, targets, start, end, tt.day_ids(day_type_labels(weekday)), transfer_buffer)
+
+    station_names, railway_names = graph_names(graph)
+    from_name, to_name = _display_name(graph, from_station), _display_name(graph, to_station)
+    results = [
+        journey_result(tt, legs, from_name, to_name, start_time, station_names, railway_names)
+        for legs in journeys
+    ]
+    for result in results:
+        result["departure_time"] = result["segments"][0]["departure_time"]
+        result["arrival_time"] = result["segments"][-1]["arrival_time"]
+    return {
+        "from": from_name,
+        "to": to_name,
+        "window": {"start": start_time, "end": minutes_to_time(end)},
+        "journeys": results,
+        "last_train": results[-1] if results and not end_time else None,
+    }
+
+
+def _display_name(graph, query: str) -> str:
+    info = graph.station_info.get(query)
+    return info.get("name_ja", query) if info else query
@@ -0,0 +1,163 @@
+"""
+Service calendar index.
+
+Maps each calendar date to the GTFS services running that day and to the
+timetable day type (Weekday / Saturday / Holiday) used by the
+weekday_type column. The index is built once from calendar.txt and
+calendar_dates.txt, so resolving a date at query time is a dict lookup.
+"""
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from functools import lru_cache
+from typing import Dict, FrozenSet, List, Optional, Sequence
+from zoneinfo import ZoneInfo
+
+DAY_TYPES = ("Weekday", "Saturday", "Holiday")
+
+# weekday_type labels stored in the timetable that apply on each day type.
+# Many operators run one timetable on both Saturdays and holidays.
+DAY_TYPE_LABELS = {
+    "Weekday": ("Weekday",),
+    "Saturday": ("Saturday", "SaturdayHoliday"),
+    "Holiday": ("Holiday", "SaturdayHoliday"),
+}
+
+JST = ZoneInfo("Asia/Tokyo")
+
+
+def day_type_labels(day_type: str) -> tuple:
+    """weekday_type values to match for a day type (unknown values match themselves)."""
+    return DAY_TYPE_LABELS.get(day_type, (day_type,))
+
+
+def default_day_type(d: date) -> str:
+    """Day type from the day of week alone (no holiday information)."""
+    if d.weekday() < 5:
+        return "Weekday"
+    return "Saturday" if d.weekday() == 5 else "Holiday"
+
+
+def service_labels(feed) -> List[str]:
+    """
+    weekday_type label for each service of a GtfsFeed (indexed like feed.service_ids).
+
+    Services running Monday-Friday are "Weekday"; weekend services are
+    "Saturday", "Holiday" or "SaturdayHoliday" depending on which days they cover.
+    Services defined only through calendar_dates are classified by those dates.
+    """
+    calendar_days: Dict[str, set] = {}
+    for service_id, flags, _, _ in feed.calendar:
+        calendar_days[service_id] = {i for i, on in enumerate(flags) if on}
+    added_days: Dict[str, set] = {}
+    for service_id, date_str, exception_type in feed.calendar_dates:
+        if exception_type == 1 and service_id not in calendar_days:
+            added_days.setdefault(service_id, set()).add(_parse_date(date_str).weekday())
+
+    labels = []
+    for service_id in feed.service_ids:
+        days = calendar_days.get(service_id) or added_days.get(service_id, set())
+        if days & {0, 1, 2, 3, 4}:
+            labels.append("Weekday")
+        elif 5 in days and 6 in days:
+            labels.append("SaturdayHoliday")
+        elif 5 in days:
+            labels.append("Saturday")
+        else:
+            labels.append("Holiday")
+    return labels
+
+
+@dataclass(frozen=True)
+class ServiceDay:
+    """Services and timetable day type in effect on one date."""
+    date: date
+    day_type: str
+    service_ids: FrozenSet[str]  # "<operator>:<service_id>"
+
+    @property
+    def labels(self) -> tuple:
+        return day_type_labels(self.day_type)
+
+
+class ServiceCalendar:
+    """Precomputed date -> ServiceDay index over all loaded feeds."""
+
+    def __init__(self):
+        self._days: Dict[date, ServiceDay] = {}
+
+    def __len__(self) -> int:
+        return len(self._days)
+
+    @classmethod
+    def from_feeds(cls, feeds: Sequence) -> "ServiceCalendar":
+        calendar = cls()
+        active: Dict[date, set] = {}
+        weekday_services = set()
+
+        for feed in feeds:
+            for service_id, flags, start, end in feed.calendar:
+                key = f"{feed.operator}:{service_id}"
+                if any(flags[:5]):
+                    weekday_services.add(key)
+                d, last = _parse_date(start), _parse_date(end)
+                while d <= last:
+                    if flags[d.weekday()]:
+                        active.setdefault(d, set()).add(key)
+                    d += timedelta(days=1)
+
+            for service_id, date_str, exception_type in feed.calendar_dates:
+                key = f"{feed.operator}:{service_id}"
+                d = _parse_date(date_str)
+                services = active.setdefault(d, set())
+                if exception_type == 1:
+                    services.add(key)
+                elif exception_type == 2:
+                    services.discard(key)
+
+        for d, services in active.items():
+            if services & weekday_services:
+                day_type = "Weekday"
+            elif d.weekday() < 5:
+                # Weekday running a weekend service: a public holiday
+                day_type = "Holiday"
+            else:
+                day_type = default_day_type(d)
+            calendar._days[d] = ServiceDay(d, day_type, frozenset(services))
+
+        return calendar
+
+    def resolve(self, d: date) -> ServiceDay:
+        """ServiceDay for a date (falls back to the day of week outside the feed range)."""
+        day = self._days.get(d)
+        if day is None:
+            day = ServiceDay(d, default_day_type(d), frozenset())
+        return day
+
+    def day_type(self, d: date) -> str:
+        return self.resolve(d).day_type
+
+
+def today_jst() -> date:
+    return datetime.now(JST).date()
+
+
+def parse_service_date(value: Optional[str]) -> date:
+    """Parse YYYY-MM-DD (or YYYYMMDD); None means today in JST."""
+    if not value:
+        return today_jst()
+    if len(value) == 8 and value.isdigit():
+        return _parse_date(value)
+    return date.fromisoformat(value)
+
+
+@lru_cache(maxsize=1)
+def get_service_calendar() -> ServiceCalendar:
+    """Process-wide calendar built from all available GTFS feeds."""
+    from services.gtfs_loader import load_feeds
+    calendar = ServiceCalendar.from_feeds(load_feeds())
+    print(f"Service calendar: {len(calendar)} dates indexed")
+    return calendar
+
+
+def _parse_date(value: str) -> date:
+    return date(int(value[:4]), int(value[4:6]), int(value[6:8]))
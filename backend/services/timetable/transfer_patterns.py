@@ -0,0 +1,247 @@
+"""
+Transfer patterns for popular origins.
+
+An offline job (scripts/build_transfer_patterns.py) runs a one-to-all
+profile search from each hub station over the whole service day of every
+day type and records, per destination station, the distinct sequences of
+stations where the optimal journeys change trains. Hubs are processed in
+parallel, one process per core.
+
+At query time only those few patterns are evaluated against the timetable
+with direct-connection lookups, which avoids a network-wide search. Origins
+or destinations without patterns fall back to the full RAPTOR search.
+
+File format (data/transfer_patterns.json):
+    {"version": timetable version, "built_at": ..., "origins": {
+        origin station key: {destination station key: [pattern, ...]}}}
+    pattern = [[from key, to key, through_service], ...] (one hop per train)
+"""
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+from .artifact import DATA_DIR, MINUTES_PER_DAY, SERVICE_DAY_START, TimetableArtifact, get_timetable, service_minutes
+from .patterns import station_key
+from .raptor import (
+    INF, SearchBounds, _display_name, _earliest_trip, departures_in_window, graph_names,
+    journey_result, one_to_all, resolve_stops,
+)
+from .service_calendar import DAY_TYPES, day_type_labels
+
+PATTERNS_PATH = os.path.join(DATA_DIR, "transfer_patterns.json")
+
+
+def stop_key(tt: TimetableArtifact, stop: int) -> str:
+    return station_key(tt.string(tt.stop_name[stop]))
+
+
+def _origin_patterns(args: Tuple[str, List[int], int]) -> Tuple[str, Dict[str, List[list]]]:
+    """Transfer patterns from one origin over every day type (runs in a worker process)."""
+    origin, origin_stops, transfer_buffer = args
+    tt = get_timetable()
+    start, end = SERVICE_DAY_START, SERVICE_DAY_START + MINUTES_PER_DAY
+    patterns: Dict[str, set] = {}
+    for day_type in DAY_TYPES:
+        day_ids = tt.day_ids(day_type_labels(day_type))
+        bounds = SearchBounds()
+        for departure in departures_in_window(tt, origin_stops, start, end, day_ids):
+            for stop, legs in one_to_all(tt, origin_stops, departure, day_ids, transfer_buffer, bounds):
+                hops = []
+                for trip, board_pos, alight_pos, through in legs:
+                    base = tt.trip_offsets[trip]
+                    hops.append((stop_key(tt, tt.st_stop[base + board_pos]),
+                                 stop_key(tt, tt.st_stop[base + alight_pos]), through))
+                patterns.setdefault(stop_key(tt, stop), set()).add(tuple(hops))
+    patterns.pop(origin, None)
+    return origin, {dest: [list(map(list, p)) for p in sorted(found)] for dest, found in patterns.items()}
+
+
+def build_transfer_patterns(
+    hubs: Dict[str, List[int]],
+    path: str = PATTERNS_PATH,
+    transfer_buffer: int = 5,
+    processes: Optional[int] = None,
+) -> int:
+    """
+    Precompute patterns for hub origins in parallel and write them to path.
+
+    Args:
+        hubs: origin station key -> timetable stops of the station
+    Returns:
+        Number of (origin, destination) pairs covered.
+    """
+    tt = get_timetable()
+    if tt is None:
+        raise RuntimeError("Timetable artifact is not available")
+
+    origins = {}
+    jobs = [(origin, stops, transfer_buffer) for origin, stops in hubs.items()]
+    with ProcessPoolExecutor(max_workers=processes) as pool:
+        for origin, destinations in pool.map(_origin_patterns, jobs):
+            origins[origin] = destinations
+            print(f"  {origin}: {len(destinations)} destinations")
+
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({
+            "version": tt.version,
+            "built_at": time.time(),
+            "transfer_buffer": transfer_buffer,
+            "origins": origins,
+        }, f, separators=(",", ":"))
+    os.replace(tmp, path)
+    pairs = sum(len(d) for d in origins.values())
+    print(f"Transfer patterns for {len(origins)} origins, {pairs} pairs -> {path}")
+    return pairs
+
+
+class TransferPatterns:
+    """Loaded pattern table with direct-connection evaluation."""
+
+    def __init__(self, path: str = PATTERNS_PATH):
+        self.path = path
+        self._mtime = os.path.getmtime(path)
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        self.version = data.get("version")
+        self.transfer_buffer = data.get("transfer_buffer")
+        self.origins: Dict[str, Dict[str, list]] = data.get("origins", {})
+        self._stops: Optional[Dict[str, List[int]]] = None
+        self._stops_version = None
+
+    def is_current(self) -> bool:
+        try:
+            return os.path.getmtime(self.path) == self._mtime
+        except FileNotFoundError:
+            return True
+
+    def patterns(self, origin: str, destination: str) -> Optional[list]:
+        """Patterns of a pair, or None if the origin is not a precomputed hub."""
+        destinations = self.origins.get(origin)
+        if destinations is None:
+            return None
+        return destinations.get(destination, [])
+
+    def stops(self, tt: TimetableArtifact, key: str) -> List[int]:
+        if self._stops is None or self._stops_version != tt.version:
+            index: Dict[str, List[int]] = {}
+            for s in range(tt.stop_count):
+                index.setdefault(stop_key(tt, s), []).append(s)
+            self._stops, self._stops_version = index, tt.version
+        return self._stops.get(key, [])
+
+    def _direct(self, tt: TimetableArtifact, src: str, dst: str, ready: int, day_ids: frozenset):
+        """Earliest single-train connection from station src to station dst: (arrival, leg) or None."""
+        targets = set(self.stops(tt, dst))
+        best = None
+        for s in self.stops(tt, src):
+            for i in range(tt.stop_pat_offsets[s], tt.stop_pat_offsets[s + 1]):
+                p = tt.stop_pat[i]
+                if tt.pat_day[p] not in day_ids:
+                    continue
+                pos = tt.stop_pat_pos[i]
+                first, end = tt.pat_stop_offsets[p], tt.pat_stop_offsets[p + 1]
+                alight = next((j for j in range(pos + 1, end - first) if tt.pat_stops[first + j] in targets), None)
+                if alight is None:
+                    continue
+                trip = _earliest_trip(tt, p, pos, ready)
+                if trip < 0:
+                    continue
+                arrival = tt.st_time[tt.trip_offsets[trip] + alight]
+                if best is None or arrival < best[0]:
+                    best = (arrival, (trip, pos, alight, False))
+        return best
+
+    def _through(self, tt: TimetableArtifact, prev_trip: int, dst: str):
+        """Continuation of prev_trip's through train to station dst: (arrival, leg) or None."""
+        trip = tt.trip_next[prev_trip]
+        if trip < 0:
+            return None
+        base, end = tt.trip_offsets[trip], tt.trip_offsets[trip + 1]
+        for pos in range(1, end - base):
+            if stop_key(tt, tt.st_stop[base + pos]) == dst:
+                return tt.st_time[base + pos], (trip, 0, pos, True)
+        return None
+
+    def evaluate(
+        self, tt: TimetableArtifact, patterns: list, departure: int, day_ids: frozenset, transfer_buffer: int = 5
+    ) -> Optional[List[Tuple[int, int, int, bool]]]:
+        """Earliest-arriving legs over the given patterns (None if none is feasible)."""
+        best_arrival, best_legs = INF, None
+        for pattern in patterns:
+            ready, legs = departure, []
+            for src, dst, through in pattern:
+                if through:
+                    hop = self._through(tt, legs[-1][0], dst) if legs else None
+                else:
+                    hop = self._direct(tt, src, dst, ready + (transfer_buffer if legs else 0), day_ids)
+                if hop is None or hop[0] >= best_arrival:
+                    legs = None
+                    break
+                ready = hop[0]
+                legs.append(hop[1])
+            if legs and (ready < best_arrival or (ready == best_arrival and len(legs) < len(best_legs))):
+                best_arrival, best_legs = ready, legs
+        return best_legs
+
+
+_patterns: Optional[TransferPatterns] = None
+
+
+def get_transfer_patterns() -> Optional[TransferPatterns]:
+    """Process-wide pattern table (None if the job has not run); reloaded when the file changes."""
+    global _patterns
+    if _patterns is not None and _patterns.is_current():
+        return _patterns
+    if not os.path.exists(PATTERNS_PATH):
+        return _patterns
+    _patterns = TransferPatterns(PATTERNS_PATH)
+    return _patterns
+
+
+def search_with_patterns(
+    tt: TimetableArtifact,
+    graph,
+    from_station: str,
+    to_station: str,
+    departure_time: str,
+    weekday: str = "Weekday",
+    transfer_buffer: int = 5,
+) -> Optional[Dict]:
+    """
+    Answer a query from precomputed transfer patterns.
+
+    Returns None when the patterns were built for another timetable version
+    or transfer_buffer, the origin is not a hub, the pair has no pattern or
+    no pattern is feasible at this time; callers then run the full search.
+    """
+    table = get_transfer_patterns()
+    if table is None or table.version != tt.version or table.transfer_buffer != transfer_buffer:
+        return None
+    origin_stops = resolve_stops(tt, graph, from_station)
+    target_stops = resolve_stops(tt, graph, to_station)
+    if not origin_stops or not target_stops:
+        return None
+
+    departure = service_minutes(departure_time)
+    day_ids = tt.day_ids(day_type_labels(weekday))
+    best = None
+    for origin in {stop_key(tt, s) for s in origin_stops}:
+        for destination in {stop_key(tt, s) for s in target_stops}:
+            patterns = table.patterns(origin, destination)
+            if not patterns:
+                continue
+            legs = table.evaluate(tt, patterns, departure, day_ids, transfer_buffer)
+            if legs:
+                arrival = tt.st_time[tt.trip_offsets[legs[-1][0]] + legs[-1][2]]
+                if best is None or arrival < best[0]:
+                    best = (arrival, legs)
+    if best is None:
+        return None
+
+    station_names, railway_names = graph_names(graph)
+    return journey_result(
+        tt, best[1], _display_name(graph, from_station), _display_name(graph, to_station),
+        departure_time, station_names, railway_names,
+    )
@@ -0,0 +1,95 @@
+"""
+Branch-and-bound pruning of /search_multi candidates (services.timetable.core).
+"""
+import asyncio
+
+import pytest
+
+from services.timetable import core
+from services.timetable.core import ArrivalBound, ride_minutes
+
+
+def ride(from_station, to_station, minutes):
+    return {"from": from_station, "to": to_station, "railway": "R", "type": "ride", "theoretical_time": minutes}
+
+
+def test_cutoff_is_kth_best_arrival():
+    bound = ArrivalBound(2)
+    assert bound.cutoff == float("inf")
+    bound.add(600)
+    assert bound.cutoff == float("inf")
+    bound.add(640)
+    bound.add(620)
+    assert bound.cutoff == 620
+    bound.add(700)
+    assert bound.cutoff == 620
+
+
+def test_excludes_only_candidates_that_cannot_beat_cutoff():
+    bound = ArrivalBound(1)
+    assert not bound.excludes(10_000)
+    bound.add(620)
+    assert bound.excludes(620)
+    assert bound.excludes(650)
+    assert not bound.excludes(619)
+
+
+def test_ride_minutes_ignores_penalized_total():
+    # find_routes inflates total_time for edges shared with earlier routes
+    route = {"total_time": 150, "theoretical_time": 150, "segments": [ride("A", "B", 10), ride("B", "C", 20)]}
+    assert ride_minutes(route) == 30
+
+
+@pytest.fixture
+def fake_trains(monkeypatch):
+    """Trains keyed by (from, to): (departure, arrival), None = no train found."""
+    trains = {}
+
+    def find(*args):
+        from_station, to_station = args[1], args[2]
+        times = trains.get((from_station, to_station))
+        if times is None:
+            return None
+        return {
+            "departure_time": times[0], "arrival_time": times[1], "railway": "R",
+            "train_type": "Local", "destination": to_station, "train_number": "1",
+        }
+
+    monkeypatch.setattr(core, "get_timetable", lambda: None)
+    monkeypatch.setattr(core, "find_train_for_segment", find)
+    monkeypatch.setattr(core, "get_arrival_time", lambda *args: None)
+    return trains
+
+
+def test_partial_route_does_not_tighten_bound(fake_trains):
+    fake_trains[("A", "B")] = ("10:00", "10:05")
+    route = {"segments": [ride("A", "B", 5), ride("B", "C", 10)]}
+    bound = ArrivalBound(1)
+    core.search_route_with_times(None, route, "10:00", bound=bound)
+    assert bound.cutoff == float("inf")
+
+    fake_trains[("B", "C")] = ("10:10", "10:20")
+    core.search_route_with_times(None, route, "10:00", bound=bound)
+    assert bound.cutoff == 620
+
+
+def test_penalized_alternative_is_not_pruned(fake_trains, monkeypatch):
+    class Session:
+        def close(self):
+            pass
+
+    async def run_io(fn, *args):
+        return fn(*args)
+
+    monkeypatch.setattr(core, "SessionLocal", Session)
+    monkeypatch.setattr(core, "run_io", run_io)
+    fake_trains[("A", "B")] = ("10:00", "10:30")
+    fake_trains[("A", "C")] = ("10:00", "10:20")
+    first = {"total_time": 30, "theoretical_time": 30, "segments": [ride("A", "B", 30)]}
+    # Shares edges with the first route: penalized cost 100, real riding time 20
+    second = {"total_time": 100, "theoretical_time": 100, "segments": [ride("A", "C", 20)]}
+
+    # Ordered by riding time, the faster second route is mapped first and the first one is pruned
+    results = asyncio.run(core.search_routes_with_times([first, second], "10:00", limit=1))
+    assert results[0]["segments"][0]["to"] == "C"
+    assert results[1].get("pruned")